@@ -0,0 +1,367 @@
+"""
+Cross-session label analytics.
+
+Exported ZIPs (their per-category CSVs, never labels.json) and autosaved
+sessions are ingested into a local SQLite index. Each source keeps its
+segments plus per-value and per-category rollups, and a global rollup table
+is adjusted incrementally on every (re)ingest, so aggregate queries read a
+few pre-computed rows instead of the raw labels.
+
+    python -m src.analytics ingest exports/
+    python -m src.analytics sync-sessions
+    python -m src.analytics durations --category pa_type
+    python -m src.analytics coverage
+    python -m src.analytics sessions posture Sitting
+"""
+import argparse
+import csv
+import io
+import os
+import sqlite3
+import sys
+import time
+from collections import defaultdict
+from zipfile import BadZipFile, ZipFile
+
+from src.session_store import SessionStore, default_database_path
+from src.vocabulary import CATEGORIES, EXPORT_FILES
+
+KIND_EXPORT = "export"
+KIND_SESSION = "session"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    source TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    stamp TEXT NOT NULL,
+    ingested_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS segments (
+    source TEXT NOT NULL REFERENCES sources (source) ON DELETE CASCADE,
+    category TEXT NOT NULL,
+    value TEXT NOT NULL,
+    start_time REAL NOT NULL,
+    end_time REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS segments_source ON segments (source);
+CREATE INDEX IF NOT EXISTS segments_value ON segments (category, value);
+
+CREATE TABLE IF NOT EXISTS source_rollups (
+    source TEXT NOT NULL REFERENCES sources (source) ON DELETE CASCADE,
+    category TEXT NOT NULL,
+    value TEXT NOT NULL,
+    duration REAL NOT NULL,
+    segments INTEGER NOT NULL,
+    PRIMARY KEY (source, category, value)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS source_rollups_value ON source_rollups (category, value);
+
+CREATE TABLE IF NOT EXISTS source_coverage (
+    source TEXT NOT NULL REFERENCES sources (source) ON DELETE CASCADE,
+    category TEXT NOT NULL,
+    covered REAL NOT NULL,
+    span REAL NOT NULL,
+    PRIMARY KEY (source, category)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS source_coverage_category ON source_coverage (category);
+
+CREATE TABLE IF NOT EXISTS rollups (
+    category TEXT NOT NULL,
+    value TEXT NOT NULL,
+    duration REAL NOT NULL,
+    segments INTEGER NOT NULL,
+    sessions INTEGER NOT NULL,
+    PRIMARY KEY (category, value)
+) WITHOUT ROWID;
+"""
+
+_CATEGORY_ALIASES = {}
+for _category, (_filename, _labelset) in EXPORT_FILES.items():
+    _CATEGORY_ALIASES[_category.lower()] = _category
+    _CATEGORY_ALIASES[_labelset] = _category
+    _CATEGORY_ALIASES[os.path.splitext(_filename)[0]] = _category
+
+
+def resolve_category(name):
+    """Category constant for a category name or export short name (pa_type, hlb, ...), or None"""
+    if name is None:
+        return None
+    category = _CATEGORY_ALIASES.get(name.strip().lower())
+    if category is None:
+        raise ValueError(f"Unknown category '{name}', expected one of: {', '.join(CATEGORIES)}")
+    return category
+
+
+def default_analytics_path() -> str:
+    """analytics.sqlite3 next to the session database"""
+    return os.path.join(os.path.dirname(default_database_path()), "analytics.sqlite3")
+
+
+def covered_length(intervals):
+    """Length of the union of (start, end) intervals"""
+    covered = 0.0
+    current_start = current_end = None
+    for start, end in sorted(intervals):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                covered += current_end - current_start
+            current_start, current_end = start, end
+        elif end > current_end:
+            current_end = end
+    if current_end is not None:
+        covered += current_end - current_start
+    return covered
+
+
+def read_export_segments(zip_path):
+    """(category, value, start, end) rows from the per-category CSVs of an exported ZIP"""
+    segments = []
+    with ZipFile(zip_path) as zipf:
+        names = set(zipf.namelist())
+        for category, (filename, _) in EXPORT_FILES.items():
+            if filename not in names:
+                continue
+            with zipf.open(filename) as raw:
+                reader = csv.reader(io.TextIOWrapper(raw, encoding='utf-8', newline=''))
+                header = next(reader, None)
+                if header is None:
+                    continue
+                try:
+                    start_col, stop_col = header.index('START_TIME'), header.index('STOP_TIME')
+                    value_col = header.index('PREDICTION')
+                except ValueError:
+                    raise ValueError(f"{filename} in {zip_path} is not a label export")
+                for row in reader:
+                    try:
+                        segments.append((category, row[value_col], float(row[start_col]), float(row[stop_col])))
+                    except (IndexError, ValueError):
+                        print(f"Skipping malformed row in {zip_path}/{filename}: {row}")
+    return segments
+
+
+class AnalyticsIndex:
+    """SQLite index of label segments from many sessions with incrementally maintained rollups"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def ingest_export(self, zip_path: str, force: bool = False) -> bool:
+        """Index an exported ZIP; returns False if it is unchanged since it was last ingested"""
+        source = os.path.abspath(zip_path)
+        stat = os.stat(source)
+        stamp = f"{stat.st_size}:{stat.st_mtime_ns}"
+        if not force and self._stamp(source) == stamp:
+            return False
+        self._replace_source(source, KIND_EXPORT, stamp, read_export_segments(source))
+        return True
+
+    def ingest_directory(self, root: str, force: bool = False):
+        """Index every .zip below root; returns (ingested, unchanged, failed) counts"""
+        ingested = unchanged = failed = 0
+        for directory, _, files in os.walk(root):
+            for name in sorted(files):
+                if not name.lower().endswith('.zip'):
+                    continue
+                try:
+                    if self.ingest_export(os.path.join(directory, name), force):
+                        ingested += 1
+                    else:
+                        unchanged += 1
+                except (BadZipFile, OSError, ValueError) as e:
+                    print(f"Failed to ingest {os.path.join(directory, name)}: {str(e)}")
+                    failed += 1
+        return ingested, unchanged, failed
+
+    def ingest_sessions(self, session_store: SessionStore) -> int:
+        """Mirror the session database's labels index; returns the number of sessions re-indexed"""
+        updated = 0
+        current = set()
+        for fingerprint, _, updated_at in session_store.sessions():
+            source = f"{KIND_SESSION}:{fingerprint}"
+            current.add(source)
+            stamp = repr(updated_at)
+            if self._stamp(source) != stamp:
+                self._replace_source(source, KIND_SESSION, stamp, session_store.label_segments(fingerprint))
+                updated += 1
+        stale = self.connection.execute("SELECT source FROM sources WHERE kind = ?", (KIND_SESSION,)).fetchall()
+        for source, in stale:
+            if source not in current:
+                self.remove_source(source)
+        return updated
+
+    def remove_source(self, source: str) -> None:
+        with self.connection:
+            self._subtract_rollups(source)
+            self.connection.execute("DELETE FROM sources WHERE source = ?", (source,))
+
+    def durations(self, category=None):
+        """Total labelled seconds, segment and session counts per label value"""
+        query = "SELECT category, value, duration, segments, sessions FROM rollups"
+        params = ()
+        if category is not None:
+            query += " WHERE category = ?"
+            params = (category,)
+        rows = self.connection.execute(query + " ORDER BY category, duration DESC", params)
+        return [{"category": row[0], "value": row[1], "seconds": row[2], "segments": row[3], "sessions": row[4]}
+                for row in rows]
+
+    def coverage(self, category=None):
+        """Seconds covered by at least one label of each category against the labelled span of the sessions"""
+        query = "SELECT category, SUM(covered), SUM(span), COUNT(*) FROM source_coverage"
+        params = ()
+        if category is not None:
+            query += " WHERE category = ?"
+            params = (category,)
+        rows = self.connection.execute(query + " GROUP BY category ORDER BY category", params)
+        return [{"category": row[0], "covered_seconds": row[1], "span_seconds": row[2], "sessions": row[3],
+                 "fraction": row[1] / row[2] if row[2] else 0.0}
+                for row in rows]
+
+    def sessions_with(self, category: str, value: str):
+        """Per-source seconds and segment counts of one label value, largest first"""
+        rows = self.connection.execute(
+            "SELECT source, duration, segments FROM source_rollups WHERE category = ? AND value = ? "
+            "ORDER BY duration DESC", (category, value))
+        return [{"source": row[0], "seconds": row[1], "segments": row[2]} for row in rows]
+
+    def source_count(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM sources").fetchone()[0]
+
+    def _stamp(self, source):
+        row = self.connection.execute("SELECT stamp FROM sources WHERE source = ?", (source,)).fetchone()
+        return row[0] if row else None
+
+    def _subtract_rollups(self, source):
+        old = self.connection.execute(
+            "SELECT category, value, duration, segments FROM source_rollups WHERE source = ?", (source,)).fetchall()
+        self.connection.executemany(
+            "UPDATE rollups SET duration = duration - ?, segments = segments - ?, sessions = sessions - 1 "
+            "WHERE category = ? AND value = ?",
+            [(duration, segments, category, value) for category, value, duration, segments in old])
+        self.connection.execute("DELETE FROM rollups WHERE sessions <= 0")
+
+    def _replace_source(self, source, kind, stamp, segments):
+        per_value = defaultdict(lambda: [0.0, 0])
+        per_category = defaultdict(list)
+        span_start = span_end = None
+        for category, value, start, end in segments:
+            totals = per_value[(category, value)]
+            totals[0] += end - start
+            totals[1] += 1
+            per_category[category].append((start, end))
+            span_start = start if span_start is None else min(span_start, start)
+            span_end = end if span_end is None else max(span_end, end)
+        span = (span_end - span_start) if span_start is not None else 0.0
+
+        with self.connection:
+            self._subtract_rollups(source)
+            self.connection.execute("DELETE FROM sources WHERE source = ?", (source,))
+            self.connection.execute(
+                "INSERT INTO sources (source, kind, stamp, ingested_at) VALUES (?, ?, ?, ?)",
+                (source, kind, stamp, time.time()))
+            self.connection.executemany(
+                "INSERT INTO segments (source, category, value, start_time, end_time) VALUES (?, ?, ?, ?, ?)",
+                [(source,) + tuple(segment) for segment in segments])
+            self.connection.executemany(
+                "INSERT INTO source_rollups (source, category, value, duration, segments) VALUES (?, ?, ?, ?, ?)",
+                [(source, category, value, duration, count) for (category, value), (duration, count) in per_value.items()])
+            self.connection.executemany(
+                "INSERT INTO rollups (category, value, duration, segments, sessions) VALUES (?, ?, ?, ?, 1) "
+                "ON CONFLICT (category, value) DO UPDATE SET duration = duration + excluded.duration, "
+                "segments = segments + excluded.segments, sessions = sessions + 1",
+                [(category, value, duration, count) for (category, value), (duration, count) in per_value.items()])
+            self.connection.executemany(
+                "INSERT INTO source_coverage (source, category, covered, span) VALUES (?, ?, ?, ?)",
+                [(source, category, covered_length(intervals), span) for category, intervals in per_category.items()])
+
+
+def _print_table(headers, rows):
+    widths = [max(len(str(cell)) for cell in column) for column in zip(headers, *rows)]
+    for row in [headers] + rows:
+        print("  ".join(str(cell).ljust(width) for cell, width in zip(row, widths)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.analytics", description="Label analytics across sessions")
+    parser.add_argument("--db", default=default_analytics_path(), help="analytics index (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="index exported ZIP files or directories of them")
+    ingest.add_argument("paths", nargs="+")
+    ingest.add_argument("--force", action="store_true", help="re-index files that have not changed")
+
+    sync = commands.add_parser("sync-sessions", help="index the autosaved sessions")
+    sync.add_argument("--sessions-db", default=default_database_path())
+
+    durations = commands.add_parser("durations", help="labelled minutes, segments and sessions per label value")
+    durations.add_argument("--category")
+
+    coverage = commands.add_parser("coverage", help="share of the labelled span covered by each category")
+    coverage.add_argument("--category")
+
+    sessions = commands.add_parser("sessions", help="sources containing one label value")
+    sessions.add_argument("category")
+    sessions.add_argument("value")
+
+    args = parser.parse_args(argv)
+    try:
+        index = AnalyticsIndex(args.db)
+    except (sqlite3.Error, OSError) as e:
+        print(f"Cannot open analytics index {args.db}: {str(e)}", file=sys.stderr)
+        return 1
+    try:
+        if args.command == "ingest":
+            ingested = unchanged = failed = 0
+            for path in args.paths:
+                if os.path.isdir(path):
+                    counts = index.ingest_directory(path, args.force)
+                else:
+                    try:
+                        counts = (1, 0, 0) if index.ingest_export(path, args.force) else (0, 1, 0)
+                    except (BadZipFile, OSError, ValueError) as e:
+                        print(f"Failed to ingest {path}: {str(e)}")
+                        counts = (0, 0, 1)
+                ingested, unchanged, failed = ingested + counts[0], unchanged + counts[1], failed + counts[2]
+            print(f"Ingested {ingested}, unchanged {unchanged}, failed {failed}; {index.source_count()} sources indexed")
+            return 1 if failed else 0
+        if args.command == "sync-sessions":
+            store = SessionStore(args.sessions_db)
+            try:
+                print(f"Re-indexed {index.ingest_sessions(store)} sessions")
+            finally:
+                store.close()
+            return 0
+
+        category = resolve_category(getattr(args, "category", None))
+        if args.command == "durations":
+            rows = [(r["category"], r["value"], f"{r['seconds'] / 60:.1f}", r["segments"], r["sessions"])
+                    for r in index.durations(category)]
+            _print_table(("CATEGORY", "VALUE", "MINUTES", "SEGMENTS", "SESSIONS"), rows)
+        elif args.command == "coverage":
+            rows = [(r["category"], f"{r['covered_seconds'] / 60:.1f}", f"{r['span_seconds'] / 60:.1f}",
+                     f"{r['fraction']:.1%}", r["sessions"]) for r in index.coverage(category)]
+            _print_table(("CATEGORY", "COVERED MIN", "SPAN MIN", "COVERAGE", "SESSIONS"), rows)
+        else:
+            rows = [(r["source"], f"{r['seconds'] / 60:.1f}", r["segments"])
+                    for r in index.sessions_with(category, args.value)]
+            _print_table(("SOURCE", "MINUTES", "SEGMENTS"), rows)
+        return 0
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,12 @@
 from PyQt6.QtWidgets import QMessageBox
 from PyQt6.QtCore import QTimer
 from src.dialogs import AnnotationDialog
-from src.models import TimelineAnnotation
-import random
-import json
+from src.models import TimelineAnnotation, AnnotationLabels
+from src.annotation_store import to_ms
+from src.history import (UndoHistory, InsertCommand, RemoveCommand, BoundsCommand,
+                         RelabelCommand, CompoundCommand)
 from src.utils import autosave
+from src.palette import posture_color
 
 class AnnotationManager:
     def __init__(self, app):
@@ -18,63 +20,23 @@ class AnnotationManager:
             "special_notes": ""
         }
         self.posture_colors = {}
+        self.history = UndoHistory()
 
     def get_posture_color(self, posture):
-        if posture is None or posture == "":
-             return "#808080"
-        if posture not in self.posture_colors:
-            while True:
-                r = random.randint(100, 230)
-                g = random.randint(100, 230)
-                b = random.randint(100, 230)
-                if abs(r - g) > 20 or abs(g - b) > 20 or abs(b - r) > 20:
-                    color = f"#{r:02x}{g:02x}{b:02x}"
-                    if color not in self.posture_colors.values():
-                        break
-            self.posture_colors[posture] = color
-        return self.posture_colors[posture]
+        """Deterministic colour from the categories.csv posture palette"""
+        color = self.posture_colors.get(posture)
+        if color is None:
+            color = self.posture_colors[posture] = posture_color(posture)
+        return color
 
     def check_overlap(self, start_time, end_time, exclude_annotation=None):
-        tolerance = 0.001
-        for annotation in self.app.annotations:
-            if annotation == exclude_annotation:
-                continue
-            if (start_time < (annotation.end_time - tolerance) and
-                    end_time > (annotation.start_time + tolerance)):
-                return True
-        return False
-
-    def get_current_annotation_index(self, sorted_annotations=None):
-        current_time = self.app.media_player['_position'] / 1000.0
-        if sorted_annotations is None:
-            sorted_annotations = sorted(self.app.annotations, key=lambda x: x.start_time)
-
-        for i, annotation in enumerate(sorted_annotations):
-            tolerance = 0.001
-            if (annotation.start_time - tolerance) <= current_time <= (annotation.end_time + tolerance):
-                return i
-        return -1
-
-    def _get_labels_from_annotation(self, annotation):
-        if not annotation or not annotation.comments:
-            return {"POSTURE": None, "HIGH LEVEL BEHAVIOR": [], "PA TYPE": None}
-        try:
-            body_data = json.loads(annotation.comments[0].get("body", "[]"))
-            data_map = {item.get("category"): item.get("selectedValue") for item in body_data}
-            return {
-                "POSTURE": data_map.get("POSTURE"),
-                "HIGH LEVEL BEHAVIOR": sorted(data_map.get("HIGH LEVEL BEHAVIOR", [])),
-                "PA TYPE": data_map.get("PA TYPE")
-            }
-        except json.JSONDecodeError:
-            return {"POSTURE": None, "HIGH LEVEL BEHAVIOR": [], "PA TYPE": None}
+        return self.app.annotations.overlaps(to_ms(start_time), to_ms(end_time), exclude=exclude_annotation)
+
+    def get_current_annotation_index(self):
+        return self.app.annotations.index_at(self.app.media_player['_position'])
 
     def _annotations_have_different_labels(self, ann1, ann2):
-        labels1 = self._get_labels_from_annotation(ann1)
-        labels2 = self._get_labels_from_annotation(ann2)
-        return (labels1["POSTURE"] != labels2["POSTURE"] or
-                labels1["HIGH LEVEL BEHAVIOR"] != labels2["HIGH LEVEL BEHAVIOR"] or
-                labels1["PA TYPE"] != labels2["PA TYPE"])
+        return ann1.labels.primary_key() != ann2.labels.primary_key()
 
 
     @autosave
@@ -108,37 +70,24 @@ class AnnotationManager:
 
             self.app.current_annotation.end_time = current_time
 
-            try:
-                if self.app.current_annotation.comments:
-                    body_data = json.loads(self.app.current_annotation.comments[0].get("body", "[]"))
-                    data_map = {item.get("category"): item.get("selectedValue") for item in body_data}
-                    self.last_used_labels = {
-                        "posture": data_map.get("POSTURE", ""),
-                        "hlb": data_map.get("HIGH LEVEL BEHAVIOR", []),
-                        "pa_type": data_map.get("PA TYPE", ""),
-                        "behavioral_params": data_map.get("Behavioral Parameters", []),
-                        "exp_situation": data_map.get("Experimental situation", ""),
-                        "special_notes": ""
-                    }
-            except json.JSONDecodeError as e:
-                print(f"Error decoding comment body for storing last labels: {e}")
-
-
-            self.app.annotations.append(self.app.current_annotation)
-            self.app.annotations.sort(key=lambda x: x.start_time)
+            if self.app.current_annotation.has_labels:
+                self.last_used_labels = self.app.current_annotation.labels.as_kwargs()
+                self.last_used_labels["special_notes"] = ""
+
+
+            self.app.annotations.add(self.app.current_annotation)
+            self.history.push(InsertCommand(self.app.current_annotation))
             print(f"Finished annotation: {start_time:.3f}s - {current_time:.3f}s")
             self.app.current_annotation = None
-            self.app.updateAnnotationTimeline()
 
 
     @autosave
     def editAnnotation(self):
-        sorted_annotations = sorted(self.app.annotations, key=lambda x: x.start_time)
-        current_idx = self.get_current_annotation_index(sorted_annotations)
+        current_idx = self.get_current_annotation_index()
 
         target_annotation = None
         if current_idx != -1:
-            target_annotation = sorted_annotations[current_idx]
+            target_annotation = self.app.annotations[current_idx]
         elif self.app.current_annotation:
             target_annotation = self.app.current_annotation
 
@@ -156,11 +105,16 @@ class AnnotationManager:
             }
 
             if target_annotation:
-                target_annotation.update_comment_body(**label_data)
+                if target_annotation is self.app.current_annotation:
+                    target_annotation.update_comment_body(**label_data)
+                else:
+                    old_labels = target_annotation.labels
+                    new_labels = AnnotationLabels.from_values(**label_data)
+                    self.app.annotations.set_labels(target_annotation, new_labels)
+                    self.history.push(RelabelCommand(target_annotation, old_labels, new_labels))
                 self.last_used_labels = label_data.copy()
                 self.last_used_labels["special_notes"] = ""
                 print(f"Updated labels for annotation: {target_annotation.start_time:.3f}s")
-                self.app.updateAnnotationTimeline()
             else:
                 self.last_used_labels = label_data.copy()
                 self.last_used_labels["special_notes"] = ""
@@ -175,11 +129,10 @@ class AnnotationManager:
 
     @autosave
     def deleteCurrentLabel(self):
-        sorted_annotations = sorted(self.app.annotations, key=lambda x: x.start_time)
-        current_idx = self.get_current_annotation_index(sorted_annotations)
+        current_idx = self.get_current_annotation_index()
 
         if current_idx != -1:
-            annotation_to_delete = sorted_annotations[current_idx]
+            annotation_to_delete = self.app.annotations[current_idx]
             confirm = QMessageBox.question(self.app, "Confirm Delete",
                                            f"Delete annotation from {annotation_to_delete.start_time:.2f}s to {annotation_to_delete.end_time:.2f}s?",
                                            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
@@ -187,14 +140,14 @@ class AnnotationManager:
 
             if confirm == QMessageBox.StandardButton.Yes:
                 annotation_id_to_delete = annotation_to_delete.id
-                initial_length = len(self.app.annotations)
-                self.app.annotations = [ann for ann in self.app.annotations if ann.id != annotation_id_to_delete]
-
-                if len(self.app.annotations) < initial_length:
-                    self.app.updateAnnotationTimeline()
-                    print(f"Deleted annotation: {annotation_to_delete.start_time:.2f}s - {annotation_to_delete.end_time:.2f}s (ID: {annotation_id_to_delete})")
-                else:
+                try:
+                    self.app.annotations.remove(annotation_to_delete)
+                except ValueError:
                     print(f"Error: Annotation with ID {annotation_id_to_delete} not found in main list for deletion.")
+                    return
+
+                self.history.push(RemoveCommand(annotation_to_delete))
+                print(f"Deleted annotation: {annotation_to_delete.start_time:.2f}s - {annotation_to_delete.end_time:.2f}s (ID: {annotation_id_to_delete})")
 
         else:
              QMessageBox.information(self.app, "Delete Label", "The playback position is not currently inside any annotation.")
@@ -203,47 +156,23 @@ class AnnotationManager:
     def moveToPreviousLabel(self):
         if not self.app.annotations:
             return
-        boundary_points = sorted(list(set(
-            p for ann in self.app.annotations for p in (ann.start_time, ann.end_time)
-        )))
-
-        current_time = self.app.media_player['_position'] / 1000.0
-        target_time = -1
-        tolerance = 0.05
-
-        for point in reversed(boundary_points):
-            if point < current_time - tolerance:
-                target_time = point
-                break
-        else:
-            target_time = 0
-
-        if target_time != -1:
-            self.app.setPosition(int(target_time * 1000))
+        tolerance_ms = 50
+        target_ms = self.app.annotations.previous_boundary(self.app.media_player['_position'], tolerance_ms)
+        self.app.setPosition(target_ms if target_ms is not None else 0)
 
     def moveToNextLabel(self):
         if not self.app.annotations:
             return
-        boundary_points = sorted(list(set(
-            p for ann in self.app.annotations for p in (ann.start_time, ann.end_time)
-        )))
-
-        current_time = self.app.media_player['_position'] / 1000.0
-        target_time = -1
-        tolerance = 0.05
-        for point in boundary_points:
-            if point > current_time + tolerance:
-                target_time = point
-                break
-
-        if target_time != -1:
-            self.app.setPosition(int(target_time * 1000))
+        tolerance_ms = 50
+        target_ms = self.app.annotations.next_boundary(self.app.media_player['_position'], tolerance_ms)
+        if target_ms is not None:
+            self.app.setPosition(target_ms)
 
     @autosave
     def mergeWithPrevious(self):
-        sorted_annotations = sorted(self.app.annotations, key=lambda x: x.start_time)
-        current_idx = self.get_current_annotation_index(sorted_annotations)
-        print("Current index of annotation being merged:", current_idx, sorted_annotations[current_idx] if current_idx != -1 else None)
+        annotations = self.app.annotations
+        current_idx = self.get_current_annotation_index()
+        print("Current index of annotation being merged:", current_idx, annotations[current_idx] if current_idx != -1 else None)
         if current_idx == -1:
             QMessageBox.information(self.app, "Merge Failed", "Cannot merge: No annotation at the current position.")
             return
@@ -252,8 +181,8 @@ class AnnotationManager:
             QMessageBox.information(self.app, "Merge Failed", "Cannot merge: No previous annotation exists.")
             return
 
-        current_annotation = sorted_annotations[current_idx]
-        prev_annotation = sorted_annotations[current_idx - 1]
+        current_annotation = annotations[current_idx]
+        prev_annotation = annotations[current_idx - 1]
         gap = current_annotation.start_time - prev_annotation.end_time
         if abs(gap) > 0.1:
             QMessageBox.warning(self.app, "Invalid Merge", f"Cannot merge: Annotations are not adjacent (Gap: {gap:.3f}s).")
@@ -272,34 +201,31 @@ class AnnotationManager:
             start_time=prev_annotation.start_time,
             end_time=current_annotation.end_time
         )
-        if current_annotation.comments:
+        if current_annotation.has_labels:
             merged_annotation.copy_comments_from(current_annotation)
-        elif prev_annotation.comments:
+        elif prev_annotation.has_labels:
             merged_annotation.copy_comments_from(prev_annotation)
 
         try:
-            annotations_to_remove_ids = {current_annotation.id, prev_annotation.id}
-            self.app.annotations = [ann for ann in self.app.annotations if ann.id not in annotations_to_remove_ids]
-
+            self.history.apply(CompoundCommand(
+                [RemoveCommand(current_annotation), RemoveCommand(prev_annotation), InsertCommand(merged_annotation)],
+                "Merge labels"), annotations)
         except ValueError:
-             print("Error: Could not remove original annotations during merge.")
+             print("Error: Could not merge annotations; they were left unchanged.")
              return
 
-        self.app.annotations.append(merged_annotation)
-        self.app.annotations.sort(key=lambda x: x.start_time)
         print(f"Merged annotations into: {merged_annotation.start_time:.3f}s - {merged_annotation.end_time:.3f}s")
-        self.app.updateAnnotationTimeline()
 
     @autosave
     def mergeWithNext(self):
-        sorted_annotations = sorted(self.app.annotations, key=lambda x: x.start_time)
-        current_idx = self.get_current_annotation_index(sorted_annotations)
-        if current_idx == -1 or current_idx >= len(sorted_annotations) - 1:
+        annotations = self.app.annotations
+        current_idx = self.get_current_annotation_index()
+        if current_idx == -1 or current_idx >= len(annotations) - 1:
             QMessageBox.information(self.app, "Merge Failed", "Cannot merge: No annotation at current position or no next annotation exists.")
             return
 
-        current_annotation = sorted_annotations[current_idx]
-        next_annotation = sorted_annotations[current_idx + 1]
+        current_annotation = annotations[current_idx]
+        next_annotation = annotations[current_idx + 1]
 
         gap = next_annotation.start_time - current_annotation.end_time
         if abs(gap) > 0.1:
@@ -321,34 +247,31 @@ class AnnotationManager:
             end_time=next_annotation.end_time
         )
 
-        if current_annotation.comments:
+        if current_annotation.has_labels:
             merged_annotation.copy_comments_from(current_annotation)
-        elif next_annotation.comments:
+        elif next_annotation.has_labels:
             merged_annotation.copy_comments_from(next_annotation)
 
         try:
-            annotations_to_remove_ids = {current_annotation.id, next_annotation.id}
-            self.app.annotations = [ann for ann in self.app.annotations if ann.id not in annotations_to_remove_ids]
+            self.history.apply(CompoundCommand(
+                [RemoveCommand(current_annotation), RemoveCommand(next_annotation), InsertCommand(merged_annotation)],
+                "Merge labels"), annotations)
         except ValueError:
-             print("Error: Could not remove original annotations during merge.")
+             print("Error: Could not merge annotations; they were left unchanged.")
              return
 
-        self.app.annotations.append(merged_annotation)
-        self.app.annotations.sort(key=lambda x: x.start_time)
         print(f"Merged annotations into: {merged_annotation.start_time:.3f}s - {merged_annotation.end_time:.3f}s")
-        self.app.updateAnnotationTimeline()
 
     @autosave
     def splitCurrentLabel(self):
         current_time = self.app.media_player['_position'] / 1000.0
-        sorted_annotations = sorted(self.app.annotations, key=lambda x: x.start_time)
-        current_idx = self.get_current_annotation_index(sorted_annotations)
+        current_idx = self.get_current_annotation_index()
 
         if current_idx == -1:
             QMessageBox.information(self.app, "Split Failed", "Cannot split: Playhead is not inside an annotation.")
             return
 
-        annotation_to_split = sorted_annotations[current_idx]
+        annotation_to_split = self.app.annotations[current_idx]
         min_duration = 0.1
         if not (annotation_to_split.start_time < current_time < annotation_to_split.end_time):
              QMessageBox.warning(self.app, "Invalid Split", "Split point must be strictly inside the annotation.")
@@ -364,8 +287,32 @@ class AnnotationManager:
         )
         new_annotation.copy_comments_from(annotation_to_split)
         original_end_time = annotation_to_split.end_time
-        annotation_to_split.end_time = current_time
-        self.app.annotations.append(new_annotation)
-        self.app.annotations.sort(key=lambda x: x.start_time)
+        self.history.apply(CompoundCommand(
+            [BoundsCommand(annotation_to_split, (annotation_to_split.start_time, original_end_time),
+                           (annotation_to_split.start_time, current_time)),
+             InsertCommand(new_annotation)],
+            "Split label"), self.app.annotations)
         print(f"Split annotation {annotation_to_split.start_time:.3f}s-{original_end_time:.3f}s at {current_time:.3f}s")
-        self.app.updateAnnotationTimeline()
\ No newline at end of file
+
+    @autosave
+    def record_bounds_change(self, annotation, old_bounds):
+        """Record an edge drag that has already been applied to the store"""
+        new_bounds = (annotation.start_time, annotation.end_time)
+        if new_bounds != tuple(old_bounds):
+            self.history.push(BoundsCommand(annotation, tuple(old_bounds), new_bounds))
+
+    @autosave
+    def undo(self):
+        command = self.history.undo(self.app.annotations)
+        if command is None:
+            print("Nothing to undo.")
+            return
+        print(f"Undo: {command.description}")
+
+    @autosave
+    def redo(self):
+        command = self.history.redo(self.app.annotations)
+        if command is None:
+            print("Nothing to redo.")
+            return
+        print(f"Redo: {command.description}")
@@ -0,0 +1,58 @@
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+from src.annotation_store import RESET
+
+
+class ChangeSet:
+    """Everything that changed in an AnnotationStore during one event-loop turn"""
+
+    def __init__(self):
+        self.kinds = set()
+        self.start_ms = None
+        self.end_ms = None
+        self.full = False
+
+    def add(self, kind, start_ms, end_ms):
+        self.kinds.add(kind)
+        if kind == RESET or start_ms is None:
+            self.full = True
+            return
+        self.start_ms = start_ms if self.start_ms is None else min(self.start_ms, start_ms)
+        self.end_ms = end_ms if self.end_ms is None else max(self.end_ms, end_ms)
+
+    def __repr__(self):
+        span = "all" if self.full else f"{self.start_ms}-{self.end_ms}ms"
+        return f"ChangeSet({', '.join(sorted(self.kinds))}: {span})"
+
+
+class AnnotationModel(QObject):
+    """
+    Signal surface over an AnnotationStore.
+
+    Store notifications are collected into a ChangeSet and emitted once from a
+    zero-interval timer, so a bulk edit (merge, undo of a compound step, loading
+    a file) reaches the views as a single changed signal with the union span.
+    """
+    changed = pyqtSignal(object)
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self._pending = None
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(self.flush)
+        store.subscribe(self._on_store_changed)
+
+    def _on_store_changed(self, kind, annotation, start_ms, end_ms):
+        if self._pending is None:
+            self._pending = ChangeSet()
+            self._timer.start()
+        self._pending.add(kind, start_ms, end_ms)
+
+    def flush(self):
+        """Emit pending changes now instead of waiting for the event loop"""
+        self._timer.stop()
+        change, self._pending = self._pending, None
+        if change is not None:
+            self.changed.emit(change)
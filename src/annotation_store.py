@@ -0,0 +1,377 @@
+from bisect import bisect_left, bisect_right, insort
+from heapq import merge
+from itertools import accumulate
+
+
+INSERTED = "inserted"
+REMOVED = "removed"
+MOVED = "moved"
+RELABELED = "relabeled"
+RESET = "reset"
+EXTENDED = "extended"
+
+# Records per snapshot chunk; a chunk is split once it grows past twice this
+CHUNK_SIZE = 64
+
+
+def to_ms(seconds):
+    """Convert a time in seconds to the store's integer-millisecond timebase"""
+    return int(round(seconds * 1000))
+
+
+def _start_key(annotation):
+    return to_ms(annotation.start_time)
+
+
+class AnnotationSnapshot:
+    """
+    Frozen, ordered view of an AnnotationStore, made of AnnotationRecords.
+
+    Nothing in a snapshot is ever modified after it is taken, so it can be
+    iterated and serialized from any thread without locking.
+    """
+    __slots__ = ("_chunks", "_count", "generation")
+
+    def __init__(self, chunks=(), count=0, generation=0):
+        self._chunks = chunks
+        self._count = count
+        self.generation = generation
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            yield from chunk
+
+    def to_dicts(self):
+        """Records in the labels.json/autosave format"""
+        return [record.to_dict() for record in self]
+
+
+class AnnotationStore:
+    """
+    Annotations kept ordered by start time on an integer-millisecond timebase.
+
+    Lookups by time, overlap checks, neighbour lookups and boundary navigation
+    are all binary searches. AnnotationManager keeps edited annotations from
+    overlapping, but loaded files may not, so time lookups search a running
+    maximum of end times rather than assuming that ordering by start also
+    orders by end.
+    Boundaries must only be changed through update_bounds() and labels through
+    set_labels() so the index stays valid and listeners see every change.
+
+    The annotations are also grouped into small chunks, each with a tuple of
+    frozen AnnotationRecords that is only built by snapshot(). A mutation just
+    drops the records of the chunk it touches, so edits never freeze anything
+    (or generate ids) and snapshot() refreezes only the chunks changed since the
+    previous one. It hands out the list of record tuples as is and marks it
+    shared; the next mutation copies that list of references first, so a
+    snapshot never sees later edits.
+
+    generation is bumped by every mutation, so equal generations mean equal contents.
+
+    Listeners are called as listener(kind, annotation, start_ms, end_ms) after each
+    mutation, with the time span whose rendering changed. RESET carries no
+    annotation and a None span, meaning everything changed; EXTENDED carries no
+    annotation and the span covered by the annotations extend() added.
+    """
+
+    def __init__(self, annotations=()):
+        self._listeners = []
+        self.generation = 0
+        self._items = []
+        self._start_keys = []
+        self._end_keys = []
+        self._max_end_keys = []
+        self._chunks = []
+        self._chunk_keys = []
+        self._records = []
+        self._records_shared = False
+        self.reset(annotations)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __bool__(self):
+        return bool(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __reversed__(self):
+        return reversed(self._items)
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def __contains__(self, annotation):
+        return self.index_of(annotation) != -1
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        self._listeners.remove(listener)
+
+    def reset(self, annotations=()):
+        """Replace the contents of the store, sorting once"""
+        self._rebuild(annotations)
+        self._notify(RESET, None, None, None)
+
+    def _rebuild(self, annotations):
+        self._items = sorted(annotations, key=lambda ann: to_ms(ann.start_time))
+        self._start_keys = [to_ms(ann.start_time) for ann in self._items]
+        self._end_keys = sorted(to_ms(ann.end_time) for ann in self._items)
+        self._max_end_keys = list(accumulate((to_ms(ann.end_time) for ann in self._items), max))
+        self._chunks = [self._items[i:i + CHUNK_SIZE] for i in range(0, len(self._items), CHUNK_SIZE)]
+        self._chunk_keys = [_start_key(chunk[0]) for chunk in self._chunks]
+        self._records = [None] * len(self._chunks)
+        self._records_shared = False
+
+    def clear(self):
+        self.reset()
+
+    def extend(self, annotations):
+        """
+        Add many annotations with a single EXTENDED notification spanning them.
+        Annotations that all start at or after the current last one are appended
+        without re-sorting what is already in the store.
+        """
+        added = sorted(annotations, key=lambda ann: to_ms(ann.start_time))
+        if not added:
+            return
+        start_keys = [to_ms(ann.start_time) for ann in added]
+        end_keys = sorted(to_ms(ann.end_time) for ann in added)
+        if self._start_keys and start_keys[0] < self._start_keys[-1]:
+            self._rebuild(self._items + added)
+            self._notify(EXTENDED, None, start_keys[0], end_keys[-1])
+            return
+        self._items.extend(added)
+        self._start_keys.extend(start_keys)
+        if self._end_keys and end_keys[0] < self._end_keys[-1]:
+            self._end_keys = list(merge(self._end_keys, end_keys))
+        else:
+            self._end_keys.extend(end_keys)
+        max_end_keys = accumulate((to_ms(ann.end_time) for ann in added), max)
+        if self._max_end_keys:
+            previous = self._max_end_keys[-1]
+            max_end_keys = (max(previous, key) for key in max_end_keys)
+        self._max_end_keys.extend(max_end_keys)
+        records = self._writable_records()
+        room = 0
+        if self._chunks and len(self._chunks[-1]) < CHUNK_SIZE:
+            room = CHUNK_SIZE - len(self._chunks[-1])
+            self._chunks[-1].extend(added[:room])
+            records[-1] = None
+        for i in range(room, len(added), CHUNK_SIZE):
+            self._chunks.append(added[i:i + CHUNK_SIZE])
+            self._chunk_keys.append(start_keys[i])
+            records.append(None)
+        self._notify(EXTENDED, None, start_keys[0], end_keys[-1])
+
+    def add(self, annotation):
+        index = self._insert(annotation)
+        self._notify(INSERTED, annotation, to_ms(annotation.start_time), to_ms(annotation.end_time))
+        return index
+
+    def remove(self, annotation):
+        index = self._detach(annotation)
+        self._notify(REMOVED, annotation, to_ms(annotation.start_time), to_ms(annotation.end_time))
+        return index
+
+    def index_of(self, annotation):
+        """Index of the given annotation object, or -1"""
+        start_key = to_ms(annotation.start_time)
+        index = bisect_left(self._start_keys, start_key)
+        while index < len(self._items) and self._start_keys[index] == start_key:
+            if self._items[index] is annotation:
+                return index
+            index += 1
+        return -1
+
+    def update_bounds(self, annotation, start_time=None, end_time=None):
+        """Move the edges of an annotation, keeping the index ordered"""
+        old_start, old_end = to_ms(annotation.start_time), to_ms(annotation.end_time)
+        index = self._detach(annotation)
+        if start_time is not None:
+            annotation.start_time = start_time
+        if end_time is not None:
+            annotation.end_time = end_time
+        self._insert(annotation)
+        self._notify(MOVED, annotation, min(old_start, to_ms(annotation.start_time)),
+                     max(old_end, to_ms(annotation.end_time)))
+        return index
+
+    def set_labels(self, annotation, labels):
+        """Replace the label record of an annotation in the store"""
+        chunk_index, _ = self._locate(annotation)
+        annotation.set_labels(labels)
+        self._writable_records()[chunk_index] = None
+        self._notify(RELABELED, annotation, to_ms(annotation.start_time), to_ms(annotation.end_time))
+
+    def snapshot(self):
+        """Immutable view of the current contents; freezes only the chunks changed since the last one"""
+        if None in self._records:
+            records = self._writable_records()
+            for chunk_index, chunk in enumerate(self._chunks):
+                if records[chunk_index] is None:
+                    records[chunk_index] = tuple(annotation.freeze() for annotation in chunk)
+        self._records_shared = True
+        return AnnotationSnapshot(self._records, len(self._items), self.generation)
+
+    def index_at(self, position_ms, tolerance_ms=1):
+        """Index of the first annotation containing position_ms, or -1"""
+        last = bisect_right(self._start_keys, position_ms + tolerance_ms) - 1
+        # The first index whose running end maximum reaches position_ms ends there itself
+        index = bisect_left(self._max_end_keys, position_ms - tolerance_ms)
+        return index if index <= last else -1
+
+    def find_at(self, position_ms, tolerance_ms=1):
+        index = self.index_at(position_ms, tolerance_ms)
+        return self._items[index] if index != -1 else None
+
+    def between(self, start_ms, end_ms):
+        """Annotations overlapping [start_ms, end_ms], in start order"""
+        first = bisect_left(self._max_end_keys, start_ms)
+        last = bisect_right(self._start_keys, end_ms)
+        return [annotation for annotation in self._items[first:last] if to_ms(annotation.end_time) >= start_ms]
+
+    def overlaps(self, start_ms, end_ms, exclude=None, tolerance_ms=1):
+        """True if [start_ms, end_ms] overlaps any annotation other than exclude"""
+        last = bisect_left(self._start_keys, end_ms - tolerance_ms)
+        index = bisect_right(self._max_end_keys, start_ms + tolerance_ms)
+        while index < last:
+            annotation = self._items[index]
+            if annotation is not exclude and start_ms < to_ms(annotation.end_time) - tolerance_ms:
+                return True
+            index += 1
+        return False
+
+    def neighbours(self, annotation):
+        """(previous, next) annotations around the given one; either may be None"""
+        index = self.index_of(annotation)
+        if index == -1:
+            return None, None
+        previous = self._items[index - 1] if index > 0 else None
+        following = self._items[index + 1] if index + 1 < len(self._items) else None
+        return previous, following
+
+    def previous_boundary(self, position_ms, tolerance_ms=0):
+        """Latest start or end boundary strictly before position_ms - tolerance_ms, or None"""
+        limit = position_ms - tolerance_ms
+        candidates = []
+        index = bisect_left(self._start_keys, limit)
+        if index > 0:
+            candidates.append(self._start_keys[index - 1])
+        index = bisect_left(self._end_keys, limit)
+        if index > 0:
+            candidates.append(self._end_keys[index - 1])
+        return max(candidates) if candidates else None
+
+    def next_boundary(self, position_ms, tolerance_ms=0):
+        """Earliest start or end boundary strictly after position_ms + tolerance_ms, or None"""
+        limit = position_ms + tolerance_ms
+        candidates = []
+        index = bisect_right(self._start_keys, limit)
+        if index < len(self._start_keys):
+            candidates.append(self._start_keys[index])
+        index = bisect_right(self._end_keys, limit)
+        if index < len(self._end_keys):
+            candidates.append(self._end_keys[index])
+        return min(candidates) if candidates else None
+
+    def _insert(self, annotation):
+        start_key = to_ms(annotation.start_time)
+        index = bisect_right(self._start_keys, start_key)
+        self._items.insert(index, annotation)
+        self._start_keys.insert(index, start_key)
+        insort(self._end_keys, to_ms(annotation.end_time))
+        self._max_end_keys.insert(index, None)
+        self._refresh_max_end(index, inserted=True)
+        self._insert_chunked(annotation)
+        return index
+
+    def _detach(self, annotation):
+        index = self.index_of(annotation)
+        if index == -1:
+            raise ValueError(f"{annotation} is not in the store")
+        del self._items[index]
+        del self._start_keys[index]
+        self._discard_end_key(to_ms(annotation.end_time))
+        del self._max_end_keys[index]
+        self._refresh_max_end(index, inserted=False)
+        self._remove_chunked(annotation)
+        return index
+
+    def _refresh_max_end(self, index, inserted):
+        """Recompute the running end maximum from index on, stopping once it matches the old values"""
+        running = self._max_end_keys[index - 1] if index > 0 else None
+        for position in range(index, len(self._items)):
+            end_key = to_ms(self._items[position].end_time)
+            value = end_key if running is None or end_key > running else running
+            if (position > index or not inserted) and self._max_end_keys[position] == value:
+                return
+            self._max_end_keys[position] = value
+            running = value
+
+    def _writable_records(self):
+        if self._records_shared:
+            self._records = list(self._records)
+            self._records_shared = False
+        return self._records
+
+    def _insert_chunked(self, annotation):
+        key = _start_key(annotation)
+        records = self._writable_records()
+        if not self._chunks:
+            self._chunks.append([annotation])
+            self._chunk_keys.append(key)
+            records.append(None)
+            return
+        chunk_index = max(0, bisect_right(self._chunk_keys, key) - 1)
+        chunk = self._chunks[chunk_index]
+        chunk.insert(bisect_right(chunk, key, key=_start_key), annotation)
+        self._chunk_keys[chunk_index] = _start_key(chunk[0])
+        records[chunk_index] = None
+        if len(chunk) > 2 * CHUNK_SIZE:
+            self._chunks[chunk_index:chunk_index + 1] = [chunk[:CHUNK_SIZE], chunk[CHUNK_SIZE:]]
+            self._chunk_keys.insert(chunk_index + 1, _start_key(chunk[CHUNK_SIZE]))
+            records.insert(chunk_index + 1, None)
+
+    def _remove_chunked(self, annotation):
+        chunk_index, position = self._locate(annotation)
+        chunk = self._chunks[chunk_index]
+        del chunk[position]
+        records = self._writable_records()
+        if chunk:
+            self._chunk_keys[chunk_index] = _start_key(chunk[0])
+            records[chunk_index] = None
+        else:
+            del self._chunks[chunk_index]
+            del self._chunk_keys[chunk_index]
+            del records[chunk_index]
+
+    def _locate(self, annotation):
+        """(chunk index, position) of annotation in the chunks"""
+        key = to_ms(annotation.start_time)
+        chunk_index = max(0, bisect_left(self._chunk_keys, key) - 1)
+        while chunk_index < len(self._chunks) and self._chunk_keys[chunk_index] <= key:
+            chunk = self._chunks[chunk_index]
+            position = bisect_left(chunk, key, key=_start_key)
+            while position < len(chunk) and _start_key(chunk[position]) == key:
+                if chunk[position] is annotation:
+                    return chunk_index, position
+                position += 1
+            chunk_index += 1
+        raise ValueError(f"{annotation} is not in the store")
+
+    def _notify(self, kind, annotation, start_ms, end_ms):
+        self.generation += 1
+        for listener in self._listeners:
+            listener(kind, annotation, start_ms, end_ms)
+
+    def _discard_end_key(self, end_key):
+        index = bisect_left(self._end_keys, end_key)
+        if index < len(self._end_keys) and self._end_keys[index] == end_key:
+            del self._end_keys[index]
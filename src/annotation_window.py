@@ -0,0 +1,231 @@
+import sqlite3
+from itertools import accumulate
+from src.annotation_store import RESET, to_ms
+from src.models import TimelineAnnotation
+
+# Coverage buckets per session; about one per pixel column of a full-width timeline
+MAX_COVERAGE_BUCKETS = 4096
+MIN_BUCKET_MS = 100
+
+
+class AnnotationWindow:
+    """
+    The annotations overlapping a time range, paged in from a store with between().
+
+    view() loads the requested range plus margin (a fraction of its length) on
+    each side and serves later requests that fall inside the loaded range from
+    that list, so panning a zoomed view only queries the store again once it
+    leaves the margin. Any store mutation (a new generation) drops the page.
+    """
+
+    def __init__(self, source, margin=0.5):
+        self.source = source
+        self.margin = margin
+        self._start_ms = None
+        self._end_ms = None
+        self._generation = None
+        self._annotations = []
+
+    def view(self, start_ms, end_ms):
+        """Annotations overlapping [start_ms, end_ms]; may include some from the margin"""
+        generation = getattr(self.source, 'generation', None)
+        if (self._start_ms is None or generation != self._generation
+                or start_ms < self._start_ms or end_ms > self._end_ms):
+            padding = int((end_ms - start_ms) * self.margin)
+            self._start_ms = start_ms - padding
+            self._end_ms = end_ms + padding
+            self._generation = generation
+            self._annotations = self.source.between(self._start_ms, self._end_ms)
+        return self._annotations
+
+    def invalidate(self):
+        self._start_ms = None
+        self._annotations = []
+
+
+class SessionPages:
+    """
+    between() over one session in a SessionStore, so an AnnotationWindow can page
+    annotations in from the database's (fingerprint, start_time) index instead
+    of holding on to the store's.
+
+    generation is the AnnotationStore generation the session was last written at
+    (from saved_generation(), None if unknown); pages only match the store while
+    the two are equal. A database error makes generation None from then on.
+    """
+
+    def __init__(self, session_store, fingerprint, saved_generation):
+        self.session_store = session_store
+        self.fingerprint = fingerprint
+        self.saved_generation = saved_generation
+        self.failed = False
+        self._max_length = 0
+        self._length_generation = None
+
+    @property
+    def generation(self):
+        return None if self.failed else self.saved_generation()
+
+    def between(self, start_ms, end_ms):
+        """Annotations overlapping [start_ms, end_ms], decoded from the session's records"""
+        try:
+            generation = self.generation
+            if generation != self._length_generation:
+                self._max_length = self.session_store.max_annotation_length(self.fingerprint)
+                self._length_generation = generation
+            records = self.session_store.annotations_between(
+                self.fingerprint, start_ms / 1000, end_ms / 1000, self._max_length)
+        except sqlite3.Error as e:
+            print(f"Failed to page annotations from the session database: {str(e)}")
+            self.failed = True
+            return []
+        return [TimelineAnnotation.from_dict(record) for record in records]
+
+
+class CoverageIndex:
+    """
+    Pre-aggregated labelled time per fixed-size bucket of the session.
+
+    Each bucket holds the milliseconds covered by annotations, the posture
+    covering most of it and the number of annotation starts and ends inside it.
+    Store notifications recompute only the buckets of the changed span (RESET
+    rebuilds everything), so drawing the full-length timeline costs O(buckets)
+    however many annotations the session has.
+    """
+
+    def __init__(self, store, max_buckets=MAX_COVERAGE_BUCKETS):
+        self.store = store
+        self.max_buckets = max_buckets
+        self.duration_ms = 0
+        self.bucket_ms = 0
+        self.covered = []
+        self.postures = []
+        self.boundaries = []
+        self._version = 0
+        self._columns = None
+        store.subscribe(self._on_store_changed)
+
+    @property
+    def ready(self):
+        return self.bucket_ms > 0
+
+    def set_duration(self, duration_ms):
+        """Size the buckets for a session of duration_ms and rebuild"""
+        duration_ms = int(duration_ms)
+        if duration_ms == self.duration_ms:
+            return
+        self.duration_ms = duration_ms
+        self._version += 1
+        if duration_ms <= 0:
+            self.bucket_ms = 0
+            self.covered, self.postures, self.boundaries = [], [], []
+            return
+        self.bucket_ms = max(MIN_BUCKET_MS, -(-duration_ms // self.max_buckets))
+        count = -(-duration_ms // self.bucket_ms)
+        self.covered = [0] * count
+        self.postures = [""] * count
+        self.boundaries = [0] * count
+        self._rebuild(0, count - 1)
+
+    def runs(self):
+        """
+        (start_ms, end_ms, posture, fraction) for each stretch of consecutive
+        non-empty buckets sharing a dominant posture; fraction is the share of
+        the stretch that is labelled
+        """
+        runs = []
+        run_start = None
+        covered = 0
+        posture = None
+        for index, bucket_covered in enumerate(self.covered):
+            bucket_posture = self.postures[index]
+            if run_start is not None and (not bucket_covered or bucket_posture != posture):
+                runs.append(self._run(run_start, index, posture, covered))
+                run_start = None
+            if bucket_covered and run_start is None:
+                run_start, covered, posture = index, 0, bucket_posture
+            covered += bucket_covered
+        if run_start is not None:
+            runs.append(self._run(run_start, len(self.covered), posture, covered))
+        return runs
+
+    def columns(self, width):
+        """
+        (postures, fractions, boundaries) for a full-length timeline width pixels
+        wide, one entry per pixel column: the posture covering most of the column
+        ("" if none), the labelled share of it and the number of annotation edges
+        in it. Columns are summed from prefix sums over the buckets, so this costs
+        O(buckets + width * postures); the result is cached until the index or
+        width changes.
+        """
+        if not self.ready or width <= 0:
+            return [], [], []
+        if self._columns is not None and self._columns[0] == (width, self._version):
+            return self._columns[1]
+        count = len(self.covered)
+        covered_sums = list(accumulate(self.covered, initial=0))
+        boundary_sums = list(accumulate(self.boundaries, initial=0))
+        posture_sums = {
+            posture: list(accumulate((covered if bucket_posture == posture else 0
+                                      for covered, bucket_posture in zip(self.covered, self.postures)), initial=0))
+            for posture in sorted(set(self.postures))
+        }
+        span = width * self.bucket_ms
+        postures, fractions, boundaries = [], [], []
+        for column in range(width):
+            first = min(count - 1, column * self.duration_ms // span)
+            stop = min(count, max(first + 1, -(-(column + 1) * self.duration_ms // span)))
+            covered = covered_sums[stop] - covered_sums[first]
+            length = min(stop * self.bucket_ms, self.duration_ms) - first * self.bucket_ms
+            fractions.append(min(1.0, covered / max(1, length)))
+            boundaries.append(boundary_sums[stop] - boundary_sums[first])
+            posture = ""
+            if covered:
+                posture = max(posture_sums, key=lambda name: posture_sums[name][stop] - posture_sums[name][first])
+            postures.append(posture)
+        result = postures, fractions, boundaries
+        self._columns = ((width, self._version), result)
+        return result
+
+    def _run(self, first, stop, posture, covered):
+        start_ms = first * self.bucket_ms
+        end_ms = min(stop * self.bucket_ms, self.duration_ms)
+        return start_ms, end_ms, posture, min(1.0, covered / max(1, end_ms - start_ms))
+
+    def _on_store_changed(self, kind, annotation, start_ms, end_ms):
+        if not self.ready:
+            return
+        if kind == RESET or start_ms is None:
+            self._rebuild(0, len(self.covered) - 1)
+        else:
+            self._rebuild(self._bucket(start_ms), self._bucket(end_ms))
+
+    def _bucket(self, position_ms):
+        return max(0, min(len(self.covered) - 1, position_ms // self.bucket_ms))
+
+    def _rebuild(self, first, last):
+        bucket_ms = self.bucket_ms
+        range_start = first * bucket_ms
+        range_end = (last + 1) * bucket_ms
+        posture_ms = [{} for _ in range(first, last + 1)]
+        covered = [0] * (last - first + 1)
+        boundaries = [0] * (last - first + 1)
+        for annotation in self.store.between(range_start, range_end):
+            for edge in (to_ms(annotation.start_time), to_ms(annotation.end_time)):
+                if range_start <= edge < range_end:
+                    boundaries[self._bucket(edge) - first] += 1
+            start = max(range_start, to_ms(annotation.start_time))
+            end = min(range_end, to_ms(annotation.end_time))
+            if end <= start:
+                continue
+            posture = annotation.labels.posture or ""
+            for bucket in range(self._bucket(start), self._bucket(end - 1) + 1):
+                overlap = min(end, (bucket + 1) * bucket_ms) - max(start, bucket * bucket_ms)
+                if overlap > 0:
+                    covered[bucket - first] += overlap
+                    totals = posture_ms[bucket - first]
+                    totals[posture] = totals.get(posture, 0) + overlap
+        self.covered[first:last + 1] = covered
+        self.boundaries[first:last + 1] = boundaries
+        self._version += 1
+        self.postures[first:last + 1] = [max(totals, key=totals.get) if totals else "" for totals in posture_ms]
@@ -0,0 +1,124 @@
+import csv
+import io
+import os
+from zipfile import ZipFile, is_zipfile
+from src.models import AnnotationLabels, TimelineAnnotation
+from src.vocabulary import CAT_BP, CAT_ES, CAT_HLB, CAT_PA, CAT_POSTURE, CATEGORIES, EMPTY_ID, EXPORT_FILES, get_vocabulary
+
+# Event order at equal times: rows ending there are closed before rows starting there
+_END = 0
+_START = 1
+
+# Category indexes used in sweep events
+_CATEGORY_INDEX = {category: index for index, category in enumerate(CATEGORIES)}
+
+
+def _category_streams(source):
+    """(category, text stream) for every category CSV in an export ZIP or a directory"""
+    if os.path.isdir(source):
+        for category, (filename, _) in EXPORT_FILES.items():
+            path = os.path.join(source, filename)
+            if os.path.exists(path):
+                with open(path, 'r', newline='', encoding='utf-8') as f:
+                    yield category, f
+        return
+    if not is_zipfile(source):
+        raise ValueError(f"{os.path.basename(source)} is neither an export ZIP nor a folder")
+    with ZipFile(source) as archive:
+        names = {os.path.basename(name): name for name in archive.namelist()}
+        for category, (filename, _) in EXPORT_FILES.items():
+            if filename in names:
+                with archive.open(names[filename]) as raw:
+                    yield category, io.TextIOWrapper(raw, encoding='utf-8', newline='')
+
+
+def read_category_events(source):
+    """
+    Stream the category CSVs into sweep events (time, kind, category index,
+    value ID). Rows are read with csv.reader and reduced to one tuple per edge,
+    so no per-row dicts or label strings are kept.
+    """
+    vocabulary = get_vocabulary()
+    events = []
+    files = 0
+    for category, stream in _category_streams(source):
+        files += 1
+        category_index = _CATEGORY_INDEX[category]
+        reader = csv.reader(stream)
+        header = next(reader, None)
+        if header is None:
+            continue
+        try:
+            start_col, stop_col, value_col = (header.index(name) for name in ('START_TIME', 'STOP_TIME', 'PREDICTION'))
+        except ValueError:
+            raise ValueError(f"{EXPORT_FILES[category][0]} is missing START_TIME, STOP_TIME or PREDICTION")
+        for row in reader:
+            try:
+                start, stop, value = float(row[start_col]), float(row[stop_col]), row[value_col]
+            except (IndexError, ValueError):
+                print(f"Skipping malformed row in {EXPORT_FILES[category][0]}: {row}")
+                continue
+            if stop <= start or not value:
+                continue
+            value_id = vocabulary.intern(category, value)
+            events.append((start, _START, category_index, value_id))
+            events.append((stop, _END, category_index, value_id))
+    if not files:
+        raise ValueError("No category CSV files found")
+    return events
+
+
+def sweep_segments(events):
+    """
+    Merge category events into non-overlapping annotations in one pass over the
+    sorted events, splitting at every boundary of any category. Where rows of a
+    single-value category overlap, the one that started last wins.
+    """
+    events.sort()
+    active = [[] for _ in CATEGORIES]
+    open_count = 0
+    annotations = []
+    previous_time = None
+    index = 0
+    while index < len(events):
+        time = events[index][0]
+        if open_count and previous_time is not None and time > previous_time:
+            annotations.append(_segment(previous_time, time, active))
+        while index < len(events) and events[index][0] == time:
+            _, kind, category_index, value_id = events[index]
+            values = active[category_index]
+            if kind == _START:
+                values.append(value_id)
+                open_count += 1
+            else:
+                # Remove the most recent occurrence, matching the start it closes
+                position = len(values) - 1 - values[::-1].index(value_id)
+                del values[position]
+                open_count -= 1
+            index += 1
+        previous_time = time
+    return annotations
+
+
+def _segment(start, end, active):
+    def single(category):
+        values = active[_CATEGORY_INDEX[category]]
+        return values[-1] if values else EMPTY_ID
+
+    def multi(category):
+        return tuple(dict.fromkeys(active[_CATEGORY_INDEX[category]]))
+
+    annotation = TimelineAnnotation(start, end)
+    annotation.set_labels(AnnotationLabels(
+        posture_id=single(CAT_POSTURE),
+        hlb_ids=multi(CAT_HLB),
+        pa_type_id=single(CAT_PA),
+        behavioral_param_ids=multi(CAT_BP),
+        exp_situation_id=single(CAT_ES),
+    ))
+    return annotation
+
+
+def import_category_csvs(source):
+    """TimelineAnnotations rebuilt from the category CSVs of an export ZIP or folder, in start order"""
+    return sweep_segments(read_category_events(source))
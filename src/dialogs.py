@@ -9,17 +9,13 @@ from PyQt6.QtWidgets import (QApplication, QDialog, QVBoxLayout, QHBoxLayout, QL
 from PyQt6.QtCore import Qt, pyqtSignal, QSize, QRect, QPoint, QTimer, QSettings
 from PyQt6.QtGui import QKeyEvent
 from src.utils import resource_path
+from src.vocabulary import CAT_POSTURE, CAT_HLB, CAT_PA, CAT_BP, CAT_ES
 
 # Constants
 APP_NAME = "PAAWS-Annotation-Software"
 ORGANIZATION_NAME = "PAAWS"
 SETTINGS_DISABLE_ALERTS = "disableAlerts"
 
-CAT_POSTURE = "POSTURE"
-CAT_HLB = "HIGH LEVEL BEHAVIOR"
-CAT_PA = "PA TYPE"
-CAT_BP = "Behavioral Parameters"
-CAT_ES = "Experimental situation"
 CAT_NOTES = "Special Notes"
 
 class FlowLayout(QLayout):
@@ -376,12 +372,8 @@ class AnnotationDialog(QDialog):
         dialog_layout = QVBoxLayout(self); dialog_layout.setContentsMargins(0, 0, 0, 0); dialog_layout.addWidget(main_scroll)
     
     def _get_initial_data(self, annotation):
-        if annotation and hasattr(annotation, 'comments') and annotation.comments:
-            try:
-                return json.loads(annotation.comments[0]["body"])
-            except Exception as e:
-                QMessageBox.critical(self, "Load Error", f"Failed to parse annotation: {e}")
-                return None
+        if annotation and hasattr(annotation, 'labels'):
+            return annotation.labels.to_items()
         elif hasattr(self.parent(), "annotation_manager") and hasattr(self.parent().annotation_manager, "last_used_labels"):
             d = self.parent().annotation_manager.last_used_labels
             if any(v for k, v in d.items() if k != "special_notes" or v):
@@ -0,0 +1,233 @@
+import csv
+import io
+import json
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+from src.models import SCHEMA_V1, SCHEMA_V2, SCHEMA_VERSION
+from src.vocabulary import CAT_BP, CAT_ES, CAT_HLB, CAT_PA, CAT_POSTURE, EMPTY_ID, EXPORT_CSV_HEADER, EXPORT_FILES, get_vocabulary
+
+# zlib level for exported ZIPs; 0 stores members uncompressed
+DEFAULT_COMPRESSION_LEVEL = 6
+# Records between progress callbacks
+PROGRESS_INTERVAL = 1000
+# Exporter output kept in memory before spilling to a temp file
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+COPY_CHUNK_BYTES = 1 << 20
+
+# AnnotationLabels field holding each category's value IDs, and whether it holds a tuple of them
+CATEGORY_LABEL_IDS = {
+    CAT_POSTURE: ("posture_id", False),
+    CAT_HLB: ("hlb_ids", True),
+    CAT_PA: ("pa_type_id", False),
+    CAT_BP: ("behavioral_param_ids", True),
+    CAT_ES: ("exp_situation_id", False),
+}
+
+
+class ExportCancelled(Exception):
+    """Raised inside write_export when is_cancelled() turns true"""
+
+
+@dataclass(frozen=True, slots=True)
+class ExportContext:
+    """What every exporter of one export gets to see besides the annotations"""
+    video_hash: int = 0
+    schema: int = SCHEMA_VERSION
+    count: int = 0
+
+
+@dataclass(frozen=True, slots=True)
+class ExportAnnotation:
+    """
+    An AnnotationRecord with its labels decoded once for all exporters:
+    values maps each category to the tuple of its non-empty label values.
+    """
+    record: object
+    values: dict
+
+    @property
+    def start_time(self):
+        return self.record.start_time
+
+    @property
+    def end_time(self):
+        return self.record.end_time
+
+
+class Exporter(ABC):
+    """
+    One member of an export ZIP, fed from a single pass over a snapshot.
+
+    write_export calls begin() once, write() for every annotation in start
+    order and end() after the last one. Whatever is written to the text stream
+    handed to begin() becomes the archive member named member; an exporter that
+    writes nothing produces no member.
+    """
+    member = None
+
+    def begin(self, stream, context):
+        self.stream = stream
+        self.context = context
+
+    @abstractmethod
+    def write(self, annotation):
+        """Write one ExportAnnotation"""
+
+    def end(self):
+        pass
+
+
+class LabelsJsonExporter(Exporter):
+    """labels.json, written record by record; the same text as json.dumps(annotations_to_document(...), indent=4)"""
+    member = "labels.json"
+
+    def begin(self, stream, context):
+        super().begin(stream, context)
+        if context.schema not in (SCHEMA_V1, SCHEMA_V2):
+            raise ValueError(f"Unknown labels schema {context.schema}")
+        stream.write("{\n")
+        if context.schema == SCHEMA_V2:
+            stream.write(f'    "schema": {SCHEMA_V2},\n    "videohash": {json.dumps(context.video_hash)},\n')
+        stream.write('    "annotations": [')
+        self._written = 0
+
+    def write(self, annotation):
+        record = annotation.record
+        data = record.to_dict() if self.context.schema == SCHEMA_V1 else record.to_v2_dict()
+        self.stream.write(",\n        " if self._written else "\n        ")
+        self.stream.write(json.dumps(data, indent=4).replace("\n", "\n        "))
+        self._written += 1
+
+    def end(self):
+        self.stream.write("\n    ]" if self._written else "]")
+        if self.context.schema == SCHEMA_V1:
+            self.stream.write(f',\n    "videohash": {json.dumps(self.context.video_hash)}')
+        self.stream.write("\n}")
+
+
+class CategoryCsvExporter(Exporter):
+    """The per-category CSV (posture.csv, ...), one row per label value"""
+
+    def __init__(self, category):
+        self.category = category
+        self.member, self.labelset = EXPORT_FILES[category]
+        self._writer = None
+
+    def write(self, annotation):
+        for value in annotation.values[self.category]:
+            if self._writer is None:
+                self._writer = csv.writer(self.stream)
+                self._writer.writerow(EXPORT_CSV_HEADER)
+            start, end = annotation.start_time, annotation.end_time
+            self._writer.writerow([start, end, value, 'human', self.labelset, start, end])
+
+
+# Exporter factories by name, in the order their members are written
+EXPORTERS = {}
+
+
+def register_exporter(name, factory):
+    """Add an exporter to every export; factory() returns a new Exporter for each export"""
+    if name in EXPORTERS:
+        raise ValueError(f"Exporter {name} is already registered")
+    EXPORTERS[name] = factory
+
+
+register_exporter(LabelsJsonExporter.member, LabelsJsonExporter)
+for _category, (_filename, _) in EXPORT_FILES.items():
+    register_exporter(_filename, lambda category=_category: CategoryCsvExporter(category))
+
+
+def decode_annotations(records):
+    """ExportAnnotations for records, decoding label IDs through one vocabulary lookup table per category"""
+    vocabulary = get_vocabulary()
+    tables = [(category, attribute, multi, vocabulary.values(category))
+              for category, (attribute, multi) in CATEGORY_LABEL_IDS.items()]
+    for record in records:
+        values = {}
+        for category, attribute, multi, table in tables:
+            ids = getattr(record.labels, attribute)
+            values[category] = tuple(table[value_id] for value_id in (ids if multi else (ids,)) if value_id != EMPTY_ID)
+        yield ExportAnnotation(record, values)
+
+
+def write_export(path, records, video_hash=0, schema=SCHEMA_VERSION, compression_level=DEFAULT_COMPRESSION_LEVEL,
+                 exporters=None, progress=None, is_cancelled=None):
+    """
+    Write an export ZIP with one member per exporter (names from EXPORTERS,
+    all of them by default).
+
+    The snapshot is decoded and fed to every exporter in a single pass. A ZIP
+    only takes one member at a time, so each exporter writes to its own spooled
+    temp file, which is then streamed into ZipFile.open(member, 'w'). The
+    archive is written to a temp file that replaces path only once complete;
+    on cancellation or error path is left untouched. progress(percent) is
+    called as the export advances and is_cancelled() is polled at the same
+    points. Returns False if cancelled.
+    """
+    records = list(records)
+    context = ExportContext(video_hash, schema, len(records))
+    active = [EXPORTERS[name]() for name in (EXPORTERS if exporters is None else exporters)]
+
+    def check(percent):
+        if is_cancelled is not None and is_cancelled():
+            raise ExportCancelled()
+        if progress is not None:
+            progress(percent)
+
+    spools = []
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".", suffix=".tmp")
+    os.close(fd)
+    try:
+        for exporter in active:
+            spool = io.TextIOWrapper(tempfile.SpooledTemporaryFile(SPOOL_MAX_BYTES), encoding='utf-8', newline='')
+            spools.append(spool)
+            exporter.begin(spool, context)
+        for index, annotation in enumerate(decode_annotations(records)):
+            if index % PROGRESS_INTERVAL == 0:
+                check(50 * index // max(1, len(records)))
+            for exporter in active:
+                exporter.write(annotation)
+        for exporter in active:
+            exporter.end()
+        _write_members(tmp_path, active, spools, compression_level, check)
+        check(100)
+        os.replace(tmp_path, path)
+    except ExportCancelled:
+        os.remove(tmp_path)
+        return False
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    finally:
+        for spool in spools:
+            spool.close()
+    return True
+
+
+def _write_members(path, exporters, spools, compression_level, check):
+    """Stream each non-empty spool into its member, reporting progress from 50 to 100 by bytes copied"""
+    sizes = []
+    for spool in spools:
+        spool.flush()
+        sizes.append(spool.buffer.tell())
+    total = max(1, sum(sizes))
+    copied = 0
+    compression = ZIP_DEFLATED if compression_level else ZIP_STORED
+    with ZipFile(path, 'w', compression, compresslevel=compression_level or None) as zipf:
+        for exporter, spool, size in zip(exporters, spools, sizes):
+            if not size:
+                continue
+            source = spool.buffer
+            source.seek(0)
+            with zipf.open(exporter.member, 'w') as target:
+                while chunk := source.read(COPY_CHUNK_BYTES):
+                    target.write(chunk)
+                    copied += len(chunk)
+                    check(50 + 50 * copied // total)
@@ -0,0 +1,147 @@
+from abc import ABC, abstractmethod
+from collections import deque
+
+
+class Command(ABC):
+    """A reversible change to an AnnotationStore that records only its own delta"""
+    description = ""
+
+    @abstractmethod
+    def apply(self, store):
+        """Make the change to the store"""
+
+    @abstractmethod
+    def revert(self, store):
+        """Undo the change made by apply()"""
+
+
+class InsertCommand(Command):
+    def __init__(self, annotation, description="Create label"):
+        self.annotation = annotation
+        self.description = description
+
+    def apply(self, store):
+        store.add(self.annotation)
+
+    def revert(self, store):
+        store.remove(self.annotation)
+
+
+class RemoveCommand(Command):
+    def __init__(self, annotation, description="Delete label"):
+        self.annotation = annotation
+        self.description = description
+
+    def apply(self, store):
+        store.remove(self.annotation)
+
+    def revert(self, store):
+        store.add(self.annotation)
+
+
+class BoundsCommand(Command):
+    def __init__(self, annotation, old_bounds, new_bounds, description="Move label edge"):
+        self.annotation = annotation
+        self.old_bounds = old_bounds
+        self.new_bounds = new_bounds
+        self.description = description
+
+    def apply(self, store):
+        store.update_bounds(self.annotation, *self.new_bounds)
+
+    def revert(self, store):
+        store.update_bounds(self.annotation, *self.old_bounds)
+
+
+class RelabelCommand(Command):
+    def __init__(self, annotation, old_labels, new_labels, description="Edit labels"):
+        self.annotation = annotation
+        self.old_labels = old_labels
+        self.new_labels = new_labels
+        self.description = description
+
+    def apply(self, store):
+        store.set_labels(self.annotation, self.new_labels)
+
+    def revert(self, store):
+        store.set_labels(self.annotation, self.old_labels)
+
+
+class CompoundCommand(Command):
+    """
+    Several commands applied in order and reverted in reverse order as one undo step.
+    If one of them fails, those already applied are reverted before the error propagates.
+    """
+
+    def __init__(self, commands, description):
+        self.commands = tuple(commands)
+        self.description = description
+
+    def apply(self, store):
+        applied = []
+        try:
+            for command in self.commands:
+                command.apply(store)
+                applied.append(command)
+        except Exception:
+            for command in reversed(applied):
+                command.revert(store)
+            raise
+
+    def revert(self, store):
+        for command in reversed(self.commands):
+            command.revert(store)
+
+
+class UndoHistory:
+    """
+    Undo/redo stacks of delta commands.
+
+    Each entry holds a fixed handful of references (the affected annotations,
+    their old/new bounds or label records), so its size does not depend on the
+    session size. max_entries caps memory; the oldest entries are evicted first.
+    """
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._undo = deque(maxlen=max_entries)
+        self._redo = []
+
+    def push(self, command):
+        """Record a command that has already been applied"""
+        self._undo.append(command)
+        self._redo.clear()
+
+    def apply(self, command, store):
+        """Apply a command to the store and record it; nothing is recorded if it raises"""
+        command.apply(store)
+        self.push(command)
+
+    def undo(self, store):
+        if not self._undo:
+            return None
+        command = self._undo.pop()
+        command.revert(store)
+        self._redo.append(command)
+        return command
+
+    def redo(self, store):
+        if not self._redo:
+            return None
+        command = self._redo.pop()
+        command.apply(store)
+        self._undo.append(command)
+        return command
+
+    def can_undo(self):
+        return bool(self._undo)
+
+    def can_redo(self):
+        return bool(self._redo)
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+
+    def __len__(self):
+        return len(self._undo)
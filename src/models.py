@@ -1,61 +1,419 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import json
+import sys
+import time
 import uuid
 from datetime import datetime
+from src.vocabulary import get_vocabulary, EMPTY_ID, CAT_POSTURE, CAT_HLB, CAT_PA, CAT_BP, CAT_ES
+
+# (update_comment_body keyword, comment body category) in the order they are written to comments[0]["body"]
+LABEL_FIELDS = (
+    ("posture", CAT_POSTURE),
+    ("hlb", CAT_HLB),
+    ("pa_type", CAT_PA),
+    ("behavioral_params", CAT_BP),
+    ("exp_situation", CAT_ES),
+    ("special_notes", "Special Notes"),
+)
+MULTI_VALUE_FIELDS = ("hlb", "behavioral_params")
+
+# labels.json schema versions; files without a "schema" key are version 1
+SCHEMA_V1 = 1
+SCHEMA_V2 = 2
+SCHEMA_VERSION = SCHEMA_V2
+
+
+@dataclass(frozen=True, slots=True)
+class AnnotationLabels:
+    """
+    Labels of an annotation as vocabulary IDs, parsed from comments[0]["body"].
+
+    Category values are stored as integer IDs from the shared LabelVocabulary, so
+    comparing two records never touches strings. The decoding properties
+    (posture, hlb, ...) are meant for export, display and the label dialog.
+    """
+    posture_id: int = EMPTY_ID
+    hlb_ids: tuple = ()
+    pa_type_id: int = EMPTY_ID
+    behavioral_param_ids: tuple = ()
+    exp_situation_id: int = EMPTY_ID
+    special_notes: str = ""
+
+    @classmethod
+    def from_values(cls, posture="", hlb=(), pa_type="", behavioral_params=(), exp_situation="", special_notes=""):
+        vocabulary = get_vocabulary()
+        return cls(
+            posture_id=vocabulary.intern(CAT_POSTURE, _single_value(posture)),
+            hlb_ids=vocabulary.intern_many(CAT_HLB, _multi_value(hlb)),
+            pa_type_id=vocabulary.intern(CAT_PA, _single_value(pa_type)),
+            behavioral_param_ids=vocabulary.intern_many(CAT_BP, _multi_value(behavioral_params)),
+            exp_situation_id=vocabulary.intern(CAT_ES, _single_value(exp_situation)),
+            special_notes=_single_value(special_notes),
+        )
+
+    @classmethod
+    def from_body(cls, body):
+        """Parse a comment body, returning an empty record if it is malformed"""
+        try:
+            items = json.loads(body)
+            data_map = {item.get("category"): item.get("selectedValue") for item in items}
+        except (json.JSONDecodeError, TypeError, AttributeError):
+            return cls()
+        return cls.from_values(**{field: data_map.get(category) for field, category in LABEL_FIELDS})
+
+    @property
+    def posture(self):
+        return get_vocabulary().decode(CAT_POSTURE, self.posture_id)
+
+    @property
+    def hlb(self):
+        return get_vocabulary().decode_many(CAT_HLB, self.hlb_ids)
+
+    @property
+    def pa_type(self):
+        return get_vocabulary().decode(CAT_PA, self.pa_type_id)
+
+    @property
+    def behavioral_params(self):
+        return get_vocabulary().decode_many(CAT_BP, self.behavioral_param_ids)
+
+    @property
+    def exp_situation(self):
+        return get_vocabulary().decode(CAT_ES, self.exp_situation_id)
+
+    @property
+    def hlb_mask(self):
+        """High level behaviours as a bitset of vocabulary IDs, ignoring order"""
+        mask = 0
+        for value_id in self.hlb_ids:
+            mask |= 1 << value_id
+        return mask
+
+    def primary_key(self):
+        """Posture, HLB set and PA type; two records with equal keys carry the same primary labels"""
+        return self.posture_id, self.hlb_mask, self.pa_type_id
+
+    def to_items(self):
+        return [{"category": category, "selectedValue": getattr(self, field)} for field, category in LABEL_FIELDS]
+
+    def to_body(self):
+        return json.dumps(self.to_items())
+
+    def as_kwargs(self):
+        """Keyword arguments for TimelineAnnotation.update_comment_body"""
+        return {field: getattr(self, field) for field, _ in LABEL_FIELDS}
+
+    def to_structured(self):
+        """Schema v2 "labels" object; empty values are left out"""
+        return {field: value for field, value in self.as_kwargs().items() if value}
+
+    @classmethod
+    def from_structured(cls, labels):
+        return cls.from_values(**{field: labels[field] for field, _ in LABEL_FIELDS if field in labels})
+
+
+def _single_value(value):
+    return sys.intern(value) if isinstance(value, str) else ""
+
+
+def _multi_value(value):
+    return [v for v in value if isinstance(v, str)] if isinstance(value, (list, tuple)) else []
+
+
+EMPTY_LABELS = AnnotationLabels()
+DEFAULT_SHAPE = {"x1": None, "x2": None, "y1": None, "y2": None}
+
+
+def _compact_meta(meta):
+    """Reduce the default comment meta to its datetime string; anything else is kept as is"""
+    if (isinstance(meta, dict) and meta.keys() == {"datetime", "user_id", "user_name"}
+            and meta["user_id"] == "NA" and meta["user_name"] == "NA" and isinstance(meta["datetime"], str)):
+        return meta["datetime"]
+    return meta
+
+
+def _make_comment(comment_id, meta, created, labels):
+    if meta is None:
+        meta = datetime.fromtimestamp(created).isoformat()
+    if isinstance(meta, str):
+        meta = {
+            "datetime": meta,
+            "user_id": "NA",
+            "user_name": "NA"
+        }
+    return {
+        "id": comment_id,
+        "meta": meta,
+        "body": "[]" if labels is None else labels.to_body()
+    }
+
+
+@dataclass(frozen=True, slots=True)
+class AnnotationRecord:
+    """
+    Immutable copy of an annotation's state, produced by TimelineAnnotation.freeze().
+
+    Records are what AnnotationStore snapshots hold, so worker threads can
+    serialize them while the live annotations keep changing. comments is None
+    for compact annotations, whose comment is rebuilt from the other fields.
+    source is the live annotation, kept for the store's bookkeeping only.
+    """
+    id: str
+    start_time: float
+    end_time: float
+    labels: AnnotationLabels
+    shape: dict = None
+    comment_id: str = None
+    comment_meta: object = None
+    created: float = 0.0
+    comments: tuple = None
+    source: object = field(default=None, compare=False, repr=False)
+
+    def to_dict(self):
+        """Same record as TimelineAnnotation.to_dict() at the time the record was taken"""
+        if self.comments is not None:
+            comments = list(self.comments)
+        else:
+            comments = [_make_comment(self.comment_id, self.comment_meta, self.created, self.labels)]
+        return {
+            "id": self.id,
+            "range": {
+                "start": self.start_time,
+                "end": self.end_time
+            },
+            "shape": self.shape if self.shape is not None else dict(DEFAULT_SHAPE),
+            "comments": comments
+        }
+
+    def to_v2_dict(self):
+        """
+        Schema v2 record: labels as a structured object instead of a JSON string in
+        comments[0]["body"]. "labels" is null for an annotation that was never
+        labelled, shape is only written when it is not the default, and comment
+        lists that do not fit the single generated comment are kept as "comments".
+        """
+        data = {"id": self.id, "range": {"start": self.start_time, "end": self.end_time}}
+        if self.shape is not None and self.shape != DEFAULT_SHAPE:
+            data["shape"] = self.shape
+        if self.comments is None:
+            meta = self.comment_meta
+            if meta is None:
+                meta = datetime.fromtimestamp(self.created).isoformat()
+            data["labels"] = self.labels.to_structured()
+            data["comment"] = {"id": self.comment_id, "meta": meta}
+        elif (len(self.comments) == 1 and self.comments[0].keys() == {"id", "meta", "body"}
+                and self.comments[0]["body"] == "[]"):
+            data["labels"] = None
+            data["comment"] = {"id": self.comments[0]["id"], "meta": _compact_meta(self.comments[0]["meta"])}
+        else:
+            data["comments"] = list(self.comments)
+        return data
+
 
-@dataclass
 class TimelineAnnotation:
+    """
+    A labelled time range.
+
+    Instances are slotted and start out compact: the comment list and shape dict
+    used by the on-disk format are only built when they are accessed. Until then
+    the label record, comment id and comment meta are held directly.
+    """
+    __slots__ = ("start_time", "end_time", "_id", "_shape", "_comments",
+                 "_comment_id", "_comment_meta", "_created", "_labels", "_labels_body")
+
     def __init__(self, start_time=0, end_time=0):
-        self.id = str(uuid.uuid4())
         self.start_time = start_time
         self.end_time = end_time
-        self.shape = {
-            "x1": None,
-            "x2": None,
-            "y1": None,
-            "y2": None
-        }
-        self.comments = []
-        self._add_initial_comment()
-        
-    def _add_initial_comment(self):
-        comment = {
-            "id": str(uuid.uuid4()),
-            "meta": {
-                "datetime": datetime.now().isoformat(),
-                "user_id": "NA",
-                "user_name": "NA"
+        self._id = None
+        self._shape = None
+        self._comments = None
+        self._comment_id = None
+        self._comment_meta = None
+        self._created = time.time()
+        self._labels = None
+        self._labels_body = None
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Build an annotation from a labels.json/autosave record of either schema
+        without generating throwaway comments
+        """
+        annotation = cls(data["range"]["start"], data["range"]["end"])
+        annotation._id = data["id"]
+        shape = data.get("shape")
+        annotation._shape = None if shape == DEFAULT_SHAPE else shape
+        if "comment" in data and "comments" not in data:
+            comment = data["comment"] or {}
+            labels = data.get("labels")
+            annotation._comment_id = comment.get("id")
+            annotation._comment_meta = _compact_meta(comment.get("meta"))
+            annotation._labels = None if labels is None else AnnotationLabels.from_structured(labels)
+            return annotation
+        comments = data.get("comments", [])
+        if len(comments) == 1 and comments[0].keys() == {"id", "meta", "body"}:
+            comment = comments[0]
+            body = comment["body"]
+            labels = None if body == "[]" else AnnotationLabels.from_body(body)
+            if labels is None or labels.to_body() == body:
+                meta = comment["meta"]
+                annotation._comment_id = comment["id"]
+                annotation._comment_meta = _compact_meta(meta)
+                annotation._labels = labels
+                return annotation
+        annotation._comments = comments
+        return annotation
+
+    def to_dict(self):
+        """Record in the labels.json/autosave format; does not materialize comments on the annotation"""
+        return {
+            "id": self.id,
+            "range": {
+                "start": self.start_time,
+                "end": self.end_time
             },
-            "body": "[]"
+            "shape": self.shape,
+            "comments": self._comments if self._comments is not None else [self._build_comment()]
         }
-        self.comments.append(comment)
-        
+
+    def to_v2_dict(self):
+        return self.freeze().to_v2_dict()
+
+    def freeze(self):
+        """Immutable AnnotationRecord of the current state"""
+        if self._comments is not None:
+            comments = tuple(dict(comment) for comment in self._comments)
+        elif self._labels is None:
+            comments = (self._build_comment(),)
+        else:
+            comments = None
+            if self._comment_id is None:
+                self._comment_id = str(uuid.uuid4())
+        return AnnotationRecord(self.id, self.start_time, self.end_time, self.labels, self._shape,
+                                self._comment_id, self._comment_meta, self._created, comments, self)
+
+    @property
+    def id(self):
+        if self._id is None:
+            self._id = str(uuid.uuid4())
+        return self._id
+
+    @id.setter
+    def id(self, value):
+        self._id = value
+
+    @property
+    def shape(self):
+        if self._shape is None:
+            self._shape = {
+                "x1": None,
+                "x2": None,
+                "y1": None,
+                "y2": None
+            }
+        return self._shape
+
+    @shape.setter
+    def shape(self, value):
+        self._shape = value
+
+    @property
+    def comments(self):
+        if self._comments is None:
+            comment = self._build_comment()
+            self._comments = [comment]
+            self._labels = self.labels
+            self._labels_body = comment["body"]
+        return self._comments
+
+    @comments.setter
+    def comments(self, value):
+        self._comments = value
+        self.invalidate_labels()
+
+    @property
+    def has_labels(self):
+        """bool(comments), without building the comment of a compact annotation"""
+        return self._comments is None or bool(self._comments)
+
+    def _build_comment(self):
+        if self._comment_id is None:
+            self._comment_id = str(uuid.uuid4())
+        return _make_comment(self._comment_id, self._comment_meta, self._created, self._labels)
+
     def copy_comments_from(self, source_annotation):
         """Deep copy comments from another annotation with new UUIDs"""
-        self.comments = []
+        if source_annotation._comments is None:
+            self._comments = None
+            self._comment_id = None
+            meta = source_annotation._comment_meta
+            self._comment_meta = meta.copy() if isinstance(meta, dict) else meta
+            self._created = source_annotation._created
+            self._labels = source_annotation._labels
+            self._labels_body = None
+            return
+        self._comments = []
         for comment in source_annotation.comments:
             new_comment = {
                 "id": str(uuid.uuid4()),
                 "meta": comment["meta"].copy(),
                 "body": comment["body"]
             }
-            self.comments.append(new_comment)
-            
+            self._comments.append(new_comment)
+        self._labels = source_annotation._labels
+        self._labels_body = source_annotation._labels_body
+
+    @property
+    def labels(self):
+        """Cached AnnotationLabels for comments[0]["body"], reparsed only when the body changes"""
+        if self._comments is None:
+            return self._labels if self._labels is not None else EMPTY_LABELS
+        if not self._comments:
+            return EMPTY_LABELS
+        body = self._comments[0].get("body", "[]")
+        if body is not self._labels_body:
+            self._labels = AnnotationLabels.from_body(body)
+            self._labels_body = body
+        return self._labels
+
+    def set_labels(self, labels):
+        self._labels = labels
+        if self._comments is None:
+            return
+        body = labels.to_body()
+        self._comments[0]["body"] = body
+        self._labels_body = body
+
+    def invalidate_labels(self):
+        self._labels = None
+        self._labels_body = None
+
     def update_comment_body(self, posture="", hlb=None, pa_type="", behavioral_params=None, exp_situation="", special_notes=""):
-        if hlb is None:
-            hlb = []
-        if behavioral_params is None:
-            behavioral_params = []
-            
-        comment_data = [
-            {"category": "POSTURE", "selectedValue": posture},
-            {"category": "HIGH LEVEL BEHAVIOR", "selectedValue": hlb},
-            {"category": "PA TYPE", "selectedValue": pa_type},
-            {"category": "Behavioral Parameters", "selectedValue": behavioral_params},
-            {"category": "Experimental situation", "selectedValue": exp_situation},
-            {"category": "Special Notes", "selectedValue": special_notes}
-        ]
-        self.comments[0]["body"] = json.dumps(comment_data)
+        self.set_labels(AnnotationLabels.from_values(
+            posture=posture,
+            hlb=hlb or (),
+            pa_type=pa_type,
+            behavioral_params=behavioral_params or (),
+            exp_situation=exp_situation,
+            special_notes=special_notes,
+        ))
 
     def __str__(self):
         return f"Annotation {self.id}: {self.start_time} - {self.end_time}"
+
+
+def annotations_to_document(records, video_hash=0, schema=SCHEMA_VERSION):
+    """labels.json document for AnnotationRecords in the given schema version"""
+    if schema == SCHEMA_V1:
+        return {"annotations": [record.to_dict() for record in records], "videohash": video_hash}
+    if schema != SCHEMA_V2:
+        raise ValueError(f"Unknown labels schema {schema}")
+    return {"schema": SCHEMA_V2, "videohash": video_hash, "annotations": [record.to_v2_dict() for record in records]}
+
+
+def annotations_from_document(data):
+    """(annotations, videohash) from a labels.json document of schema 1 or 2"""
+    schema = data.get("schema", SCHEMA_V1)
+    if schema not in (SCHEMA_V1, SCHEMA_V2):
+        raise ValueError(f"Unsupported labels schema {schema}")
+    return [TimelineAnnotation.from_dict(ann_data) for ann_data in data.get("annotations", [])], data.get("videohash", 0)
@@ -0,0 +1,51 @@
+import colorsys
+import csv
+import zlib
+from src.vocabulary import CAT_POSTURE
+
+# Colour of unlabelled blocks
+NEUTRAL_COLOR = "#808080"
+SATURATION = 0.45
+# Neighbouring hues alternate between these values so adjacent postures stay apart
+VALUES = (0.88, 0.72)
+
+_palette = None
+
+
+def _hsv_hex(hue, value):
+    r, g, b = colorsys.hsv_to_rgb(hue, SATURATION, value)
+    return f"#{round(r * 255):02x}{round(g * 255):02x}{round(b * 255):02x}"
+
+
+def build_posture_palette(postures):
+    """Posture -> colour with hues spread evenly around the wheel in list order"""
+    count = max(1, len(postures))
+    return {posture: _hsv_hex(index / count, VALUES[index % 2]) for index, posture in enumerate(postures)}
+
+
+def fallback_color(posture):
+    """Colour for a posture missing from categories.csv, derived from its name so it is the same everywhere"""
+    checksum = zlib.crc32(posture.encode('utf-8'))
+    return _hsv_hex((checksum % 3600) / 3600, VALUES[(checksum >> 16) % 2])
+
+
+def get_posture_palette():
+    """Palette of the postures in data/categories/categories.csv, built on first use"""
+    global _palette
+    if _palette is None:
+        from src.utils import resource_path
+        postures = []
+        try:
+            with open(resource_path('data/categories/categories.csv'), 'r', newline='') as f:
+                postures = [row[CAT_POSTURE] for row in csv.DictReader(f) if row.get(CAT_POSTURE)]
+        except OSError as e:
+            print(f"Could not load categories.csv, using fallback posture colours: {e}")
+        _palette = build_posture_palette(postures)
+    return _palette
+
+
+def posture_color(posture):
+    """Hex colour of a posture; the same on every run and machine"""
+    if not posture:
+        return NEUTRAL_COLOR
+    return get_posture_palette().get(posture) or fallback_color(posture)
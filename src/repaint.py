@@ -0,0 +1,68 @@
+from PyQt6.QtCore import QObject, QTimer
+
+# One display frame at 60 Hz
+FRAME_INTERVAL_MS = 16
+
+
+class RepaintScheduler(QObject):
+    """
+    Collects repaint requests and flushes them at most once per frame.
+
+    request() records a dirty rectangle, or the whole widget, per widget;
+    rectangles for the same widget are united. On the next frame the frame
+    callbacks run first (they may move things and request more repaints), then
+    each dirty widget gets a single update() for its dirty area. A frame
+    callback returns True while it needs further frames, e.g. an animation
+    that has not settled yet.
+    """
+
+    def __init__(self, parent=None, interval_ms=FRAME_INTERVAL_MS):
+        super().__init__(parent)
+        self._dirty = {}
+        self._callbacks = []
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self.flush)
+
+    @property
+    def pending(self):
+        return self._timer.isActive()
+
+    def add_frame_callback(self, callback):
+        self._callbacks.append(callback)
+
+    def request_frame(self):
+        """Run the frame callbacks on the next frame even if nothing is dirty"""
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def request(self, widget, rect=None):
+        """Repaint rect of widget (all of it if rect is None) on the next frame"""
+        if rect is not None and rect.isEmpty():
+            return
+        if widget in self._dirty:
+            current = self._dirty[widget]
+            if current is not None:
+                self._dirty[widget] = None if rect is None else current.united(rect)
+        else:
+            self._dirty[widget] = rect
+        self.request_frame()
+
+    def flush(self):
+        self._timer.stop()
+        running = False
+        for callback in self._callbacks:
+            running = bool(callback()) or running
+        dirty, self._dirty = self._dirty, {}
+        for widget, rect in dirty.items():
+            try:
+                if rect is None:
+                    widget.update()
+                else:
+                    widget.update(rect)
+            except RuntimeError:
+                # Widget deleted since the request
+                pass
+        if running or self._dirty:
+            self.request_frame()
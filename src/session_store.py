@@ -0,0 +1,241 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+APP_DIR_NAME = "PAAWS-Annotation-Software"
+
+# Bytes read from each end of the video for its fingerprint
+FINGERPRINT_SAMPLE = 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    fingerprint TEXT PRIMARY KEY,
+    video_path TEXT NOT NULL,
+    videohash INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    annotation_count INTEGER NOT NULL DEFAULT 0,
+    journal_seq INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated_at DESC);
+
+CREATE TABLE IF NOT EXISTS annotations (
+    fingerprint TEXT NOT NULL REFERENCES sessions (fingerprint) ON DELETE CASCADE,
+    id TEXT NOT NULL,
+    start_time REAL NOT NULL,
+    end_time REAL NOT NULL,
+    record TEXT NOT NULL,
+    PRIMARY KEY (fingerprint, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS annotations_start ON annotations (fingerprint, start_time);
+
+CREATE TABLE IF NOT EXISTS labels (
+    fingerprint TEXT NOT NULL,
+    annotation_id TEXT NOT NULL,
+    category TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (fingerprint, annotation_id, category, value),
+    FOREIGN KEY (fingerprint, annotation_id) REFERENCES annotations (fingerprint, id) ON DELETE CASCADE
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS labels_category ON labels (category, value);
+"""
+
+
+def default_database_path() -> str:
+    """sessions.sqlite3 in the per-user application data directory"""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or str(Path.home() / "AppData" / "Local")
+    elif sys.platform == "darwin":
+        base = str(Path.home() / "Library" / "Application Support")
+    else:
+        base = os.environ.get("XDG_DATA_HOME") or str(Path.home() / ".local" / "share")
+    return os.path.join(base, APP_DIR_NAME, "sessions.sqlite3")
+
+
+def calculate_video_fingerprint(file_path: str) -> str:
+    """SHA-256 of the file size and its first and last megabyte; stable across renames and moves"""
+    size = os.path.getsize(file_path)
+    digest = hashlib.sha256(str(size).encode())
+    with open(file_path, 'rb') as f:
+        digest.update(f.read(FINGERPRINT_SAMPLE))
+        if size > FINGERPRINT_SAMPLE:
+            f.seek(max(FINGERPRINT_SAMPLE, size - FINGERPRINT_SAMPLE))
+            digest.update(f.read(FINGERPRINT_SAMPLE))
+    return digest.hexdigest()
+
+
+def label_rows(labels):
+    """(category, value) pairs of an AnnotationLabels record, one per selected value"""
+    rows = []
+    for item in labels.to_items():
+        value = item["selectedValue"]
+        for single in (value if isinstance(value, list) else [value]):
+            if single:
+                rows.append((item["category"], single))
+    return rows
+
+
+class SessionStore:
+    """
+    SQLite (WAL) store of annotation sessions keyed by video fingerprint.
+
+    Each annotation is a row holding its schema v2 labels.json record, with its label
+    values broken out into the indexed labels table. Connections are per
+    thread, so the autosave writer and the GUI can use the store concurrently;
+    close() closes those of every thread, so call it once the other threads are done.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            # Only ever used by this thread, but close() may run on another one
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def close(self) -> None:
+        """Close the connections of all threads, releasing the WAL and shared-memory files"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+
+    def replace_session(self, fingerprint: str, video_path: str, videohash: int, records, journal_seq: int = 0) -> None:
+        """Replace every annotation of a session with the given AnnotationRecords"""
+        connection = self._connection()
+        with connection:
+            self._touch(connection, fingerprint, video_path, videohash, journal_seq)
+            connection.execute("DELETE FROM annotations WHERE fingerprint = ?", (fingerprint,))
+            seen = set()
+            for record in records:
+                if record.id in seen:
+                    print(f"Session store: skipping annotation with duplicate ID {record.id}")
+                    continue
+                seen.add(record.id)
+                self._insert(connection, fingerprint, record)
+            connection.execute("UPDATE sessions SET annotation_count = ? WHERE fingerprint = ?", (len(seen), fingerprint))
+
+    def apply_changes(self, fingerprint: str, video_path: str, videohash: int, changes, journal_seq: int = 0) -> None:
+        """
+        Apply journal-style changes in one transaction: ("put", AnnotationRecord)
+        upserts an annotation and its labels, ("del", annotation_id) removes it
+        """
+        connection = self._connection()
+        with connection:
+            self._touch(connection, fingerprint, video_path, videohash, journal_seq)
+            delta = 0
+            for op, payload in changes:
+                if op == "put":
+                    exists = connection.execute(
+                        "SELECT 1 FROM annotations WHERE fingerprint = ? AND id = ?", (fingerprint, payload.id)).fetchone()
+                    if exists:
+                        connection.execute(
+                            "UPDATE annotations SET start_time = ?, end_time = ?, record = ? WHERE fingerprint = ? AND id = ?",
+                            (payload.start_time, payload.end_time, json.dumps(payload.to_v2_dict()), fingerprint, payload.id))
+                        connection.execute(
+                            "DELETE FROM labels WHERE fingerprint = ? AND annotation_id = ?", (fingerprint, payload.id))
+                        self._insert_labels(connection, fingerprint, payload)
+                    else:
+                        self._insert(connection, fingerprint, payload)
+                        delta += 1
+                else:
+                    cursor = connection.execute(
+                        "DELETE FROM annotations WHERE fingerprint = ? AND id = ?", (fingerprint, payload))
+                    delta -= cursor.rowcount
+            if delta:
+                connection.execute(
+                    "UPDATE sessions SET annotation_count = annotation_count + ? WHERE fingerprint = ?", (delta, fingerprint))
+
+    def load_session(self, fingerprint: str):
+        """Session in the autosave dict format, or None"""
+        connection = self._connection()
+        session = connection.execute(
+            "SELECT video_path, videohash, journal_seq FROM sessions WHERE fingerprint = ?", (fingerprint,)).fetchone()
+        if session is None:
+            return None
+        rows = connection.execute(
+            "SELECT record FROM annotations WHERE fingerprint = ? ORDER BY start_time", (fingerprint,))
+        return {
+            "annotations": [json.loads(record) for record, in rows],
+            "videohash": session[1],
+            "video_path": session[0],
+            "journal_seq": session[2],
+        }
+
+    def annotations_between(self, fingerprint: str, start_time: float, end_time: float, max_length: float):
+        """
+        Records of a session's annotations overlapping [start_time, end_time], in
+        start order. None is longer than max_length (see max_annotation_length()),
+        so only that much of the annotations_start index before the range is scanned.
+        """
+        rows = self._connection().execute(
+            "SELECT record FROM annotations WHERE fingerprint = ? AND start_time BETWEEN ? AND ? "
+            "AND end_time >= ? ORDER BY start_time", (fingerprint, start_time - max_length, end_time, start_time))
+        return [json.loads(record) for record, in rows]
+
+    def max_annotation_length(self, fingerprint: str) -> float:
+        """Length of the longest annotation in a session, 0 if it has none"""
+        row = self._connection().execute(
+            "SELECT MAX(end_time - start_time) FROM annotations WHERE fingerprint = ?", (fingerprint,)).fetchone()
+        return row[0] or 0
+
+    def delete_session(self, fingerprint: str) -> None:
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM sessions WHERE fingerprint = ?", (fingerprint,))
+
+    def recent_sessions(self, limit: int = 10):
+        """Most recently saved sessions that still have annotations, newest first"""
+        rows = self._connection().execute(
+            "SELECT fingerprint, video_path, updated_at, annotation_count FROM sessions "
+            "WHERE annotation_count > 0 ORDER BY updated_at DESC LIMIT ?", (limit,))
+        return [{"fingerprint": row[0], "video_path": row[1], "updated_at": row[2], "annotation_count": row[3]}
+                for row in rows]
+
+    def sessions(self):
+        """(fingerprint, video_path, updated_at) of every stored session"""
+        return self._connection().execute("SELECT fingerprint, video_path, updated_at FROM sessions").fetchall()
+
+    def label_segments(self, fingerprint: str):
+        """(category, value, start_time, end_time) of every label value in a session, from the labels index"""
+        return self._connection().execute(
+            "SELECT l.category, l.value, a.start_time, a.end_time FROM labels l "
+            "JOIN annotations a ON a.fingerprint = l.fingerprint AND a.id = l.annotation_id "
+            "WHERE l.fingerprint = ?", (fingerprint,)).fetchall()
+
+    def _touch(self, connection, fingerprint, video_path, videohash, journal_seq):
+        connection.execute(
+            "INSERT INTO sessions (fingerprint, video_path, videohash, updated_at, journal_seq) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (fingerprint) DO UPDATE SET video_path = excluded.video_path, videohash = excluded.videohash, "
+            "updated_at = excluded.updated_at, journal_seq = MAX(journal_seq, excluded.journal_seq)",
+            (fingerprint, video_path, videohash, time.time(), journal_seq))
+
+    def _insert(self, connection, fingerprint, record):
+        connection.execute(
+            "INSERT INTO annotations (fingerprint, id, start_time, end_time, record) VALUES (?, ?, ?, ?, ?)",
+            (fingerprint, record.id, record.start_time, record.end_time, json.dumps(record.to_v2_dict())))
+        self._insert_labels(connection, fingerprint, record)
+
+    def _insert_labels(self, connection, fingerprint, record):
+        connection.executemany(
+            "INSERT OR IGNORE INTO labels (fingerprint, annotation_id, category, value) VALUES (?, ?, ?, ?)",
+            [(fingerprint, record.id, category, value) for category, value in label_rows(record.labels)])
@@ -55,6 +55,17 @@ class ShortcutManager:
         self.delete_label.triggered.connect(self.app.deleteCurrentLabel)
         self.app.addAction(self.delete_label)
 
+        # Undo/redo
+        self.undo_action = QAction("Undo", self.app)
+        self.undo_action.setShortcut("Ctrl+Z")
+        self.undo_action.triggered.connect(self.app.undo)
+        self.app.addAction(self.undo_action)
+
+        self.redo_action = QAction("Redo", self.app)
+        self.redo_action.setShortcut("Ctrl+Shift+Z")
+        self.redo_action.triggered.connect(self.app.redo)
+        self.app.addAction(self.redo_action)
+
         # Label navigation
         self.prev_label_start = QAction("Previous Label Start", self.app)
         self.prev_label_start.setShortcut("Shift+Left")
@@ -1,5 +1,5 @@
 from PyQt6.QtWidgets import QWidget
-from PyQt6.QtCore import Qt, pyqtSignal, QPoint
+from PyQt6.QtCore import Qt, pyqtSignal, QPoint, QRect
 from PyQt6.QtGui import QPainter, QColor, QBrush, QPen
 
 class CustomSlider(QWidget):
@@ -27,11 +27,13 @@ class CustomSlider(QWidget):
         self.handle_border_color = QColor("#2b2b2b")
         self.handle_radius = 8
         self.groove_height = 4
+        self.repaint_scheduler = None
 
     def value(self): return self._value
     def minimum(self): return self._min
     def maximum(self): return self._max
     def isSliderDown(self): return self._is_dragging
+    def setRepaintScheduler(self, scheduler): self.repaint_scheduler = scheduler
 
     def setRange(self, min_val, max_val):
         self._min = min_val
@@ -42,9 +44,17 @@ class CustomSlider(QWidget):
     def setValue(self, value):
         clamped_value = max(self._min, min(value, self._max))
         if self._value != clamped_value:
+            old_pos = self._pos_from_value()
             self._value = clamped_value
             self.valueChanged.emit(self._value)
-            self.update()
+            if self.repaint_scheduler is None:
+                self.update()
+            else:
+                # Progress and handle only change between the old and new handle positions
+                margin = self.handle_radius + 2
+                left = min(old_pos, self._pos_from_value()) - margin
+                right = max(old_pos, self._pos_from_value()) + margin
+                self.repaint_scheduler.request(self, QRect(left, 0, right - left + 1, self.height()))
     
     def paintEvent(self, event):
         painter = QPainter(self)
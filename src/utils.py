@@ -1,18 +1,653 @@
+from array import array
+from datetime import datetime
 import json
+import lzma
 import os
+import sqlite3
+import struct
+import zlib
 from pathlib import Path
 import tempfile
+import threading
+import time
 from typing import List, Optional, Tuple
-from src.models import TimelineAnnotation
+from src.models import (AnnotationLabels, TimelineAnnotation, SCHEMA_VERSION, annotations_from_document,
+                        annotations_to_document)
+from src.annotation_store import EXTENDED, REMOVED, RESET
+from src.annotation_window import SessionPages
+from src.session_store import SessionStore, calculate_video_fingerprint
 import sys
 from pathlib import Path
 
+def write_json_atomic(path: str, data) -> None:
+    """Write JSON through a fsynced temp file that replaces path, so a crash never leaves a partial file"""
+    write_text_atomic(path, json.dumps(data))
+
+
+def write_text_atomic(path: str, text: str) -> None:
+    write_bytes_atomic(path, text.encode('utf-8'))
+
+
+def write_bytes_atomic(path: str, data: bytes) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+COMPACT_MAGIC = b"PAAWSLBL"
+COMPACT_VERSION = 1
+COMPACT_EXTENSION = ".paaws"
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_LZMA = 2
+
+_COMPACT_HEADER = struct.Struct("<8sBB")
+# Per-record string table indexes, in file order
+_COMPACT_INDEX_COLUMNS = ("id", "comment_id", "meta", "posture", "pa_type", "exp_situation", "notes", "extra")
+
+
+def _le_bytes(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _le_array(typecode: str, data: bytes) -> array:
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def encode_compact(records, video_hash: int = 0, compression: int = COMPRESSION_ZLIB) -> bytes:
+    """
+    Encode AnnotationRecords in the compact label format.
+
+    The payload is a string table followed by columns: start and end seconds as
+    float64 (so every value survives the round trip exactly), one string index
+    per record for id, comment id, comment date, single-value labels, notes and
+    "extra", and count + flat index arrays for the multi-value labels. Anything
+    the columns cannot express (custom shape, comment meta or comment list) goes
+    into "extra" as JSON. The payload may be zlib or LZMA compressed.
+    """
+    strings = {"": 0}
+
+    def index(value):
+        return strings.setdefault(value, len(strings))
+
+    starts, ends = array('d'), array('d')
+    columns = {name: array('I') for name in _COMPACT_INDEX_COLUMNS}
+    hlb_counts, hlb_values = array('I'), array('I')
+    bp_counts, bp_values = array('I'), array('I')
+    for record in records:
+        starts.append(record.start_time)
+        ends.append(record.end_time)
+        extra = {}
+        if record.shape is not None:
+            extra["shape"] = record.shape
+        meta = record.comment_meta
+        if record.comments is not None:
+            extra["comments"] = list(record.comments)
+            meta = ""
+        elif meta is None:
+            meta = datetime.fromtimestamp(record.created).isoformat()
+        elif not isinstance(meta, str):
+            extra["meta"] = meta
+            meta = ""
+        # Records without a label record always carry their comments, see TimelineAnnotation.freeze()
+        labels = record.labels if record.comments is None else AnnotationLabels()
+        columns["id"].append(index(record.id))
+        columns["comment_id"].append(index(record.comment_id or ""))
+        columns["meta"].append(index(meta))
+        columns["posture"].append(index(labels.posture))
+        columns["pa_type"].append(index(labels.pa_type))
+        columns["exp_situation"].append(index(labels.exp_situation))
+        columns["notes"].append(index(labels.special_notes))
+        columns["extra"].append(index(json.dumps(extra, separators=(',', ':'))) if extra else 0)
+        hlb = labels.hlb
+        hlb_counts.append(len(hlb))
+        hlb_values.extend(index(value) for value in hlb)
+        params = labels.behavioral_params
+        bp_counts.append(len(params))
+        bp_values.extend(index(value) for value in params)
+
+    encoded = [value.encode('utf-8') for value in strings]
+    parts = [struct.pack("<II", len(starts), len(encoded)), str(video_hash).encode('ascii') + b"\n",
+             _le_bytes(array('I', (len(value) for value in encoded))), b"".join(encoded),
+             _le_bytes(starts), _le_bytes(ends)]
+    parts.extend(_le_bytes(columns[name]) for name in _COMPACT_INDEX_COLUMNS)
+    parts.extend([_le_bytes(hlb_counts), _le_bytes(bp_counts), struct.pack("<II", len(hlb_values), len(bp_values)),
+                  _le_bytes(hlb_values), _le_bytes(bp_values)])
+    payload = b"".join(parts)
+    if compression == COMPRESSION_ZLIB:
+        payload = zlib.compress(payload, 6)
+    elif compression == COMPRESSION_LZMA:
+        payload = lzma.compress(payload)
+    elif compression != COMPRESSION_NONE:
+        raise ValueError(f"Unknown compression {compression}")
+    return _COMPACT_HEADER.pack(COMPACT_MAGIC, COMPACT_VERSION, compression) + payload
+
+
+def is_compact(data: bytes) -> bool:
+    return data[:len(COMPACT_MAGIC)] == COMPACT_MAGIC
+
+
+def decode_compact(data: bytes) -> Tuple[List[TimelineAnnotation], int]:
+    """(annotations, videohash) from encode_compact() output; raises ValueError if it is not a compact file"""
+    if len(data) < _COMPACT_HEADER.size or not is_compact(data):
+        raise ValueError("Not a compact label file")
+    _, version, compression = _COMPACT_HEADER.unpack_from(data)
+    if version != COMPACT_VERSION:
+        raise ValueError(f"Unsupported compact label file version {version}")
+    payload = memoryview(data)[_COMPACT_HEADER.size:]
+    try:
+        if compression == COMPRESSION_ZLIB:
+            payload = memoryview(zlib.decompress(payload))
+        elif compression == COMPRESSION_LZMA:
+            payload = memoryview(lzma.decompress(payload))
+        elif compression != COMPRESSION_NONE:
+            raise ValueError(f"Unknown compression {compression}")
+    except (zlib.error, lzma.LZMAError) as e:
+        raise ValueError(f"Corrupted compact label file: {e}")
+
+    offset = 0
+
+    def take(size):
+        nonlocal offset
+        if offset + size > len(payload):
+            raise ValueError("Truncated compact label file")
+        chunk = payload[offset:offset + size]
+        offset += size
+        return chunk
+
+    count, string_count = struct.unpack("<II", take(8))
+    newline = bytes(payload[offset:offset + 32]).find(b"\n")
+    if newline < 0:
+        raise ValueError("Truncated compact label file")
+    video_hash = int(bytes(take(newline + 1)).decode('ascii'))
+    lengths = _le_array('I', take(4 * string_count))
+    blob = take(sum(lengths))
+    strings = []
+    position = 0
+    for length in lengths:
+        strings.append(str(blob[position:position + length], 'utf-8'))
+        position += length
+    starts = _le_array('d', take(8 * count))
+    ends = _le_array('d', take(8 * count))
+    columns = {name: _le_array('I', take(4 * count)) for name in _COMPACT_INDEX_COLUMNS}
+    hlb_counts = _le_array('I', take(4 * count))
+    bp_counts = _le_array('I', take(4 * count))
+    hlb_total, bp_total = struct.unpack("<II", take(8))
+    hlb_values = _le_array('I', take(4 * hlb_total))
+    bp_values = _le_array('I', take(4 * bp_total))
+
+    annotations = []
+    hlb_position = bp_position = 0
+    for i in range(count):
+        annotation = TimelineAnnotation(starts[i], ends[i])
+        annotation.id = strings[columns["id"][i]]
+        hlb = [strings[value] for value in hlb_values[hlb_position:hlb_position + hlb_counts[i]]]
+        params = [strings[value] for value in bp_values[bp_position:bp_position + bp_counts[i]]]
+        hlb_position += hlb_counts[i]
+        bp_position += bp_counts[i]
+        extra = json.loads(strings[columns["extra"][i]]) if columns["extra"][i] else {}
+        annotation._shape = extra.get("shape")
+        if "comments" in extra:
+            annotation._comments = extra["comments"]
+        else:
+            annotation._comment_id = strings[columns["comment_id"][i]] or None
+            annotation._comment_meta = extra.get("meta", strings[columns["meta"][i]])
+            annotation._labels = AnnotationLabels.from_values(
+                posture=strings[columns["posture"][i]], hlb=hlb, pa_type=strings[columns["pa_type"][i]],
+                behavioral_params=params, exp_situation=strings[columns["exp_situation"][i]],
+                special_notes=strings[columns["notes"][i]])
+        annotations.append(annotation)
+    return annotations, video_hash
+
+
+def write_compact(path: str, records, video_hash: int = 0, compression: int = COMPRESSION_ZLIB) -> None:
+    write_bytes_atomic(path, encode_compact(records, video_hash, compression))
+
+
+def read_compact(path: str) -> Tuple[List[TimelineAnnotation], int]:
+    with open(path, 'rb') as f:
+        return decode_compact(f.read())
+
+
+def convert_json_to_compact(json_path: str, compact_path: str, compression: int = COMPRESSION_ZLIB) -> int:
+    """Convert a labels.json/autosave file to the compact format; returns the number of annotations"""
+    with open(json_path, 'r') as f:
+        annotations, video_hash = annotations_from_document(json.load(f))
+    write_compact(compact_path, [annotation.freeze() for annotation in annotations], video_hash, compression)
+    return len(annotations)
+
+
+def convert_compact_to_json(compact_path: str, json_path: str, schema: int = SCHEMA_VERSION) -> int:
+    """Convert a compact file back to labels.json in the given schema; returns the number of annotations"""
+    annotations, video_hash = read_compact(compact_path)
+    data = annotations_to_document([annotation.freeze() for annotation in annotations], video_hash, schema)
+    write_text_atomic(json_path, json.dumps(data, indent=4))
+    return len(annotations)
+
+
+class _StreamBuffer:
+    """Text read from a file on demand, for incremental parsing with JSONDecoder.raw_decode"""
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """Read another chunk; False at end of file"""
+        if self.eof:
+            return False
+        if self.pos > self.chunk_size:
+            self.text = self.text[self.pos:]
+            self.pos = 0
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.text += chunk
+        return True
+
+    def peek(self):
+        """Next non-whitespace character, or "" at end of file"""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, characters):
+        character = self.peek()
+        if not character or character not in characters:
+            raise ValueError(f"Malformed labels file: expected {' or '.join(characters)} at offset {self.pos}")
+        self.pos += 1
+        return character
+
+    def value(self, decoder):
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                # The value may continue past the end of the buffer
+                if self.fill():
+                    continue
+                raise
+            if end == len(self.text) and self.fill():
+                # A number could be cut off at the buffer boundary
+                continue
+            self.pos = end
+            return value
+
+
+def iter_label_document(f, chunk_size: int = 1 << 18):
+    """
+    Incrementally parse a labels.json/autosave document from a text file.
+    Yields ("field", key, value) for top-level fields other than "annotations"
+    and ("annotation", index, record) for every element of the annotations
+    array, so only one record at a time is held in memory.
+    """
+    decoder = json.JSONDecoder()
+    stream = _StreamBuffer(f, chunk_size)
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+    while True:
+        key = stream.value(decoder)
+        stream.expect(":")
+        if key == "annotations" and stream.peek() == "[":
+            stream.expect("[")
+            index = 0
+            if stream.peek() != "]":
+                while True:
+                    yield "annotation", index, stream.value(decoder)
+                    index += 1
+                    if stream.expect(",]") == "]":
+                        break
+            else:
+                stream.expect("]")
+        else:
+            yield "field", key, stream.value(decoder)
+        if stream.expect(",}") == "}":
+            return
+
+
+SETTINGS_AUTOSAVE_MAX_LOSS_MS = "autosave/maxLossWindowMs"
+SETTINGS_AUTOSAVE_MIN_DELAY_MS = "autosave/minDelayMs"
+SETTINGS_AUTOSAVE_ADAPTIVE = "autosave/adaptive"
+SETTINGS_AUTOSAVE_BACKEND = "autosave/backend"
+SETTINGS_EXPORT_LABELS_SCHEMA = "export/labelsSchema"
+SETTINGS_EXPORT_COMPRESSION_LEVEL = "export/compressionLevel"
+
+# Values of SETTINGS_AUTOSAVE_BACKEND: full JSON rewrites, JSON base plus journal, or the session database
+AUTOSAVE_BACKEND_JSON = "json"
+AUTOSAVE_BACKEND_JOURNAL = "journal"
+AUTOSAVE_BACKEND_SQLITE = "sqlite"
+AUTOSAVE_BACKENDS = (AUTOSAVE_BACKEND_JSON, AUTOSAVE_BACKEND_JOURNAL, AUTOSAVE_BACKEND_SQLITE)
+
+# Journal entries appended before the next autosave folds the journal into the base file
+JOURNAL_COMPACT_EVERY = 500
+
+
+class AutosaveScheduler:
+    """
+    Picks how long to wait after an edit before autosaving.
+
+    While the user is making a burst of edits the delay follows the (EWMA)
+    gap between edits, so the burst ends up in one write; isolated edits are
+    saved after min_delay. The delay never drops below the time needed to keep
+    saving under max_duty of wall time, given the measured (EWMA) save cost,
+    and never exceeds max_delay, the maximum data-loss window.
+    """
+
+    def __init__(self, min_delay: float = 1.0, max_delay: float = 60.0, adaptive: bool = True,
+                 burst_gap: float = 3.0, max_duty: float = 0.05, alpha: float = 0.3) -> None:
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.adaptive = adaptive
+        self.burst_gap = burst_gap
+        self.max_duty = max_duty
+        self.alpha = alpha
+        self.edit_interval = None
+        self.save_cost = None
+        self._last_edit = None
+
+    def record_edit(self, now: float) -> None:
+        if self._last_edit is not None:
+            self.edit_interval = self._ewma(self.edit_interval, now - self._last_edit)
+        self._last_edit = now
+
+    def record_save(self, seconds: float) -> None:
+        self.save_cost = self._ewma(self.save_cost, seconds)
+
+    def delay(self) -> float:
+        if not self.adaptive:
+            return min(self.min_delay, self.max_delay)
+        delay = self.min_delay
+        if self.edit_interval is not None and self.edit_interval < self.burst_gap:
+            delay = max(delay, 1.5 * self.edit_interval)
+        if self.save_cost is not None:
+            delay = max(delay, self.save_cost / self.max_duty)
+        return min(delay, self.max_delay)
+
+    def _ewma(self, current, sample):
+        return sample if current is None else current + self.alpha * (sample - current)
+
+
+class AutosaveWriter:
+    """
+    Worker thread that performs autosave writes.
+
+    submit() only records the latest job per path; the write happens once no
+    newer job for that path has arrived for the given delay, so a burst of
+    edits costs a single write. A job never waits longer than max_wait after
+    the first unsaved submit for its path.
+    """
+
+    def __init__(self, write, delay: float = 1.0, max_wait: Optional[float] = None) -> None:
+        self._write = write
+        self.delay = delay
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self._pending = {}
+        self._busy = False
+        self._stopped = False
+        self._thread = None
+
+    def submit(self, path: str, job, delay: Optional[float] = None, merge=None) -> None:
+        """Queue job for path, replacing a pending one, or combining them with merge(old_job, job)"""
+        with self._cond:
+            if self._stopped:
+                return
+            now = time.monotonic()
+            first = self._pending[path][1] if path in self._pending else now
+            if merge is not None and path in self._pending:
+                job = merge(self._pending[path][2], job)
+            deadline = now + (self.delay if delay is None else delay)
+            if self.max_wait is not None:
+                deadline = min(deadline, first + self.max_wait)
+            self._pending[path] = (deadline, first, job)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="autosave-writer", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def cancel(self, path: str) -> None:
+        """Drop the pending job for path and wait out a write already in progress"""
+        with self._cond:
+            self._pending.pop(path, None)
+            self._cond.wait_for(lambda: not self._busy)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Write pending jobs now and wait for them; False if the timeout expired first"""
+        with self._cond:
+            now = time.monotonic()
+            self._pending = {path: (now, first, job) for path, (_, first, job) in self._pending.items()}
+            self._cond.notify_all()
+            if self._thread is None:
+                return True
+            return self._cond.wait_for(lambda: not self._pending and not self._busy, timeout)
+
+    def has_pending(self) -> bool:
+        with self._cond:
+            return bool(self._pending) or self._busy
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self.flush(timeout)
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    if self._pending:
+                        path, (deadline, _, job) = min(self._pending.items(), key=lambda item: item[1][0])
+                        wait = deadline - time.monotonic()
+                        if wait <= 0:
+                            break
+                        self._cond.wait(wait)
+                    elif self._stopped:
+                        return
+                    else:
+                        self._cond.wait()
+                del self._pending[path]
+                self._busy = True
+            try:
+                self._write(path, job)
+            except Exception as e:
+                print(f"Autosave failed: {str(e)}")
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+
+def replay_journal(data: dict, lines) -> dict:
+    """
+    Apply journal lines newer than data["journal_seq"] to an autosave dict.
+    Unreadable lines (a write cut short by a crash) are skipped.
+    """
+    base_seq = data.get("journal_seq", 0)
+    annotations = {annotation["id"]: annotation for annotation in data.get("annotations", [])}
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        if entry.get("seq", 0) <= base_seq:
+            continue
+        op = entry.get("op")
+        if op == "put":
+            annotations[entry["annotation"]["id"]] = entry["annotation"]
+        elif op == "del":
+            annotations.pop(entry["id"], None)
+        elif op == "meta":
+            data.setdefault("video_path", entry["video_path"])
+            data["videohash"] = entry["videohash"]
+        data["journal_seq"] = max(data.get("journal_seq", 0), entry["seq"])
+    data["annotations"] = list(annotations.values())
+    return data
+
+
 class AutosaveManager:
-    def __init__(self, interval: int = 300000) -> None:
-        """Initialize autosave manager"""
+    """
+    Keeps an autosave of the current session.
+
+    With a session database, per-annotation changes ("put" with the annotation
+    record, "del" with its id) are applied as row-level upserts to a SQLite
+    SessionStore keyed by video fingerprint. Otherwise it writes
+    <video>_autosave.json, either as a full rewrite per save or, in journal mode,
+    as an append-only <video>_autosave.journal of the same changes that is
+    periodically folded into the base file. Every change has a sequence number
+    and a base records the last one it contains, so replay is idempotent.
+    The JSON files are still read when the database has no session for a video.
+    The database takes precedence over journal mode; if it cannot be opened,
+    the JSON files are used as configured by journal.
+    """
+
+    def __init__(self, interval: int = 300000, delay: int = 1000, adaptive: bool = True, journal: bool = False,
+                 session_db: Optional[str] = None) -> None:
+        """
+        Initialize autosave manager. interval is the maximum data-loss window in ms;
+        delay is the minimum wait after an edit (or the fixed wait when not adaptive)
+        """
         self.interval = interval
         self.autosave_dir = os.path.join(tempfile.gettempdir(), 'paaws_annotation_software_autosave')
         os.makedirs(self.autosave_dir, exist_ok=True)
+        self._io_lock = threading.Lock()
+        self.scheduler = AutosaveScheduler(delay / 1000, interval / 1000, adaptive)
+        self.writer = AutosaveWriter(self._write_job, delay / 1000, interval / 1000)
+        self._submitted_generation = {}
+        self.saves_written = 0
+        self.saves_skipped = 0
+        self.last_save_seconds = None
+        self._journal_lock = threading.Lock()
+        self._journal_buffer = []
+        self._journal_seq = 0
+        self._journal_counts = {}
+        self._needs_base = set()
+        self.journal_entries_written = 0
+        self.compactions = 0
+        self._fingerprints = {}
+        self._session_generations = {}
+        self.session_store = None
+        if session_db:
+            try:
+                self.session_store = SessionStore(session_db)
+            except (sqlite3.Error, OSError) as e:
+                print(f"Session database unavailable, using autosave files: {str(e)}")
+        self.journal = journal and self.session_store is None
+
+    @property
+    def backend(self) -> str:
+        """The AUTOSAVE_BACKENDS value in effect"""
+        if self.session_store is not None:
+            return AUTOSAVE_BACKEND_SQLITE
+        return AUTOSAVE_BACKEND_JOURNAL if self.journal else AUTOSAVE_BACKEND_JSON
+
+    def metrics(self) -> dict:
+        """Autosave counters and the scheduler's current estimates, times in ms"""
+        def ms(seconds):
+            return None if seconds is None else round(seconds * 1000, 1)
+        return {
+            "saves_written": self.saves_written,
+            "saves_skipped": self.saves_skipped,
+            "last_save_ms": ms(self.last_save_seconds),
+            "save_cost_ms": ms(self.scheduler.save_cost),
+            "edit_interval_ms": ms(self.scheduler.edit_interval),
+            "delay_ms": ms(self.scheduler.delay()),
+            "max_loss_window_ms": self.interval,
+            "adaptive": self.scheduler.adaptive,
+            "backend": self.backend,
+            "session_database": self.session_store.path if self.session_store else None,
+            "journal_entries_written": self.journal_entries_written,
+            "compactions": self.compactions,
+            "pending": self.writer.has_pending(),
+        }
+
+    def _autosave_path(self, video_path: str) -> str:
+        video_name = Path(video_path).stem
+        return os.path.join(self.autosave_dir, f"{video_name}_autosave.json")
+
+    def _journal_path(self, video_path: str) -> str:
+        video_name = Path(video_path).stem
+        return os.path.join(self.autosave_dir, f"{video_name}_autosave.journal")
+
+    def _fingerprint(self, video_path: str) -> str:
+        fingerprint = self._fingerprints.get(video_path)
+        if fingerprint is None:
+            try:
+                fingerprint = calculate_video_fingerprint(video_path)
+            except OSError as e:
+                print(f"Error fingerprinting video, keying session by path: {str(e)}")
+                fingerprint = "path:" + os.path.abspath(video_path)
+            self._fingerprints[video_path] = fingerprint
+        return fingerprint
+
+    def recent_sessions(self, limit: int = 10) -> list:
+        """Recoverable sessions from the session database, newest first"""
+        if self.session_store is None:
+            return []
+        try:
+            return self.session_store.recent_sessions(limit)
+        except sqlite3.Error as e:
+            print(f"Failed to list recent sessions: {str(e)}")
+            return []
+
+    def session_pages(self, video_path: str) -> Optional[SessionPages]:
+        """
+        SessionPages over the video's session in the database, current whenever
+        its generation equals that of the AnnotationStore; None without a database
+        """
+        if self.session_store is None or not video_path:
+            return None
+        return SessionPages(self.session_store, self._fingerprint(video_path),
+                            lambda: self._session_generations.get(video_path))
+
+    def record_change(self, video_path: str, kind: str, annotation) -> None:
+        """Journal one AnnotationStore change; written by the next schedule_save()"""
+        if not (self.journal or self.session_store) or not video_path:
+            return
+        autosave_path = self._autosave_path(video_path)
+        if kind in (RESET, EXTENDED):
+            self._needs_base.add(autosave_path)
+            return
+        with self._journal_lock:
+            self._journal_seq += 1
+            buffer = self._journal_buffer
+            if kind == REMOVED:
+                buffer.append((self._journal_seq, "del", annotation.id))
+            elif buffer and buffer[-1][1] == "put" and buffer[-1][2].source is annotation:
+                # Successive moves of one edge during a drag only need the final state
+                buffer[-1] = (self._journal_seq, "put", annotation.freeze())
+                return
+            else:
+                buffer.append((self._journal_seq, "put", annotation.freeze()))
+        self._journal_counts[autosave_path] = self._journal_counts.get(autosave_path, 0) + 1
 
     def calculate_video_hash(self, file_path: str) -> int:
         """Calculate hash from video file size"""
@@ -36,44 +671,173 @@ class AutosaveManager:
             return
             
         try:
-            video_name = Path(video_path).stem
-            autosave_path = os.path.join(self.autosave_dir, f"{video_name}_autosave.json")
-            if os.path.exists(autosave_path):
-                os.remove(autosave_path)
+            autosave_path = self._autosave_path(video_path)
+            journal_path = self._journal_path(video_path)
+            self.writer.cancel(autosave_path)
+            self.writer.cancel(journal_path)
+            self._submitted_generation.pop(autosave_path, None)
+            self._session_generations.pop(video_path, None)
+            with self._journal_lock:
+                self._journal_buffer.clear()
+            self._needs_base.add(autosave_path)
+            if self.session_store is not None:
+                self.session_store.delete_session(self._fingerprint(video_path))
+            with self._io_lock:
+                for path in (autosave_path, journal_path):
+                    if os.path.exists(path):
+                        os.remove(path)
         except Exception as e:
             print(f"Error deleting autosave: {str(e)}")
 
     def save_annotations(self, video_path: str, annotations: List[TimelineAnnotation], *, video_hash: int = 0) -> None:
-        """Save annotations to autosave file"""
-        print(f"Autosaving annotations for {video_path}...")
+        """Save annotations to autosave file on the calling thread"""
         if not video_path:
             return
-            
+
         try:
-            video_name = Path(video_path).stem
-            autosave_path = os.path.join(self.autosave_dir, f"{video_name}_autosave.json")
-            
-            annotations_data = {
-                "annotations": [],
-                "videohash": video_hash,
-                "video_path": video_path
-            }
-            
-            for annotation in annotations:
-                annotations_data["annotations"].append({
-                    "id": annotation.id,
-                    "range": {
-                        "start": annotation.start_time,
-                        "end": annotation.end_time
-                    },
-                    "shape": annotation.shape,
-                    "comments": annotation.comments
-                })
-                
-            with open(autosave_path, 'w') as f:
-                json.dump(annotations_data, f, indent=4)
+            self._write_job(self._autosave_path(video_path), ("full", video_path, annotations, video_hash, None))
         except Exception as e:
             print(f"Autosave failed: {str(e)}")
+
+    def schedule_save(self, video_path: str, snapshot, *, video_hash: int = 0) -> None:
+        """
+        Queue an autosave of an AnnotationStore snapshot on the writer thread.
+        Requests arriving within the scheduler's delay are coalesced into one
+        write; a snapshot whose generation was already saved is skipped.
+        """
+        if not video_path:
+            return
+        autosave_path = self._autosave_path(video_path)
+        generation = (getattr(snapshot, 'generation', None), video_hash)
+        if generation[0] is not None and self._submitted_generation.get(autosave_path) == generation:
+            self.saves_skipped += 1
+            return
+        self._submitted_generation[autosave_path] = generation
+        self.scheduler.record_edit(time.monotonic())
+        delay = self.scheduler.delay()
+        if self.session_store is not None:
+            full = autosave_path in self._needs_base
+            self._needs_base.discard(autosave_path)
+            with self._journal_lock:
+                seq = self._journal_seq
+            job = ("session", video_path, video_hash, snapshot if full else None, seq, generation[0])
+            self.writer.submit(autosave_path, job, delay, merge=self._merge_session_jobs)
+            return
+        if not self.journal:
+            self.writer.submit(autosave_path, ("full", video_path, snapshot, video_hash, None), delay)
+            return
+        if autosave_path in self._needs_base or self._journal_counts.get(autosave_path, 0) >= JOURNAL_COMPACT_EVERY:
+            self._needs_base.discard(autosave_path)
+            self._journal_counts[autosave_path] = 0
+            with self._journal_lock:
+                seq = self._journal_seq
+            self.writer.submit(autosave_path, ("full", video_path, snapshot, video_hash, seq), delay)
+        self.writer.submit(self._journal_path(video_path), ("journal", video_path, video_hash), delay)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Finish any queued autosave now"""
+        return self.writer.flush(timeout)
+
+    def shutdown(self, timeout: Optional[float] = None) -> None:
+        self.writer.stop(timeout)
+        if self.session_store is not None:
+            self.session_store.close()
+
+    @staticmethod
+    def _merge_session_jobs(old_job, new_job):
+        """A pending full replace must survive being superseded by an incremental job"""
+        if new_job[3] is None and old_job[3] is not None:
+            # Buffered changes newer than the snapshot are applied after it anyway,
+            # so the write still brings the session up to the newer generation
+            return old_job[:5] + new_job[5:]
+        return new_job
+
+    def _write_job(self, path: str, job) -> None:
+        started = time.perf_counter()
+        try:
+            if job[0] == "journal":
+                self._append_journal(path, *job[1:])
+            elif job[0] == "session":
+                self._write_session(*job[1:])
+            else:
+                self._write_base(path, *job[1:])
+        except Exception:
+            # Let the next request for this file write again even if nothing changed
+            autosave_path = self._autosave_path(job[1])
+            self._submitted_generation.pop(autosave_path, None)
+            if job[0] == "session":
+                # Drained changes may be lost, so the next save rewrites the whole session
+                self._needs_base.add(autosave_path)
+            raise
+        self.last_save_seconds = time.perf_counter() - started
+        self.scheduler.record_save(self.last_save_seconds)
+        self.saves_written += 1
+
+    def _write_base(self, autosave_path: str, video_path: str, annotations, video_hash: int, journal_seq) -> None:
+        """Full autosave file; with a journal_seq, also drops the journal entries it now contains"""
+        print(f"Autosaving annotations for {video_path}...")
+        annotations_data = annotations_to_document(annotations, video_hash)
+        annotations_data["video_path"] = video_path
+        if journal_seq is not None:
+            annotations_data["journal_seq"] = journal_seq
+        journal_path = self._journal_path(video_path)
+        with self._io_lock:
+            write_json_atomic(autosave_path, annotations_data)
+            if os.path.exists(journal_path):
+                if journal_seq is None:
+                    os.remove(journal_path)
+                else:
+                    with open(journal_path, 'r') as f:
+                        remaining = [line for line in f if self._journal_line_seq(line) > journal_seq]
+                    write_text_atomic(journal_path, "".join(remaining))
+        if journal_seq is not None:
+            self.compactions += 1
+
+    def _write_session(self, video_path: str, video_hash: int, snapshot, seq: int, generation=None) -> None:
+        """
+        Apply buffered changes to the session database, after a full replace if
+        one is due, then record the store generation the session now holds
+        """
+        with self._journal_lock:
+            entries, self._journal_buffer = self._journal_buffer, []
+        fingerprint = self._fingerprint(video_path)
+        if snapshot is not None:
+            self.session_store.replace_session(fingerprint, video_path, video_hash, snapshot, seq)
+            entries = [entry for entry in entries if entry[0] > seq]
+            self.compactions += 1
+        if entries or snapshot is None:
+            last_seq = entries[-1][0] if entries else seq
+            self.session_store.apply_changes(fingerprint, video_path, video_hash,
+                                             [(op, payload) for _, op, payload in entries], last_seq)
+            self.journal_entries_written += len(entries)
+        if generation is not None:
+            self._session_generations[video_path] = generation
+
+    def _append_journal(self, journal_path: str, video_path: str, video_hash: int) -> None:
+        """Append buffered journal entries with a single fsync"""
+        with self._journal_lock:
+            entries, self._journal_buffer = self._journal_buffer, []
+        if not entries:
+            return
+        lines = [json.dumps({"seq": entries[0][0], "op": "meta", "video_path": video_path, "videohash": video_hash})]
+        for seq, op, payload in entries:
+            if op == "put":
+                lines.append(json.dumps({"seq": seq, "op": "put", "annotation": payload.to_v2_dict()}))
+            else:
+                lines.append(json.dumps({"seq": seq, "op": "del", "id": payload}))
+        with self._io_lock:
+            with open(journal_path, 'a') as f:
+                f.write("\n".join(lines) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        self.journal_entries_written += len(entries)
+
+    @staticmethod
+    def _journal_line_seq(line: str) -> int:
+        try:
+            return json.loads(line).get("seq", 0)
+        except ValueError:
+            return 0
             
     def check_for_autosave(self, video_path: str, current_hash: int) -> Tuple[Optional[dict], bool]:
         """
@@ -85,24 +849,48 @@ class AutosaveManager:
         if not video_path:
             return None, False
             
-        video_name = Path(video_path).stem
-        autosave_path = os.path.join(self.autosave_dir, f"{video_name}_autosave.json")
-        
+        autosave_path = self._autosave_path(video_path)
+        journal_path = self._journal_path(video_path)
+
+        if self.session_store is not None:
+            try:
+                data = self.session_store.load_session(self._fingerprint(video_path))
+            except sqlite3.Error as e:
+                print(f"Failed to load session from database: {str(e)}")
+                data = None
+            if data is not None:
+                # The fingerprint identifies the video even if it was moved or renamed
+                with self._journal_lock:
+                    self._journal_seq = max(self._journal_seq, data.get("journal_seq", 0))
+                data["video_path"] = video_path
+                return data, data.get("videohash", 0) == current_hash
+
+        data = None
         if os.path.exists(autosave_path):
             try:
                 with open(autosave_path, 'r') as f:
                     data = json.load(f)
-                if data.get("video_path") == video_path:
-                    saved_hash = data.get("videohash", 0)
-                    return data, saved_hash == current_hash
             except Exception as e:
                 print(f"Failed to load autosave: {str(e)}")
-        
+        if os.path.exists(journal_path):
+            try:
+                with open(journal_path, 'r') as f:
+                    data = replay_journal(data if data is not None else {}, f)
+            except Exception as e:
+                print(f"Failed to replay autosave journal: {str(e)}")
+        if data is not None:
+            # Keep journal sequence numbers increasing across sessions
+            with self._journal_lock:
+                self._journal_seq = max(self._journal_seq, data.get("journal_seq", 0))
+            if data.get("video_path") == video_path:
+                saved_hash = data.get("videohash", 0)
+                return data, saved_hash == current_hash
+
         return None, False
     
 def autosave(func):
     """
-    Decorator to handle autosaving
+    Decorator to handle autosaving; the app queues the save, so this returns immediately
     """
     def wrapper(self, *args, **kwargs):
         # Call the original function
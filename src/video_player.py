@@ -1,29 +1,40 @@
 # --- Imports ---
-import json
-import io
-import csv
-from zipfile import ZipFile
 import os
 import sys
 
 # PyQt6 imports
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QPushButton, QFileDialog, QLabel, QMessageBox,
-                             QMenu)
-from PyQt6.QtCore import Qt, QUrl, QTime, QTimer
-from PyQt6.QtGui import QAction, QPalette, QGuiApplication
+                             QMenu, QProgressDialog)
+from PyQt6.QtCore import Qt, QUrl, QTime, QTimer, QSettings
+from PyQt6.QtGui import QAction, QActionGroup, QPalette, QGuiApplication
 from PyQt6.QtQuickWidgets import QQuickWidget
 from src.slider import CustomSlider
-from src.models import TimelineAnnotation
+from src.models import TimelineAnnotation, SCHEMA_V1, SCHEMA_VERSION
 from src.widgets import TimelineWidget
-from src.dialogs import AnnotationDialog
+from src.dialogs import APP_NAME, ORGANIZATION_NAME
 from src.shortcuts import ShortcutManager
 from src.annotation_manager import AnnotationManager
-from src.utils import AutosaveManager
+from src.utils import (AutosaveManager, SETTINGS_AUTOSAVE_MAX_LOSS_MS, SETTINGS_AUTOSAVE_MIN_DELAY_MS,
+                       SETTINGS_AUTOSAVE_ADAPTIVE, SETTINGS_AUTOSAVE_BACKEND, AUTOSAVE_BACKEND_JOURNAL,
+                       AUTOSAVE_BACKEND_SQLITE, AUTOSAVE_BACKENDS,
+                       SETTINGS_EXPORT_LABELS_SCHEMA, SETTINGS_EXPORT_COMPRESSION_LEVEL, COMPACT_EXTENSION)
+from src.session_store import default_database_path
+from src.annotation_store import AnnotationStore
+from src.annotation_model import AnnotationModel
+from src.annotation_window import CoverageIndex
+from src.workers import AnnotationExporter, AnnotationLoader
+from src.repaint import RepaintScheduler
+from src.export import DEFAULT_COMPRESSION_LEVEL
 class VideoPlayerApp(QMainWindow):
     SYNC_THRESHOLD = 150
     MIN_ZOOM_DURATION = 600000 # 10 minutes in ms
     BASE_PREVIEW_OFFSET = 2000  # 2 seconds in ms
+    # Zoom auto-scroll: share of the zoom window kept ahead of the playhead, and the step towards the target per frame
+    ZOOM_EDGE_THRESHOLD = 0.2
+    ZOOM_SMOOTHING = 0.05
+    # (menu text, zlib level) offered under Export Compression
+    EXPORT_COMPRESSION_CHOICES = (("None", 0), ("Fast", 1), ("Default", DEFAULT_COMPRESSION_LEVEL), ("Smallest", 9))
 
     def __init__(self):
         super().__init__()
@@ -37,16 +48,37 @@ class VideoPlayerApp(QMainWindow):
             self.setGeometry(100, 100, 1280, 1000)
 
         
-        self.autosave_manager = AutosaveManager(60000) 
+        settings = QSettings(ORGANIZATION_NAME, APP_NAME)
+        backend = settings.value(SETTINGS_AUTOSAVE_BACKEND, AUTOSAVE_BACKEND_SQLITE, type=str)
+        if backend not in AUTOSAVE_BACKENDS:
+            print(f"Unknown autosave backend {backend!r}, using {AUTOSAVE_BACKEND_SQLITE}")
+            backend = AUTOSAVE_BACKEND_SQLITE
+        self.autosave_manager = AutosaveManager(
+            settings.value(SETTINGS_AUTOSAVE_MAX_LOSS_MS, 60000, type=int),
+            delay=settings.value(SETTINGS_AUTOSAVE_MIN_DELAY_MS, 1000, type=int),
+            adaptive=settings.value(SETTINGS_AUTOSAVE_ADAPTIVE, True, type=bool),
+            journal=backend == AUTOSAVE_BACKEND_JOURNAL,
+            session_db=default_database_path() if backend == AUTOSAVE_BACKEND_SQLITE else None
+        )
         self.current_video_path = None
         self.video_hash = 0
         self.current_rotation = 0
-        self.annotations = []
+        self.annotations = AnnotationStore()
+        self.annotation_model = AnnotationModel(self.annotations, self)
+        self.annotation_coverage = CoverageIndex(self.annotations)
+        self.annotation_pages = None
+        self.annotation_model.changed.connect(self.onAnnotationsChanged)
+        self.annotations.subscribe(self._journalAnnotationChange)
         self.current_annotation = None 
         self.zoom_start = 0.0 
         self.zoom_end = 1.0 
         self._is_navigating = False
+        self._annotation_loader = None
+        self._load_state = None
+        self._annotation_exporter = None
         self.PREVIEW_OFFSET = self.BASE_PREVIEW_OFFSET
+        self.repaint_scheduler = RepaintScheduler(self)
+        self.repaint_scheduler.add_frame_callback(self._advanceZoomScroll)
 
         
         self.autosave_timer = QTimer(self)
@@ -173,6 +205,7 @@ class VideoPlayerApp(QMainWindow):
         main_timeline_container.setMinimumHeight(50)
 
         self.timeline = CustomSlider(Qt.Orientation.Horizontal, show_handle=True)
+        self.timeline.setRepaintScheduler(self.repaint_scheduler)
         self.timeline.sliderMoved.connect(lambda pos: self.setPosition(pos, from_main=True))
         self.timeline.sliderPressed.connect(self.sliderPressed)
         self.timeline.sliderReleased.connect(self.sliderReleased)
@@ -206,6 +239,7 @@ class VideoPlayerApp(QMainWindow):
         
         # --- REPLACEMENT: Use CustomSlider instead of QSlider ---
         self.second_timeline = CustomSlider(Qt.Orientation.Horizontal, show_handle=True)
+        self.second_timeline.setRepaintScheduler(self.repaint_scheduler)
         self.second_timeline.sliderMoved.connect(lambda pos: self.setPosition(pos, from_main=False))
         self.second_timeline.sliderPressed.connect(self.sliderPressed)
         self.second_timeline.sliderReleased.connect(self.sliderReleased)
@@ -336,14 +370,27 @@ class VideoPlayerApp(QMainWindow):
         self.open_button.clicked.connect(self.openFile)
         
         self.settings_menu = QMenu(self); self.settings_menu.setStyleSheet("QMenu { background-color: #2b2b2b; border: 1px solid #3a3a3a; } QMenu::item { padding: 8px 20px; color: white; } QMenu::item:selected { background-color: #4a90e2; }")
-        load_action = QAction("Load JSON", self); load_action.triggered.connect(self.loadAnnotations)
+        load_action = QAction("Load Labels", self); load_action.triggered.connect(self.loadAnnotations)
+        import_csv_action = QAction("Import CSV Labels", self); import_csv_action.triggered.connect(self.importCategoryCsvs)
         export_action = QAction("Export Labels", self); export_action.triggered.connect(self.saveAnnotations)
         new_video_action = QAction("New Video", self); new_video_action.triggered.connect(self.openFile)
         self.rotate_action = QAction("Rotate Video", self); self.rotate_action.setEnabled(False); self.rotate_action.triggered.connect(self.rotateVideo) 
         self.toggle_shortcuts_action = QAction("Hide Shortcuts", self); self.toggle_shortcuts_action.triggered.connect(self.toggleShortcutsWidget)
-        self.settings_menu.addAction(load_action); self.settings_menu.addAction(export_action); self.settings_menu.addAction(new_video_action)
+        autosave_status_action = QAction("Autosave Status", self); autosave_status_action.triggered.connect(self.showAutosaveStatus)
+        self.export_v1_action = QAction("Export v1 labels.json", self); self.export_v1_action.setCheckable(True)
+        self.export_v1_action.setChecked(QSettings(ORGANIZATION_NAME, APP_NAME).value(SETTINGS_EXPORT_LABELS_SCHEMA, SCHEMA_VERSION, type=int) == SCHEMA_V1)
+        self.export_v1_action.toggled.connect(self.setExportV1)
+        self.recent_sessions_menu = QMenu("Recent Sessions", self); self.recent_sessions_menu.aboutToShow.connect(self.populateRecentSessions)
+        self.export_compression_menu = QMenu("Export Compression", self); compression_group = QActionGroup(self)
+        compression_level = QSettings(ORGANIZATION_NAME, APP_NAME).value(SETTINGS_EXPORT_COMPRESSION_LEVEL, DEFAULT_COMPRESSION_LEVEL, type=int)
+        for text, level in self.EXPORT_COMPRESSION_CHOICES:
+            action = QAction(text, self); action.setCheckable(True); action.setData(level); action.setChecked(level == compression_level)
+            compression_group.addAction(action); self.export_compression_menu.addAction(action)
+        compression_group.triggered.connect(lambda action: self.setExportCompressionLevel(action.data()))
+        self.settings_menu.addAction(load_action); self.settings_menu.addAction(import_csv_action); self.settings_menu.addAction(export_action); self.settings_menu.addAction(new_video_action)
+        self.settings_menu.addMenu(self.recent_sessions_menu); self.settings_menu.addAction(self.export_v1_action); self.settings_menu.addMenu(self.export_compression_menu)
         self.settings_menu.addSeparator(); self.settings_menu.addAction(self.rotate_action); self.settings_menu.addSeparator()
-        self.settings_menu.addAction(self.toggle_shortcuts_action)
+        self.settings_menu.addAction(self.toggle_shortcuts_action); self.settings_menu.addAction(autosave_status_action)
         self.gear_button.setMenu(self.settings_menu)
         print("--- setupUI: Finished.")
 
@@ -358,7 +405,8 @@ class VideoPlayerApp(QMainWindow):
             ],
             "🏷️ Labeling Controls": [
                 "A - Start/Stop labeling", "Z - Cancel labeling", "S - Delete label",
-                "G - Open label dialog", "P - Split label"
+                "G - Open label dialog", "P - Split label",
+                "Ctrl+Z / Ctrl+Shift+Z - Undo/Redo"
             ],
             "🔍 Navigation": [
                 "Shift+←/→ - Previous/Next label", "N - Merge with previous",
@@ -541,53 +589,71 @@ class VideoPlayerApp(QMainWindow):
         if self.media_player['_duration'] <= 0:
             return
 
+        previous_ms = self.media_player['_position']
         self.media_player['_position'] = int(position)
-        current_pos_percent = position / self.media_player['_duration']
-        zoom_width = self.zoom_end - self.zoom_start
-        edge_threshold = 0.2
-        smoothing_factor = 0.05
-        target_zoom_start = self.zoom_start
-        scroll_trigger_right = self.zoom_end - (zoom_width * edge_threshold)
-        scroll_trigger_left = self.zoom_start + (zoom_width * edge_threshold)
-
-        if current_pos_percent > scroll_trigger_right:
-            target_zoom_start = current_pos_percent - (zoom_width * (1 - edge_threshold))
-        elif current_pos_percent < scroll_trigger_left:
-            target_zoom_start = current_pos_percent - (zoom_width * edge_threshold)
-
-        target_zoom_start = max(0.0, min(target_zoom_start, 1.0 - zoom_width))
-        self.zoom_start += (target_zoom_start - self.zoom_start) * smoothing_factor
-        self.zoom_start = max(0.0, min(self.zoom_start, 1.0 - zoom_width))
-        self.zoom_end = self.zoom_start + zoom_width
 
         if not self.timeline.isSliderDown():
             self.timeline.setValue(self.media_player['_position'])
-
-        if not self.second_timeline.isSliderDown():
-            zoom_duration_ms = zoom_width * self.media_player['_duration']
-            zoom_start_ms = self.zoom_start * self.media_player['_duration']
-            max_slider_val = self.second_timeline.maximum()
-
-            if position >= zoom_start_ms and position <= (zoom_start_ms + zoom_duration_ms) and zoom_duration_ms > 0 and max_slider_val > 0:
-                relative_pos_in_zoom = (position - zoom_start_ms) / zoom_duration_ms
-                slider_value = int(relative_pos_in_zoom * max_slider_val)
-                self.second_timeline.setValue(slider_value)
-            elif position < zoom_start_ms:
-                self.second_timeline.setValue(0)
-            else:
-                self.second_timeline.setValue(max_slider_val)
+        self._syncZoomSlider()
 
         current_time = QTime(0, 0).addMSecs(self.media_player['_position']).toString('hh:mm:ss')
         total_time = QTime(0, 0).addMSecs(self.media_player['_duration']).toString('hh:mm:ss')
         self.time_label.setText(f"{current_time} / {total_time}")
 
         if hasattr(self, 'timeline_widget'):
-            self.timeline_widget.update()
+            self.timeline_widget.invalidate_position(previous_ms, self.media_player['_position'])
         if hasattr(self, 'second_timeline_widget'):
-            self.second_timeline_widget.update()
+            self.second_timeline_widget.invalidate_position(previous_ms, self.media_player['_position'])
+        # The zoom window follows the playhead from the frame tick
+        self.repaint_scheduler.request_frame()
 
-        
-        
+    def _zoomScrollTarget(self):
+        """zoom_start that keeps the playhead within ZOOM_EDGE_THRESHOLD of the zoom window's edges"""
+        current_pos_percent = self.media_player['_position'] / self.media_player['_duration']
+        zoom_width = self.zoom_end - self.zoom_start
+        target_zoom_start = self.zoom_start
+        scroll_trigger_right = self.zoom_end - (zoom_width * self.ZOOM_EDGE_THRESHOLD)
+        scroll_trigger_left = self.zoom_start + (zoom_width * self.ZOOM_EDGE_THRESHOLD)
+
+        if current_pos_percent > scroll_trigger_right:
+            target_zoom_start = current_pos_percent - (zoom_width * (1 - self.ZOOM_EDGE_THRESHOLD))
+        elif current_pos_percent < scroll_trigger_left:
+            target_zoom_start = current_pos_percent - (zoom_width * self.ZOOM_EDGE_THRESHOLD)
+        return max(0.0, min(target_zoom_start, 1.0 - zoom_width))
+
+    def _advanceZoomScroll(self):
+        """Frame callback: move the zoom window one smoothing step towards the playhead; True while still moving"""
+        if self.media_player['_duration'] <= 0:
+            return False
+        zoom_width = self.zoom_end - self.zoom_start
+        zoom_start = self.zoom_start + (self._zoomScrollTarget() - self.zoom_start) * self.ZOOM_SMOOTHING
+        zoom_start = max(0.0, min(zoom_start, 1.0 - zoom_width))
+        if abs(zoom_start - self.zoom_start) < 1e-6:
+            return False
+        self.zoom_start = zoom_start
+        self.zoom_end = zoom_start + zoom_width
+        self._syncZoomSlider()
+        if hasattr(self, 'timeline_widget'): self.repaint_scheduler.request(self.timeline_widget)
+        if hasattr(self, 'second_timeline_widget'): self.repaint_scheduler.request(self.second_timeline_widget)
+        return True
+
+    def _syncZoomSlider(self):
+        """Place the zoomed slider's handle at the playhead's position within the zoom window"""
+        if self.second_timeline.isSliderDown():
+            return
+        position = self.media_player['_position']
+        zoom_duration_ms = (self.zoom_end - self.zoom_start) * self.media_player['_duration']
+        zoom_start_ms = self.zoom_start * self.media_player['_duration']
+        max_slider_val = self.second_timeline.maximum()
+
+        if position >= zoom_start_ms and position <= (zoom_start_ms + zoom_duration_ms) and zoom_duration_ms > 0 and max_slider_val > 0:
+            relative_pos_in_zoom = (position - zoom_start_ms) / zoom_duration_ms
+            slider_value = int(relative_pos_in_zoom * max_slider_val)
+            self.second_timeline.setValue(slider_value)
+        elif position < zoom_start_ms:
+            self.second_timeline.setValue(0)
+        else:
+            self.second_timeline.setValue(max_slider_val)
 
     
     def qmlDurationChanged(self, duration):
@@ -595,6 +661,7 @@ class VideoPlayerApp(QMainWindow):
         if new_duration != self.media_player['_duration']:
             print(f"--- Duration changed: {new_duration} ms")
             self.media_player['_duration'] = new_duration
+            self.annotation_coverage.set_duration(new_duration)
             has_duration = self.media_player['_duration'] > 0
             
             self.timeline.setRange(0, self.media_player['_duration'] if has_duration else 0)
@@ -666,6 +733,7 @@ class VideoPlayerApp(QMainWindow):
              source_str = self.qml_root_main.property('source').toString() if self.qml_root_main else "N/A"
              QMessageBox.critical(self, "Media Error", f"QML MediaPlayer reported Invalid Media.\nError: {error_str}\nSource: {source_str}")
              self.current_video_path = None
+             self.annotation_pages = None
              if self.autosave_timer.isActive(): self.autosave_timer.stop()
              self.play_pause_button.setEnabled(False)
              self.timeline.setEnabled(False)
@@ -698,20 +766,42 @@ class VideoPlayerApp(QMainWindow):
     
     def openFile(self):
         print("--- openFile triggered")
-        
+        filename, _ = QFileDialog.getOpenFileName(self, "Open Video", "", "Video Files (*.mp4 *.avi *.mkv *.mov)")
+        if filename:
+            print(f"--- User selected file: {filename}")
+            self.openVideoFile(filename)
+        else:
+             print("--- File selection cancelled.")
+
+    def populateRecentSessions(self):
+        self.recent_sessions_menu.clear()
+        sessions = self.autosave_manager.recent_sessions()
+        for session in sessions:
+            video_path = session["video_path"]
+            action = QAction(f"{os.path.basename(video_path)} ({session['annotation_count']} labels)", self)
+            action.setToolTip(video_path)
+            action.setEnabled(os.path.exists(video_path))
+            action.triggered.connect(lambda checked=False, path=video_path: self.openVideoFile(path))
+            self.recent_sessions_menu.addAction(action)
+        if not sessions:
+            empty_action = QAction("No saved sessions", self); empty_action.setEnabled(False)
+            self.recent_sessions_menu.addAction(empty_action)
+
+    def openVideoFile(self, filename):
         self.current_rotation = 0
         if self._qml_main_ready: self.qml_root_main.setProperty('orientation', 0)
         if self._qml_preview_ready: self.qml_root_preview.setProperty('orientation', 0)
 
-        filename, _ = QFileDialog.getOpenFileName(self, "Open Video", "", "Video Files (*.mp4 *.avi *.mkv *.mov)")
         if filename:
-            print(f"--- User selected file: {filename}")
+            self.autosave_manager.flush()
             self.current_video_path = filename
+            self.annotation_pages = self.autosave_manager.session_pages(filename)
             try: self.video_hash = self.autosave_manager.calculate_video_hash(filename)
             except Exception as e: self.video_hash = 0; print(f"Warn: Hash failed {e}")
 
             
-            self.annotations = [] 
+            self.annotations.clear()
+            self.annotation_manager.history.clear()
             autosave_data, hash_matches = self.autosave_manager.check_for_autosave(filename, self.video_hash)
             if autosave_data:
                 message = "An autosaved version of the annotations was found."
@@ -722,23 +812,16 @@ class VideoPlayerApp(QMainWindow):
                 if reply == QMessageBox.StandardButton.Yes:
                     try: 
                         print("--- Restoring annotations from autosave...")
-                        loaded_count = 0
+                        restored = []
                         for ann_data in autosave_data.get("annotations", []):
                              
                              if "id" in ann_data and "range" in ann_data and "start" in ann_data["range"] and "end" in ann_data["range"]:
-                                 annotation = TimelineAnnotation()
-                                 annotation.id = ann_data["id"]
-                                 annotation.start_time = ann_data["range"]["start"] 
-                                 annotation.end_time = ann_data["range"]["end"] 
-                                 annotation.shape = ann_data.get("shape", {})
-                                 annotation.comments = ann_data.get("comments", [])
-                                 self.annotations.append(annotation)
-                                 loaded_count += 1
+                                 restored.append(TimelineAnnotation.from_dict(ann_data))
                              else:
                                  print(f"--- Warning: Skipping invalid autosave annotation data: {ann_data}")
-                        self.updateAnnotationTimeline()
-                        print(f"--- Loaded {loaded_count} annotations from autosave.")
-                    except Exception as e: QMessageBox.critical(self, "Autosave Error", f"Failed to load autosave: {e}"); self.annotations = []
+                        self.annotations.reset(restored)
+                        print(f"--- Loaded {len(restored)} annotations from autosave.")
+                    except Exception as e: QMessageBox.critical(self, "Autosave Error", f"Failed to load autosave: {e}"); self.annotations.clear()
                 else:
                     print("--- User chose not to restore autosave. Deleting...")
                     self.autosave_manager.delete_autosave(filename)
@@ -776,8 +859,6 @@ class VideoPlayerApp(QMainWindow):
             if not self.autosave_timer.isActive():
                 print("--- Starting autosave timer.")
                 self.autosave_timer.start()
-        else:
-             print("--- File selection cancelled.")
 
 
     
@@ -908,9 +989,13 @@ class VideoPlayerApp(QMainWindow):
 
     
     def updateAnnotationTimeline(self):
-        print("--- updateAnnotationTimeline called ---")
-        if hasattr(self, 'timeline_widget'): self.timeline_widget.update()
-        if hasattr(self, 'second_timeline_widget'): self.second_timeline_widget.update()
+        """Repaint both timelines fully, for changes the annotation model does not see (e.g. the in-progress label)"""
+        if hasattr(self, 'timeline_widget'): self.repaint_scheduler.request(self.timeline_widget)
+        if hasattr(self, 'second_timeline_widget'): self.repaint_scheduler.request(self.second_timeline_widget)
+
+    def onAnnotationsChanged(self, change):
+        if hasattr(self, 'timeline_widget'): self.timeline_widget.invalidate_span(change)
+        if hasattr(self, 'second_timeline_widget'): self.second_timeline_widget.invalidate_span(change)
     
     # In VideoPlayerApp class
     def _sync_preview_qml_position(self, main_position):
@@ -932,109 +1017,64 @@ class VideoPlayerApp(QMainWindow):
             self.qml_root_preview.seek(target_preview_pos)
 
     def saveAnnotations(self):
-        from zipfile import ZipFile
-        import csv
-        import io
-
+        """Export labels.json and the category CSVs to a ZIP on a worker thread"""
+        if self._annotation_exporter is not None:
+            return
         filename, _ = QFileDialog.getSaveFileName(self, "Export Annotations", "", "ZIP Files (*.zip)")
-        if filename:
-            try:
-                with ZipFile(filename, 'w') as zipf:
-                    annotations_data = {
-                        "annotations": [],
-                        "videohash": self.video_hash
-                    }
-                    
-                    for annotation in self.annotations:
-                        annotations_data["annotations"].append({
-                            "id": annotation.id,
-                            "range": {
-                                "start": annotation.start_time,
-                                "end": annotation.end_time
-                            },
-                            "shape": annotation.shape,
-                            "comments": annotation.comments
-                        })
-                    
-                    zipf.writestr('labels.json', json.dumps(annotations_data, indent=4))
-
-                    headers = {
-                        'posture.csv': [],
-                        'high_level_behavior.csv': [],
-                        'pa_type.csv': [],
-                        'behavioral_parameters.csv': [],
-                        'experimental_situation.csv': []
-                    }
-
-                    for annotation in self.annotations:
-                        try:
-                            comment_data = json.loads(annotation.comments[0]["body"])
-                            for item in comment_data:
-                                selected_value = item["selectedValue"]
-                                if isinstance(selected_value, list):
-                                    values = selected_value
-                                else:
-                                    values = [selected_value]
-
-                                for value in values:
-                                    if value:
-                                        if item["category"] == "POSTURE":
-                                            headers['posture.csv'].append([
-                                                annotation.start_time, annotation.end_time,
-                                                value, 'human', 'posture',
-                                                annotation.start_time, annotation.end_time
-                                            ])
-                                        elif item["category"] == "HIGH LEVEL BEHAVIOR":
-                                            headers['high_level_behavior.csv'].append([
-                                                annotation.start_time, annotation.end_time,
-                                                value, 'human', 'hlb',
-                                                annotation.start_time, annotation.end_time
-                                            ])
-                                        elif item["category"] == "PA TYPE":
-                                            headers['pa_type.csv'].append([
-                                                annotation.start_time, annotation.end_time,
-                                                value, 'human', 'pa_type',
-                                                annotation.start_time, annotation.end_time
-                                            ])
-                                        elif item["category"] == "Behavioral Parameters":
-                                            headers['behavioral_parameters.csv'].append([
-                                                annotation.start_time, annotation.end_time,
-                                                value, 'human', 'behavioral_parameters',
-                                                annotation.start_time, annotation.end_time
-                                            ])
-                                        elif item["category"] == "Experimental situation":
-                                            headers['experimental_situation.csv'].append([
-                                                annotation.start_time, annotation.end_time,
-                                                value, 'human', 'experimental_situation',
-                                                annotation.start_time, annotation.end_time
-                                            ])
-                        except Exception as e:
-                            print(f"Error processing annotation {annotation.id}: {str(e)}")
-
-                    
-                    csv_header = ['START_TIME','STOP_TIME','PREDICTION','SOURCE','LABELSET','VIDEO_START_TIME','VIDEO_END_TIME']
-                    for filename, data in headers.items():
-                        if data:  
-                            output = io.StringIO()
-                            writer = csv.writer(output)
-                            writer.writerow(csv_header)
-                            writer.writerows(data)
-                            zipf.writestr(filename, output.getvalue())
-                            output.close()
-
-                QMessageBox.information(self, "Success", "Annotations exported successfully")
-            except Exception as e:
-                QMessageBox.critical(self, "Error", f"Failed to export annotations: {str(e)}")
-    
-    
+        if not filename:
+            return
+        schema = SCHEMA_V1 if self.export_v1_action.isChecked() else SCHEMA_VERSION
+        level = QSettings(ORGANIZATION_NAME, APP_NAME).value(SETTINGS_EXPORT_COMPRESSION_LEVEL, DEFAULT_COMPRESSION_LEVEL, type=int)
+        exporter = AnnotationExporter(filename, self.annotations.snapshot(), self.video_hash, schema, level, self)
+        progress = QProgressDialog("Exporting annotations...", "Cancel", 0, 100, self)
+        progress.setWindowTitle("Export Annotations")
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.setMinimumDuration(300)
+        progress.canceled.connect(exporter.cancel)
+        exporter.progress.connect(progress.setValue)
+        exporter.exported.connect(lambda _: QMessageBox.information(self, "Success", "Annotations exported successfully"))
+        exporter.failed.connect(lambda message: QMessageBox.critical(self, "Error", f"Failed to export annotations: {message}"))
+        exporter.finished.connect(progress.close)
+        exporter.finished.connect(self._onExporterStopped)
+        self._annotation_exporter = exporter
+        exporter.start()
+
+    def _onExporterStopped(self):
+        self._annotation_exporter.deleteLater()
+        self._annotation_exporter = None
+
     def autosave(self):
-        """Trigger autosave of current annotations"""
+        """Queue an autosave of a snapshot of the current annotations; skipped while a load is in progress"""
+        if self._load_state is not None and not self._load_state["done"]:
+            return
         if hasattr(self, 'current_video_path') and self.current_video_path:
-            self.autosave_manager.save_annotations(
+            self.autosave_manager.schedule_save(
                 self.current_video_path,
-                self.annotations,
+                self.annotations.snapshot(),
                 video_hash=self.video_hash
             )
+
+    def _journalAnnotationChange(self, kind, annotation, start_ms, end_ms):
+        self.autosave_manager.record_change(self.current_video_path, kind, annotation)
+
+    def setExportV1(self, checked):
+        QSettings(ORGANIZATION_NAME, APP_NAME).setValue(SETTINGS_EXPORT_LABELS_SCHEMA, SCHEMA_V1 if checked else SCHEMA_VERSION)
+
+    def setExportCompressionLevel(self, level):
+        QSettings(ORGANIZATION_NAME, APP_NAME).setValue(SETTINGS_EXPORT_COMPRESSION_LEVEL, level)
+
+    def showAutosaveStatus(self):
+        metrics = self.autosave_manager.metrics()
+        lines = [f"{name.replace('_', ' ')}: {value if value is not None else '-'}" for name, value in metrics.items()]
+        QMessageBox.information(self, "Autosave Status", "\n".join(lines))
+
+    def closeEvent(self, event):
+        for worker in (self._annotation_loader, self._annotation_exporter):
+            if worker is not None:
+                worker.cancel()
+                worker.wait()
+        self.autosave_manager.shutdown()
+        super().closeEvent(event)
     
     
     def rotateVideo(self):
@@ -1057,41 +1097,148 @@ class VideoPlayerApp(QMainWindow):
             self.toggle_shortcuts_action.setText("Show Shortcuts" if visible else "Hide Shortcuts")
     
     def loadAnnotations(self):
-        filename, _ = QFileDialog.getOpenFileName(self, "Load Annotations", "", "JSON Files (*.json)")
+        filename, _ = QFileDialog.getOpenFileName(self, "Load Annotations", "", f"Label Files (*.json *.zip *{COMPACT_EXTENSION})")
         if filename:
-            try:
-                with open(filename, 'r') as f:
-                    data = json.load(f)
-       
-                if self.current_video_path:
-                    saved_hash = data.get("videohash", 0)
-                    if saved_hash != self.video_hash:
-                        reply = QMessageBox.question(
-                            self,
-                            "Hash Mismatch",
-                            "The video file used to create these annotations appears to be different.\n"
-                            "Loading annotations from a different video may result in incorrect timings.\n"
-                            "Would you like to continue loading anyway?",
-                            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
-                        )
-                        if reply == QMessageBox.StandardButton.No:
-                            return
-                
-                self.annotations = []
-                for ann_data in data.get("annotations", []):
-                    annotation = TimelineAnnotation()
-                    annotation.id = ann_data["id"]
-                    annotation.start_time = ann_data["range"]["start"]
-                    annotation.end_time = ann_data["range"]["end"]
-                    annotation.shape = ann_data["shape"]
-                    annotation.comments = ann_data["comments"]
-                    self.annotations.append(annotation)
-                
-                self.updateAnnotationTimeline()
-                if self.current_video_path:
-                    self.autosave()
-            except Exception as e:
-                QMessageBox.critical(self, "Error", f"Failed to load annotations: {str(e)}")
+            self.loadAnnotationFile(filename)
+
+    def importCategoryCsvs(self):
+        filename, _ = QFileDialog.getOpenFileName(self, "Import CSV Labels", "", "Export ZIP or category CSV (*.zip *.csv)")
+        if filename:
+            # A single CSV stands for the export folder it sits in
+            source = os.path.dirname(filename) if filename.lower().endswith('.csv') else filename
+            self.loadAnnotationFile(source, csv_import=True)
+
+    def loadAnnotationFile(self, filename, csv_import=False):
+        """Load a labels file on a worker thread, publishing annotations in batches as they are parsed"""
+        if self._annotation_loader is not None:
+            return
+        loader = AnnotationLoader(filename, self, csv_import=csv_import)
+        progress = QProgressDialog("Loading annotations...", "Cancel", 0, 100, self)
+        progress.setWindowTitle("Load Annotations")
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.setMinimumDuration(300)
+        progress.canceled.connect(loader.cancel)
+        loader.progress.connect(progress.setValue)
+        loader.videoHashRead.connect(self._onLoadVideoHash)
+        loader.batchReady.connect(self._onLoadBatch)
+        loader.loaded.connect(self._onLoadFinished)
+        loader.failed.connect(self._onLoadFailed)
+        loader.finished.connect(self._onLoaderStopped)
+        # Batches are held back until the video hash has been accepted. While the hash
+        # prompt runs its own event loop, completion signals are deferred until it returns
+        self._load_state = {"previous": list(self.annotations), "pending": [], "confirmed": False,
+                            "confirming": False, "deferred": [], "started": False, "done": False,
+                            "progress": progress}
+        self._annotation_loader = loader
+        loader.start()
+
+    def confirmVideoHash(self, saved_hash):
+        """True if annotations saved for saved_hash may be loaded for the current video; None means unknown"""
+        if not self.current_video_path or saved_hash is None or saved_hash == self.video_hash:
+            return True
+        reply = QMessageBox.question(
+            self,
+            "Hash Mismatch",
+            "The video file used to create these annotations appears to be different.\n"
+            "Loading annotations from a different video may result in incorrect timings.\n"
+            "Would you like to continue loading anyway?",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        return reply == QMessageBox.StandardButton.Yes
+
+    def _onLoadVideoHash(self, saved_hash):
+        state = self._load_state
+        if state is None or state["done"]:
+            return
+        state["confirming"] = True
+        try:
+            confirmed = self.confirmVideoHash(saved_hash)
+        finally:
+            state["confirming"] = False
+        if self._load_state is not state:
+            return
+        if confirmed:
+            state["confirmed"] = True
+            pending, state["pending"] = state["pending"], []
+            if pending:
+                self._publishLoadedBatch(pending)
+        else:
+            state["done"] = True
+            state["pending"] = []
+            self._annotation_loader.cancel()
+        deferred, state["deferred"] = state["deferred"], []
+        for handler, args in deferred:
+            handler(*args)
+
+    def _deferWhileConfirming(self, handler, *args):
+        """Queue a completion slot delivered while the hash prompt is open; True if it was queued"""
+        state = self._load_state
+        if state is None or not state["confirming"]:
+            return False
+        state["deferred"].append((handler, args))
+        return True
+
+    def _onLoadBatch(self, batch):
+        state = self._load_state
+        if state is None or state["done"]:
+            return
+        if state["confirmed"]:
+            self._publishLoadedBatch(batch)
+        else:
+            state["pending"].extend(batch)
+
+    def _publishLoadedBatch(self, batch):
+        """Insert a batch in bulk; the store sees one RESET or EXTENDED, so nothing is journaled per annotation"""
+        state = self._load_state
+        if not state["started"]:
+            state["started"] = True
+            self.annotations.reset(batch)
+            self.annotation_manager.history.clear()
+        else:
+            self.annotations.extend(batch)
+
+    def _onLoadFinished(self, count):
+        if self._deferWhileConfirming(self._onLoadFinished, count):
+            return
+        state = self._load_state
+        if state is None or state["done"] or not state["confirmed"]:
+            return
+        state["done"] = True
+        if not state["started"]:
+            self._publishLoadedBatch([])
+        print(f"--- Loaded {count} annotations.")
+        if self.current_video_path:
+            # One full snapshot of the loaded session
+            self.autosave()
+
+    def _onLoadFailed(self, message):
+        if self._deferWhileConfirming(self._onLoadFailed, message):
+            return
+        state = self._load_state
+        if state is None:
+            return
+        state["done"] = True
+        self._restoreBeforeLoad()
+        QMessageBox.critical(self, "Error", f"Failed to load annotations: {message}")
+
+    def _onLoaderStopped(self):
+        if self._deferWhileConfirming(self._onLoaderStopped):
+            return
+        state = self._load_state
+        if state is not None and not state["done"]:
+            # Cancelled from the progress dialog
+            self._restoreBeforeLoad()
+        if state is not None:
+            state["progress"].close()
+        self._annotation_loader.deleteLater()
+        self._annotation_loader = None
+        self._load_state = None
+
+    def _restoreBeforeLoad(self):
+        state = self._load_state
+        if state["started"]:
+            self.annotations.reset(state["previous"])
+            state["started"] = False
 
     
     
@@ -1134,3 +1281,7 @@ class VideoPlayerApp(QMainWindow):
     def mergeWithNext(self): self.annotation_manager.mergeWithNext()
     
     def splitCurrentLabel(self): self.annotation_manager.splitCurrentLabel()
+
+    def undo(self): self.annotation_manager.undo()
+
+    def redo(self): self.annotation_manager.redo()
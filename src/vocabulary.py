@@ -0,0 +1,108 @@
+import csv
+import threading
+
+CAT_POSTURE = "POSTURE"
+CAT_HLB = "HIGH LEVEL BEHAVIOR"
+CAT_PA = "PA TYPE"
+CAT_BP = "Behavioral Parameters"
+CAT_ES = "Experimental situation"
+
+CATEGORIES = (CAT_POSTURE, CAT_HLB, CAT_PA, CAT_BP, CAT_ES)
+
+# Placeholder shown by the label dialog when nothing is selected in a category
+UNLABELED_VALUES = {
+    CAT_POSTURE: "Posture_Unlabeled",
+    CAT_HLB: "HLB_Unlabeled",
+    CAT_PA: "PA_Type_Unlabeled",
+    CAT_BP: "CP_Unlabeled",
+    CAT_ES: "ES_Unlabeled",
+}
+
+# Per-category CSV written to exported ZIPs: category -> (file name, LABELSET column value)
+EXPORT_FILES = {
+    CAT_POSTURE: ("posture.csv", "posture"),
+    CAT_HLB: ("high_level_behavior.csv", "hlb"),
+    CAT_PA: ("pa_type.csv", "pa_type"),
+    CAT_BP: ("behavioral_parameters.csv", "behavioral_parameters"),
+    CAT_ES: ("experimental_situation.csv", "experimental_situation"),
+}
+
+EXPORT_CSV_HEADER = ['START_TIME', 'STOP_TIME', 'PREDICTION', 'SOURCE', 'LABELSET', 'VIDEO_START_TIME', 'VIDEO_END_TIME']
+
+EMPTY_ID = 0
+
+
+class LabelVocabulary:
+    """
+    Per-category interning table mapping label values to small integer IDs.
+
+    IDs are assigned in categories.csv order so they are stable between runs;
+    ID 0 is always the empty value. Values that are not in the CSV (older files,
+    hand-edited exports) are interned on first sight so every label stays
+    representable.
+    """
+
+    def __init__(self, categories=None):
+        self._lock = threading.Lock()
+        self._values = {category: [""] for category in CATEGORIES}
+        self._ids = {category: {"": EMPTY_ID} for category in CATEGORIES}
+        for category, values in (categories or {}).items():
+            for value in values:
+                self.intern(category, value)
+
+    @classmethod
+    def from_csv(cls, path):
+        categories = {category: [UNLABELED_VALUES[category]] for category in CATEGORIES}
+        with open(path, 'r', newline='') as f:
+            for row in csv.DictReader(f):
+                for category, value in row.items():
+                    if value and category in categories:
+                        categories[category].append(value)
+        return cls(categories)
+
+    def intern(self, category, value):
+        """ID for value in category, assigning a new one if it has not been seen"""
+        ids = self._ids[category]
+        value_id = ids.get(value)
+        if value_id is None:
+            with self._lock:
+                value_id = ids.get(value)
+                if value_id is None:
+                    values = self._values[category]
+                    value_id = len(values)
+                    values.append(value)
+                    ids[value] = value_id
+        return value_id
+
+    def intern_many(self, category, values):
+        return tuple(self.intern(category, value) for value in values)
+
+    def decode(self, category, value_id):
+        return self._values[category][value_id]
+
+    def decode_many(self, category, value_ids):
+        values = self._values[category]
+        return [values[value_id] for value_id in value_ids]
+
+    def values(self, category):
+        """All interned values of a category, indexed by ID"""
+        return list(self._values[category])
+
+
+_vocabulary = None
+_vocabulary_lock = threading.Lock()
+
+
+def get_vocabulary():
+    """Shared vocabulary seeded from data/categories/categories.csv"""
+    global _vocabulary
+    if _vocabulary is None:
+        with _vocabulary_lock:
+            if _vocabulary is None:
+                from src.utils import resource_path
+                try:
+                    _vocabulary = LabelVocabulary.from_csv(resource_path('data/categories/categories.csv'))
+                except OSError as e:
+                    print(f"Could not load categories.csv, starting with an empty vocabulary: {e}")
+                    _vocabulary = LabelVocabulary()
+    return _vocabulary
@@ -1,7 +1,67 @@
+import math
 from PyQt6.QtWidgets import QWidget
-from PyQt6.QtCore import Qt, QPointF, QRectF
-from PyQt6.QtGui import QPainter, QPen, QColor, QLinearGradient
-import json
+from PyQt6.QtCore import Qt, QEvent, QPointF, QRectF, QRect
+from PyQt6.QtGui import (QPainter, QPen, QColor, QLinearGradient, QPixmap, QBrush, QStaticText,
+                         QFontMetricsF, QTransform)
+from src.annotation_window import AnnotationWindow
+from src.palette import NEUTRAL_COLOR
+
+# Pixels either side of an annotation edge that still grab it
+EDGE_TOLERANCE_PX = 5
+# Block alpha when idle, edge-hovered and dragged
+BLOCK_ALPHA = 140
+HOVER_ALPHA = 160
+DRAG_ALPHA = 180
+STATIC_TEXT_CACHE_SIZE = 1024
+
+
+class PaintResources:
+    """
+    Pens, brushes and prepared label text shared by every paint of a timeline.
+
+    Brushes are built once per (posture, alpha, lightness) from the posture
+    palette and label text is elided to the block width and prepared as
+    QStaticText once per (text, width), so repainting the same blocks
+    allocates no colours, pens or text layouts.
+    """
+
+    def __init__(self, font, color_for_posture):
+        self.font = font
+        self.color_for_posture = color_for_posture
+        self.text_pen = QPen(QColor(255, 255, 255))
+        self.marker_pen = QPen(QColor(255, 255, 255, 200), 2)
+        self._metrics = QFontMetricsF(font)
+        self._brushes = {}
+        self._texts = {}
+
+    def brush(self, posture, alpha, lightness=100):
+        key = (posture, alpha, lightness)
+        brush = self._brushes.get(key)
+        if brush is None:
+            color = QColor(self.color_for_posture(posture) if posture else NEUTRAL_COLOR)
+            if lightness != 100:
+                color = color.lighter(lightness)
+            color.setAlpha(alpha)
+            brush = self._brushes[key] = QBrush(color)
+        return brush
+
+    def static_text(self, text, width):
+        """Prepared text of a label elided to width pixels"""
+        key = (text, int(width))
+        static = self._texts.get(key)
+        if static is None:
+            if len(self._texts) >= STATIC_TEXT_CACHE_SIZE:
+                self._texts.clear()
+            static = QStaticText(self._metrics.elidedText(text, Qt.TextElideMode.ElideRight, int(width)))
+            static.setTextFormat(Qt.TextFormat.PlainText)
+            static.prepare(QTransform(), self.font)
+            self._texts[key] = static
+        return static
+
+    def draw_centered(self, painter, rect, text):
+        static = self.static_text(text, rect.width())
+        size = static.size()
+        painter.drawStaticText(QPointF(rect.center().x() - size.width() / 2, rect.center().y() - size.height() / 2), static)
 
 class TimelineWidget(QWidget):
     def __init__(self, parent=None, show_position=False, is_main_timeline=True):
@@ -11,10 +71,15 @@ class TimelineWidget(QWidget):
         self.is_main_timeline = is_main_timeline
         self.setMinimumHeight(60)
         self.dragging = None
+        self.drag_origin = None
 
         self.hover_edge = None
         self.hover_annotation = None
         self.hover_pos = None
+        self._window = None
+        self._layer = None
+        self._layer_key = None
+        self._resources = None
 
         self.setCursor(Qt.CursorShape.ArrowCursor)
         self.setMouseTracking(True)
@@ -45,7 +110,7 @@ class TimelineWidget(QWidget):
         annotation_bar_height = self.height() * 0.4
         annotation_bar_y = (self.height() - annotation_bar_height) / 2
         if annotation_bar_y <= y <= (annotation_bar_y + annotation_bar_height):
-            for annotation in reversed(self.app.annotations):
+            for annotation in self._annotations_near(x, duration):
                 start_x, end_x = self._get_annotation_screen_coords(annotation, duration)
 
                 if end_x < 0 or start_x > self.width():
@@ -54,18 +119,23 @@ class TimelineWidget(QWidget):
                 start_x = max(0, min(start_x, self.width()))
                 end_x = max(0, min(end_x, self.width()))
 
-                if abs(x - end_x) < 5:
+                if abs(x - end_x) < EDGE_TOLERANCE_PX:
                     self.dragging = ('end', annotation)
+                    self.drag_origin = (annotation.start_time, annotation.end_time)
                     self.update()
                     return
-                elif abs(x - start_x) < 5:
+                elif abs(x - start_x) < EDGE_TOLERANCE_PX:
                     self.dragging = ('start', annotation)
+                    self.drag_origin = (annotation.start_time, annotation.end_time)
                     self.update()
                     return
 
     def mouseReleaseEvent(self, event):
         if self.dragging:
+            if isinstance(self.dragging, tuple) and self.drag_origin is not None:
+                self.app.annotation_manager.record_bounds_change(self.dragging[1], self.drag_origin)
             self.dragging = None
+            self.drag_origin = None
             self.setCursor(Qt.CursorShape.ArrowCursor)
             self.update()
 
@@ -78,6 +148,7 @@ class TimelineWidget(QWidget):
 
         if self.dragging:
             if self.dragging in ['zoom_start', 'zoom_end']:
+                old_x = (self.app.zoom_start if self.dragging == 'zoom_start' else self.app.zoom_end) * self.width()
                 width_percent = max(0.0, min(1.0, x / self.width()))
                 min_zoom_width = 0.01
 
@@ -92,8 +163,10 @@ class TimelineWidget(QWidget):
                     else:
                         self.app.zoom_end = self.app.zoom_start + min_zoom_width
 
-                self.app.timeline_widget.update()
-                self.app.second_timeline_widget.update()
+                new_x = (self.app.zoom_start if self.dragging == 'zoom_start' else self.app.zoom_end) * self.width()
+                # Only the strip the handle and its overlay edge swept changes on the overview
+                self._request_repaint(self.app.timeline_widget, self._column_rect(old_x, new_x, 3))
+                self._request_repaint(self.app.second_timeline_widget)
                 return
 
             elif isinstance(self.dragging, tuple):
@@ -106,14 +179,9 @@ class TimelineWidget(QWidget):
                     if visible_duration <= 0: return
                     new_time = visible_start + (x / self.width()) * visible_duration
 
-                sorted_annotations = sorted(self.app.annotations, key=lambda x: x.start_time)
-                current_index = -1
-                for idx, ann in enumerate(sorted_annotations):
-                    if ann.id == annotation.id:
-                        current_index = idx
-                        break
-
+                current_index = self.app.annotations.index_of(annotation)
                 if current_index == -1: return
+                prev_annotation, next_annotation = self.app.annotations.neighbours(annotation)
 
                 min_duration = 0.05
 
@@ -121,25 +189,21 @@ class TimelineWidget(QWidget):
                     if annotation.end_time - new_time < min_duration:
                         new_time = annotation.end_time - min_duration
 
-                    if current_index > 0:
-                        prev_annotation = sorted_annotations[current_index - 1]
+                    if prev_annotation is not None:
                         if new_time < prev_annotation.end_time:
                             new_time = prev_annotation.end_time
 
-                    annotation.start_time = max(0, new_time)
+                    self.app.annotations.update_bounds(annotation, start_time=max(0, new_time))
 
                 else:
                     if new_time - annotation.start_time < min_duration:
                         new_time = annotation.start_time + min_duration
 
-                    if current_index < len(sorted_annotations) - 1:
-                        next_annotation = sorted_annotations[current_index + 1]
+                    if next_annotation is not None:
                         if new_time > next_annotation.start_time:
                             new_time = next_annotation.start_time
 
-                    annotation.end_time = min(duration, new_time)
-
-                self.app.updateAnnotationTimeline()
+                    self.app.annotations.update_bounds(annotation, end_time=min(duration, new_time))
         else:
             old_hover_edge = self.hover_edge
             old_hover_annotation = self.hover_annotation
@@ -156,16 +220,16 @@ class TimelineWidget(QWidget):
             is_over_bar = annotation_bar_y <= y <= (annotation_bar_y + annotation_bar_height)
 
             if is_over_bar:
-                for annotation in reversed(self.app.annotations):
+                for annotation in self._annotations_near(x, duration):
                     start_x, end_x = self._get_annotation_screen_coords(annotation, duration)
 
                     if end_x < 0 or start_x > self.width():
                         continue
 
-                    if abs(x - start_x) < 5:
+                    if abs(x - start_x) < EDGE_TOLERANCE_PX:
                         found_edge = ('start', annotation)
                         break
-                    if abs(x - end_x) < 5:
+                    if abs(x - end_x) < EDGE_TOLERANCE_PX:
                         found_edge = ('end', annotation)
                         break
 
@@ -233,7 +297,8 @@ class TimelineWidget(QWidget):
                      relative_pos_percent = (position_ms / 1000 - visible_start) / visible_duration
                      progress_width = relative_pos_percent * self.width()
                      if 0 <= progress_width <= self.width():
-                         progress_gradient = QLinearGradient(0, 0, progress_width, 0)
+                         # Spans the whole widget so a pixel's shade does not depend on the position
+                         progress_gradient = QLinearGradient(0, 0, self.width(), 0)
                          progress_gradient.setColorAt(0, QColor(60, 60, 60))
                          progress_gradient.setColorAt(1, QColor(80, 80, 80))
                          painter.setBrush(progress_gradient)
@@ -258,45 +323,6 @@ class TimelineWidget(QWidget):
                 painter.fillRect(QRectF(0, 0, zoom_start_x, self.height()), overlay_color)
                 painter.fillRect(QRectF(zoom_end_x, 0, self.width() - zoom_end_x, self.height()), overlay_color)
 
-        def draw_annotation_block(start_x, end_x, annotation=None, is_dragging=False, is_edge_hover=False):
-            block_width = max(1, end_x - start_x)
-
-            height = self.height() * 0.4
-            y_pos = (self.height() - height) / 2
-
-            base_color = QColor("#808080")
-            if annotation and annotation.comments:
-                try:
-                    comment_data = json.loads(annotation.comments[0]["body"])
-                    posture = next((item.get("selectedValue") for item in comment_data if item.get("category") == "POSTURE"), None)
-                    if posture:
-                        color_str = self.app.annotation_manager.get_posture_color(posture)
-                        base_color = QColor(color_str)
-                except Exception as e:
-                    print(f"Error getting annotation color: {e}")
-
-            alpha = 180 if is_dragging else (160 if is_edge_hover else 140)
-            color = QColor(base_color.red(), base_color.green(), base_color.blue(), alpha)
-
-            painter.setPen(Qt.PenStyle.NoPen)
-            painter.setBrush(color)
-            painter.drawRect(QRectF(start_x, y_pos, block_width, height))
-
-
-            if is_dragging or is_edge_hover:
-                painter.setPen(QPen(QColor(255, 255, 255, 200), 2))
-                marker_height = 8
-                edge_type = None
-                if is_dragging and isinstance(self.dragging, tuple): edge_type = self.dragging[0]
-                elif is_edge_hover and isinstance(self.hover_edge, tuple): edge_type = self.hover_edge[0]
-
-                if edge_type == 'start':
-                    painter.drawLine(QPointF(start_x, y_pos - marker_height), QPointF(start_x, y_pos))
-                    painter.drawLine(QPointF(start_x, y_pos + height), QPointF(start_x, y_pos + height + marker_height))
-                if edge_type == 'end':
-                    painter.drawLine(QPointF(end_x, y_pos - marker_height), QPointF(end_x, y_pos))
-                    painter.drawLine(QPointF(end_x, y_pos + height), QPointF(end_x, y_pos + height + marker_height))
-
         if hasattr(self.app, 'current_annotation') and self.app.current_annotation:
             start_x, _ = self._get_annotation_screen_coords(self.app.current_annotation, duration)
             if 0 <= start_x <= self.width():
@@ -305,99 +331,303 @@ class TimelineWidget(QWidget):
 
 
         if hasattr(self.app, 'annotations'):
-            for annotation in self.app.annotations:
-                start_x, end_x = self._get_annotation_screen_coords(annotation, duration)
+            painter.drawPixmap(0, 0, self._annotation_layer(duration, visible_start, visible_duration))
 
-                if end_x < 0 or start_x > self.width():
-                    continue
+        if self.hover_annotation and self.hover_pos:
+            self._draw_hover_tooltip(painter, self.hover_pos, self.hover_annotation)
+
+    def invalidate_layer(self):
+        """Drop the cached annotation layer so the next paint redraws it"""
+        self._layer = None
+
+    def _annotation_layer(self, duration, visible_start, visible_duration):
+        """
+        The annotation blocks and labels as a transparent pixmap, cached until
+        the store generation, the size, the zoom or the drag/hover state changes,
+        so playhead-only repaints just blit it
+        """
+        store = self.app.annotations
+        generation = getattr(store, 'generation', None)
+        coverage = getattr(self.app, 'annotation_coverage', None)
+        ratio = self.devicePixelRatioF()
+        key = (
+            id(store), generation, self.width(), self.height(), ratio, duration,
+            None if self.is_main_timeline else (self.app.zoom_start, self.app.zoom_end),
+            coverage is not None and coverage.ready,
+            self._edge_key(self.dragging), None if self.dragging else self._edge_key(self.hover_edge),
+        )
+        if self._layer is None or generation is None or key != self._layer_key:
+            layer = QPixmap(max(1, round(self.width() * ratio)), max(1, round(self.height() * ratio)))
+            layer.setDevicePixelRatio(ratio)
+            layer.fill(Qt.GlobalColor.transparent)
+            painter = QPainter(layer)
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+            painter.setFont(self.font())
+            self._paint_annotations(painter, duration, visible_start, visible_duration)
+            painter.end()
+            self._layer = layer
+            self._layer_key = key
+        return self._layer
+
+    @staticmethod
+    def _edge_key(edge):
+        return (edge[0], id(edge[1])) if isinstance(edge, tuple) else edge
+
+    def _paint_resources(self):
+        if self._resources is None:
+            self._resources = PaintResources(self.font(), self.app.annotation_manager.get_posture_color)
+        return self._resources
+
+    def changeEvent(self, event):
+        if event.type() == QEvent.Type.FontChange:
+            self._resources = None
+            self.invalidate_layer()
+        super().changeEvent(event)
+
+    def _paint_annotations(self, painter, duration, visible_start, visible_duration):
+        resources = self._paint_resources()
+        coverage = getattr(self.app, 'annotation_coverage', None)
+        if self.is_main_timeline and coverage is not None and coverage.ready:
+            self._draw_columns(painter, coverage)
+            # Only the annotation being dragged or hovered is drawn individually on the overview
+            visible = [edge[1] for edge in (self.dragging, self.hover_edge) if isinstance(edge, tuple)]
+        else:
+            visible = self._visible_annotations(visible_start, visible_duration)
+        for annotation in visible:
+            start_x, end_x = self._get_annotation_screen_coords(annotation, duration)
 
-                clamped_start_x = max(0, start_x)
-                clamped_end_x = min(end_x, self.width())
-                block_width = clamped_end_x - clamped_start_x
+            if end_x < 0 or start_x > self.width():
+                continue
 
+            clamped_start_x = max(0, start_x)
+            clamped_end_x = min(end_x, self.width())
+            block_width = clamped_end_x - clamped_start_x
 
-                if block_width >= 0:
-                    is_dragging_this = self.dragging and isinstance(self.dragging, tuple) and self.dragging[1].id == annotation.id
-                    is_hovering_this_edge = not self.dragging and self.hover_edge and self.hover_edge[1].id == annotation.id
-                    draw_annotation_block(clamped_start_x, clamped_end_x, annotation=annotation, is_dragging=is_dragging_this, is_edge_hover=is_hovering_this_edge)
 
+            if block_width >= 0:
+                is_dragging_this = self.dragging and isinstance(self.dragging, tuple) and self.dragging[1].id == annotation.id
+                is_hovering_this_edge = not self.dragging and self.hover_edge and self.hover_edge[1].id == annotation.id
+                self._draw_annotation_block(painter, clamped_start_x, clamped_end_x, annotation=annotation, is_dragging=is_dragging_this, is_edge_hover=is_hovering_this_edge)
 
-                if block_width > 50:
-                    painter.setPen(QPen(QColor(255, 255, 255)))
-                    try:
-                        comment_data = json.loads(annotation.comments[0]["body"])
-                        posture = next((item.get("selectedValue") for item in comment_data if item.get("category") == "POSTURE"), "")
-                        hlb_list = next((item.get("selectedValue") for item in comment_data if item.get("category") == "HIGH LEVEL BEHAVIOR"), [])
-                        hlb = hlb_list if isinstance(hlb_list, list) else []
 
-                        text = ", ".join(hlb[:2]) + ("..." if len(hlb) > 2 else "")
-                        full_text = f"{posture} - {text}" if posture and text else posture or text
+            if block_width > 50:
+                painter.setPen(resources.text_pen)
+                labels = annotation.labels
+                posture = labels.posture
+                hlb = labels.hlb
 
-                        block_height = self.height() * 0.4
-                        block_y_pos = (self.height() - block_height) / 2
-                        text_rect = QRectF(clamped_start_x + 4, block_y_pos, block_width - 8, block_height)
-                        painter.drawText(text_rect, Qt.AlignmentFlag.AlignCenter, full_text)
-                    except Exception as e:
-                        print(f"Error displaying annotation text: {e}")
+                text = ", ".join(hlb[:2]) + ("..." if len(hlb) > 2 else "")
+                full_text = f"{posture} - {text}" if posture and text else posture or text
 
-        if self.hover_annotation and self.hover_pos:
-            self._draw_hover_tooltip(painter, self.hover_pos, self.hover_annotation)
+                block_height = self.height() * 0.4
+                block_y_pos = (self.height() - block_height) / 2
+                text_rect = QRectF(clamped_start_x + 4, block_y_pos, block_width - 8, block_height)
+                resources.draw_centered(painter, text_rect, full_text)
 
-    def _get_annotation_screen_coords(self, annotation, duration):
+    def _draw_annotation_block(self, painter, start_x, end_x, annotation=None, is_dragging=False, is_edge_hover=False):
+        block_width = max(1, end_x - start_x)
+
+        height = self.height() * 0.4
+        y_pos = (self.height() - height) / 2
+
+        resources = self._paint_resources()
+        posture = annotation.labels.posture if annotation else ""
+        alpha = DRAG_ALPHA if is_dragging else (HOVER_ALPHA if is_edge_hover else BLOCK_ALPHA)
+
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(resources.brush(posture, alpha))
+        painter.drawRect(QRectF(start_x, y_pos, block_width, height))
+
+
+        if is_dragging or is_edge_hover:
+            painter.setPen(resources.marker_pen)
+            marker_height = 8
+            edge_type = None
+            if is_dragging and isinstance(self.dragging, tuple): edge_type = self.dragging[0]
+            elif is_edge_hover and isinstance(self.hover_edge, tuple): edge_type = self.hover_edge[0]
+
+            if edge_type == 'start':
+                painter.drawLine(QPointF(start_x, y_pos - marker_height), QPointF(start_x, y_pos))
+                painter.drawLine(QPointF(start_x, y_pos + height), QPointF(start_x, y_pos + height + marker_height))
+            if edge_type == 'end':
+                painter.drawLine(QPointF(end_x, y_pos - marker_height), QPointF(end_x, y_pos))
+                painter.drawLine(QPointF(end_x, y_pos + height), QPointF(end_x, y_pos + height + marker_height))
+
+    def _visible_annotations(self, visible_start, visible_duration):
+        """
+        Annotations overlapping the visible time range, from a window paged in from
+        the session database while it holds the store's current generation, and
+        from the store while edits are still waiting for the autosave
+        """
+        store = self.app.annotations
+        if not hasattr(store, 'between'):
+            return store
+        source = store
+        pages = getattr(self.app, 'annotation_pages', None)
+        if pages is not None and pages.generation == store.generation:
+            source = pages
+        if self._window is None or self._window.source is not source:
+            self._window = AnnotationWindow(source)
+        start_ms = int(visible_start * 1000)
+        return self._window.view(start_ms, start_ms + int(visible_duration * 1000))
+
+    def _annotations_near(self, x, duration, tolerance=EDGE_TOLERANCE_PX):
+        """
+        Annotations within tolerance pixels of x, latest start first. The time
+        span under those pixels is looked up with the store's binary search, so
+        hit-testing costs O(log n + hits) instead of a pass over every annotation.
+        """
+        store = self.app.annotations
+        if not hasattr(store, 'between'):
+            return reversed(store)
+        start_time = self._x_to_time(x - tolerance, duration)
+        end_time = self._x_to_time(x + tolerance, duration)
+        return reversed(store.between(math.floor(start_time * 1000), math.ceil(end_time * 1000)))
+
+    def _x_to_time(self, x, duration):
+        """Session time in seconds under widget x"""
+        if self.is_main_timeline:
+            return (x / self.width()) * duration
+        visible_duration = (self.app.zoom_end - self.app.zoom_start) * duration
+        return self.app.zoom_start * duration + (x / self.width()) * visible_duration
+
+    def _draw_columns(self, painter, coverage):
+        """
+        Draw the overview from per-pixel-column coverage: one rectangle per
+        stretch of identical columns, so at most one per column however many
+        annotations the session has. Alpha follows the labelled share of the
+        column and columns with many annotation edges are drawn lighter.
+        """
+        height = self.height() * 0.4
+        y_pos = (self.height() - height) / 2
+        postures, fractions, boundaries = coverage.columns(self.width())
+        resources = self._paint_resources()
+        painter.setPen(Qt.PenStyle.NoPen)
+        column = 0
+        while column < len(postures):
+            if not fractions[column]:
+                column += 1
+                continue
+            style = self._column_style(postures, fractions, boundaries, column)
+            stop = column + 1
+            while stop < len(postures) and fractions[stop] and self._column_style(postures, fractions, boundaries, stop) == style:
+                stop += 1
+            posture, alpha, edges = style
+            painter.fillRect(QRectF(column, y_pos, stop - column, height), resources.brush(posture, alpha, 100 + 15 * edges))
+            column = stop
+
+        painter.setPen(resources.text_pen)
+        column = 0
+        while column < len(postures):
+            posture = postures[column]
+            stop = column + 1
+            while stop < len(postures) and postures[stop] == posture and fractions[stop]:
+                stop += 1
+            if posture and fractions[column] and stop - column > 50:
+                resources.draw_centered(painter, QRectF(column + 4, y_pos, stop - column - 8, height), posture)
+            column = stop
+
+    @staticmethod
+    def _column_style(postures, fractions, boundaries, column):
+        """(posture, alpha, edge level) that decides how a column is filled"""
+        return postures[column], int(60 + 80 * fractions[column]), min(4, boundaries[column])
+
+    def invalidate_span(self, change):
+        """Schedule a repaint of the part of the timeline covered by an AnnotationModel change"""
+        self.invalidate_layer()
+        if change.full:
+            self._request_repaint(self)
+            return
+        if not hasattr(self.app, 'media_player'):
+            return
+        duration = self.app.media_player['_duration'] / 1000 or 1
+        start_x, end_x = self._time_span_to_x(change.start_ms / 1000, change.end_ms / 1000, duration)
+        # Edge markers are drawn with a 2px pen straddling the block edges
+        rect = self._column_rect(start_x, end_x, 4)
+        if rect is not None:
+            self._request_repaint(self, rect)
+
+    def invalidate_position(self, old_ms, new_ms):
+        """
+        Schedule a repaint for a playhead move from old_ms to new_ms: the strip
+        between the two playhead lines on the overview, or between the two
+        progress widths on the zoomed timeline
+        """
+        if not hasattr(self.app, 'media_player'):
+            return
+        duration = self.app.media_player['_duration'] / 1000 or 1
+        old_x, new_x = self._time_span_to_x(old_ms / 1000, new_ms / 1000, duration)
+        rect = self._column_rect(old_x, new_x, 2)
+        if rect is not None:
+            self._request_repaint(self, rect)
+
+    def _column_rect(self, first_x, second_x, margin):
+        """Full-height rectangle between two x positions plus margin, clipped to the widget; None if off-screen"""
+        left = max(0, int(min(first_x, second_x)) - margin)
+        right = min(self.width(), int(max(first_x, second_x)) + margin + 1)
+        if right <= left:
+            return None
+        return QRect(left, 0, right - left, self.height())
+
+    def _request_repaint(self, widget, rect=None):
+        """Repaint through the app's RepaintScheduler when there is one, else right away"""
+        scheduler = getattr(self.app, 'repaint_scheduler', None)
+        if scheduler is not None:
+            scheduler.request(widget, rect)
+        elif rect is None:
+            widget.update()
+        else:
+            widget.update(rect)
+
+    def _time_span_to_x(self, start_time, end_time, duration):
         if duration <= 0: return -1, -1
 
         if self.is_main_timeline:
-            start_x = (annotation.start_time / duration) * self.width()
-            end_x = (annotation.end_time / duration) * self.width()
+            start_x = (start_time / duration) * self.width()
+            end_x = (end_time / duration) * self.width()
         else:
             visible_duration = (self.app.zoom_end - self.app.zoom_start) * duration
             visible_start = self.app.zoom_start * duration
             if visible_duration <= 0: return -1, -1
-            start_x = ((annotation.start_time - visible_start) / visible_duration) * self.width()
-            end_x = ((annotation.end_time - visible_start) / visible_duration) * self.width()
+            start_x = ((start_time - visible_start) / visible_duration) * self.width()
+            end_x = ((end_time - visible_start) / visible_duration) * self.width()
         return start_x, end_x
 
+    def _get_annotation_screen_coords(self, annotation, duration):
+        return self._time_span_to_x(annotation.start_time, annotation.end_time, duration)
+
     def _format_annotation_for_tooltip(self, annotation):
-        if not annotation or not annotation.comments:
+        if not annotation or not annotation.has_labels:
             return ""
 
-        try:
-            comment_list = json.loads(annotation.comments[0]['body'])
-
-            def find_value(category_name):
-                return next((item.get("selectedValue") for item in comment_list if item.get("category") == category_name), None)
-
-            tooltip_items = [
-                ("Posture", find_value("POSTURE")),
-                ("Behavior", find_value("HIGH LEVEL BEHAVIOR")),
-                ("PA Type", find_value("PHYSICAL ACTIVITY TYPE")),
-                ("Params", find_value("BEHAVIORAL PARAMETERS")),
-                ("Situation", find_value("EXPERIMENTAL SITUATION")),
-                ("Notes", find_value("SPECIAL NOTES")),
-            ]
-
-            parts = []
-            for label, value in tooltip_items:
-                if not value:
-                    continue
-
-                if isinstance(value, list):
-                    valid_values = [str(v) for v in value if v]
-                    if not valid_values: continue
-                    formatted_value = ", ".join(valid_values)
-                else:
-                    formatted_value = str(value)
-
-                parts.append(f"{label}: {formatted_value}")
+        labels = annotation.labels
+        tooltip_items = [
+            ("Posture", labels.posture),
+            ("Behavior", labels.hlb),
+            ("PA Type", labels.pa_type),
+            ("Params", labels.behavioral_params),
+            ("Situation", labels.exp_situation),
+            ("Notes", labels.special_notes),
+        ]
+
+        parts = []
+        for label, value in tooltip_items:
+            if not value:
+                continue
+
+            if isinstance(value, list):
+                valid_values = [str(v) for v in value if v]
+                if not valid_values: continue
+                formatted_value = ", ".join(valid_values)
+            else:
+                formatted_value = str(value)
 
-            if not parts:
-                return "No Labels Set"
+            parts.append(f"{label}: {formatted_value}")
 
-            return " | ".join(parts)
+        if not parts:
+            return "No Labels Set"
 
-        except (json.JSONDecodeError, IndexError, KeyError, TypeError) as e:
-            print(f"Error formatting tooltip: {e}")
-            return "Invalid Annotation Data"
+        return " | ".join(parts)
 
 
     def _draw_hover_tooltip(self, painter, position, annotation):
@@ -0,0 +1,172 @@
+import io
+import os
+from zipfile import ZipFile, is_zipfile
+from PyQt6.QtCore import QThread, pyqtSignal
+from src.models import SCHEMA_V1, SCHEMA_V2, TimelineAnnotation
+from src.csv_import import import_category_csvs
+from src.export import DEFAULT_COMPRESSION_LEVEL, write_export
+from src.utils import COMPACT_MAGIC, iter_label_document, read_compact
+
+# Annotations per batchReady signal
+LOAD_BATCH_SIZE = 2000
+# Archive member written by Export Labels
+LABELS_MEMBER = "labels.json"
+
+
+def find_labels_member(archive):
+    """The labels.json entry of an export ZIP, also when the export was re-zipped inside a folder"""
+    try:
+        return archive.getinfo(LABELS_MEMBER)
+    except KeyError:
+        pass
+    candidates = [info for info in archive.infolist() if os.path.basename(info.filename) == LABELS_MEMBER]
+    if not candidates:
+        raise ValueError(f"No {LABELS_MEMBER} in {os.path.basename(archive.filename or 'archive')}")
+    return min(candidates, key=lambda info: info.filename.count("/"))
+
+
+class AnnotationLoader(QThread):
+    """
+    Reads a labels file on a worker thread.
+
+    JSON documents are parsed one record at a time with iter_label_document;
+    for an export ZIP, labels.json is streamed straight from the archive member
+    without being extracted. Compact files are decoded whole. Annotations are
+    emitted in batches of LOAD_BATCH_SIZE as they are built. videoHashRead is emitted once, as soon as
+    the hash is known: before the first batch for schema v2 and compact files,
+    which store it first, and after the last one for v1 files. Exactly one of
+    loaded or failed is emitted unless the load is cancelled.
+
+    With csv_import, path is an export ZIP or folder whose category CSVs are
+    merged into annotations by import_category_csvs; there is no video hash to
+    check, so videoHashRead carries None.
+    """
+    progress = pyqtSignal(int)
+    videoHashRead = pyqtSignal(object)
+    batchReady = pyqtSignal(list)
+    loaded = pyqtSignal(int)
+    failed = pyqtSignal(str)
+
+    def __init__(self, path, parent=None, batch_size=LOAD_BATCH_SIZE, csv_import=False):
+        super().__init__(parent)
+        self.path = path
+        self.batch_size = batch_size
+        self.csv_import = csv_import
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        try:
+            if self.csv_import:
+                count = self._load_csvs()
+            elif self._is_compact():
+                count = self._load_compact()
+            elif is_zipfile(self.path):
+                count = self._load_zip()
+            else:
+                with open(self.path, 'rb') as raw:
+                    count = self._load_json(raw, os.path.getsize(self.path))
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        if count is not None:
+            self.loaded.emit(count)
+
+    def _is_compact(self):
+        with open(self.path, 'rb') as f:
+            return f.read(len(COMPACT_MAGIC)) == COMPACT_MAGIC
+
+    def _load_csvs(self):
+        annotations = import_category_csvs(self.path)
+        self.videoHashRead.emit(None)
+        return self._emit_batches(annotations)
+
+    def _load_compact(self):
+        annotations, video_hash = read_compact(self.path)
+        self.videoHashRead.emit(video_hash)
+        return self._emit_batches(annotations)
+
+    def _emit_batches(self, annotations):
+        for start in range(0, len(annotations), self.batch_size):
+            if self._cancelled:
+                return None
+            self.batchReady.emit(annotations[start:start + self.batch_size])
+            self.progress.emit(int(100 * min(len(annotations), start + self.batch_size) / max(1, len(annotations))))
+        return len(annotations)
+
+    def _load_zip(self):
+        with ZipFile(self.path) as archive:
+            member = find_labels_member(archive)
+            with archive.open(member) as raw:
+                return self._load_json(raw, member.file_size)
+
+    def _load_json(self, raw, size):
+        """Parse a document from a binary stream whose tell() advances towards size"""
+        size = max(1, size)
+        video_hash = None
+        batch = []
+        count = 0
+        last_percent = -1
+        with io.TextIOWrapper(raw, encoding='utf-8') as f:
+            for kind, key, value in iter_label_document(f):
+                if self._cancelled:
+                    return None
+                if kind == "annotation":
+                    batch.append(TimelineAnnotation.from_dict(value))
+                    count += 1
+                    if len(batch) >= self.batch_size:
+                        self.batchReady.emit(batch)
+                        batch = []
+                        percent = min(100, int(100 * raw.tell() / size))
+                        if percent != last_percent:
+                            self.progress.emit(percent)
+                            last_percent = percent
+                elif key == "schema" and value not in (SCHEMA_V1, SCHEMA_V2):
+                    raise ValueError(f"Unsupported labels schema {value}")
+                elif key == "videohash" and video_hash is None:
+                    video_hash = value
+                    self.videoHashRead.emit(video_hash)
+        if video_hash is None:
+            self.videoHashRead.emit(0)
+        if batch:
+            self.batchReady.emit(batch)
+        self.progress.emit(100)
+        return count
+
+
+class AnnotationExporter(QThread):
+    """
+    Writes an export ZIP of a snapshot of AnnotationRecords on a worker thread
+    with write_export; exporters names the registered exporters to run, all of
+    them by default. Exactly one of exported or failed is emitted unless the
+    export is cancelled, in which case the target file is left untouched.
+    """
+    progress = pyqtSignal(int)
+    exported = pyqtSignal(str)
+    failed = pyqtSignal(str)
+
+    def __init__(self, path, records, video_hash=0, schema=SCHEMA_V2,
+                 compression_level=DEFAULT_COMPRESSION_LEVEL, parent=None, exporters=None):
+        super().__init__(parent)
+        self.path = path
+        self.records = records
+        self.video_hash = video_hash
+        self.schema = schema
+        self.compression_level = compression_level
+        self.exporters = exporters
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        try:
+            completed = write_export(self.path, self.records, self.video_hash, self.schema, self.compression_level,
+                                     self.exporters, progress=self.progress.emit, is_cancelled=lambda: self._cancelled)
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        if completed:
+            self.exported.emit(self.path)
@@ -0,0 +1,87 @@
+import csv
+import io
+import os
+from zipfile import ZipFile
+import pytest
+from src.analytics import AnalyticsIndex, covered_length, main, resolve_category
+from src.models import AnnotationLabels, TimelineAnnotation
+from src.session_store import SessionStore
+from src.vocabulary import CAT_HLB, CAT_PA, CAT_POSTURE, EXPORT_CSV_HEADER, EXPORT_FILES
+
+def write_export(path, rows_by_category):
+    with ZipFile(path, 'w') as zipf:
+        zipf.writestr('labels.json', 'not parsed')
+        for category, rows in rows_by_category.items():
+            filename, labelset = EXPORT_FILES[category]
+            output = io.StringIO()
+            writer = csv.writer(output)
+            writer.writerow(EXPORT_CSV_HEADER)
+            writer.writerows([start, end, value, 'human', labelset, start, end] for start, end, value in rows)
+            zipf.writestr(filename, output.getvalue())
+    return str(path)
+
+@pytest.fixture
+def index(tmp_path):
+    index = AnalyticsIndex(str(tmp_path / "analytics.sqlite3"))
+    yield index
+    index.close()
+
+def test_covered_length_merges_overlaps():
+    assert covered_length([(0, 10), (5, 15), (20, 25)]) == 20
+    assert covered_length([]) == 0
+
+def test_durations_across_exports(index, tmp_path):
+    write_export(tmp_path / "p1.zip", {CAT_POSTURE: [(0, 60, "Sitting"), (60, 90, "Standing")],
+                                       CAT_HLB: [(0, 60, "Eating"), (0, 30, "Speaking")]})
+    write_export(tmp_path / "p2.zip", {CAT_POSTURE: [(0, 120, "Sitting")]})
+    assert index.ingest_directory(str(tmp_path)) == (2, 0, 0)
+
+    durations = {(row["category"], row["value"]): row for row in index.durations()}
+    assert durations[(CAT_POSTURE, "Sitting")]["seconds"] == 180
+    assert durations[(CAT_POSTURE, "Sitting")]["sessions"] == 2
+    assert durations[(CAT_HLB, "Speaking")]["segments"] == 1
+    assert [row["value"] for row in index.durations(CAT_POSTURE)] == ["Sitting", "Standing"]
+
+    coverage = {row["category"]: row for row in index.coverage()}
+    assert coverage[CAT_HLB]["covered_seconds"] == 60
+    assert coverage[CAT_POSTURE]["fraction"] == 1.0
+
+def test_reingest_replaces_rollups(index, tmp_path):
+    path = write_export(tmp_path / "p1.zip", {CAT_PA: [(0, 10, "Walking")]})
+    assert index.ingest_export(path)
+    assert not index.ingest_export(path)
+
+    write_export(tmp_path / "p1.zip", {CAT_PA: [(0, 30, "Running")]})
+    os.utime(path, ns=(0, 10 ** 18))
+    assert index.ingest_export(path)
+    assert [(row["value"], row["seconds"]) for row in index.durations(CAT_PA)] == [("Running", 30)]
+    assert index.source_count() == 1
+
+def test_ingest_sessions_mirrors_session_store(index, tmp_path):
+    store = SessionStore(str(tmp_path / "sessions.sqlite3"))
+    annotation = TimelineAnnotation(start_time=0, end_time=45)
+    annotation.set_labels(AnnotationLabels.from_values(posture="Lying"))
+    store.replace_session("fp", "/videos/a.mp4", 0, [annotation.freeze()])
+
+    assert index.ingest_sessions(store) == 1
+    assert index.ingest_sessions(store) == 0
+    assert index.sessions_with(CAT_POSTURE, "Lying") == [{"source": "session:fp", "seconds": 45, "segments": 1}]
+
+    store.delete_session("fp")
+    index.ingest_sessions(store)
+    assert index.durations() == []
+    store.close()
+
+def test_cli_reports_minutes(tmp_path, capsys):
+    write_export(tmp_path / "p1.zip", {CAT_PA: [(0, 120, "Walking")]})
+    db = str(tmp_path / "analytics.sqlite3")
+    assert main(["--db", db, "ingest", str(tmp_path)]) == 0
+    assert main(["--db", db, "durations", "--category", "pa_type"]) == 0
+    output = capsys.readouterr().out
+    assert "Walking" in output and "2.0" in output
+    assert main(["--db", db, "durations", "--category", "nonsense"]) == 2
+
+def test_resolve_category_aliases():
+    assert resolve_category("hlb") == CAT_HLB
+    assert resolve_category("PA TYPE") == CAT_PA
+    assert resolve_category(None) is None
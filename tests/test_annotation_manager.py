@@ -3,10 +3,11 @@ import json
 from unittest.mock import MagicMock, patch
 from src.annotation_manager import AnnotationManager
 from src.models import TimelineAnnotation
+from src.annotation_store import AnnotationStore
 
 class MockApp:
     def __init__(self):
-        self.annotations = []
+        self.annotations = AnnotationStore()
         self.current_annotation = None
         self.media_player = {'_position': 0}
         self.updateAnnotationTimeline = MagicMock()
@@ -50,17 +51,17 @@ def test_get_posture_color(manager):
     assert manager.get_posture_color("") == "#808080"
 
 def test_check_overlap(manager):
-    manager.app.annotations = [TimelineAnnotation(start_time=10, end_time=20)]
+    manager.app.annotations = AnnotationStore([TimelineAnnotation(start_time=10, end_time=20)])
     assert not manager.check_overlap(5, 10)
     assert manager.check_overlap(12, 18)
     existing_annotation = manager.app.annotations[0]
     assert not manager.check_overlap(12, 18, exclude_annotation=existing_annotation)
 
 def test_get_current_annotation_index(manager):
-    manager.app.annotations = [
+    manager.app.annotations = AnnotationStore([
         TimelineAnnotation(start_time=10, end_time=20),
         TimelineAnnotation(start_time=30, end_time=40)
-    ]
+    ])
     manager.app.media_player['_position'] = 15000
     assert manager.get_current_annotation_index() == 0
     manager.app.media_player['_position'] = 25000
@@ -94,7 +95,7 @@ def test_cancel_annotation(manager):
 
 @patch('src.annotation_manager.QMessageBox')
 def test_delete_current_label(mock_qmessagebox, manager):
-    manager.app.annotations = [TimelineAnnotation(start_time=10, end_time=20)]
+    manager.app.annotations = AnnotationStore([TimelineAnnotation(start_time=10, end_time=20)])
     manager.app.media_player['_position'] = 15000
     mock_qmessagebox.question.return_value = mock_qmessagebox.StandardButton.Yes
     manager.deleteCurrentLabel()
@@ -102,7 +103,7 @@ def test_delete_current_label(mock_qmessagebox, manager):
 
 @patch('src.annotation_manager.QMessageBox')
 def test_delete_current_label_no_selection(mock_qmessagebox, manager):
-    manager.app.annotations = [TimelineAnnotation(start_time=10, end_time=20)]
+    manager.app.annotations = AnnotationStore([TimelineAnnotation(start_time=10, end_time=20)])
     manager.app.media_player['_position'] = 25000
     manager.deleteCurrentLabel()
     assert len(manager.app.annotations) == 1
@@ -112,7 +113,9 @@ def test_delete_current_label_no_selection(mock_qmessagebox, manager):
 def test_split_current_label(mock_qmessagebox, manager):
     original_annotation = TimelineAnnotation(start_time=10, end_time=30)
     original_annotation.update_comment_body(posture="Sitting")
-    manager.app.annotations = [original_annotation]
+    manager.app.annotations = AnnotationStore([original_annotation])
+    listener = MagicMock()
+    manager.app.annotations.subscribe(listener)
     manager.app.media_player['_position'] = 20000
     manager.splitCurrentLabel()
     assert len(manager.app.annotations) == 2
@@ -121,7 +124,7 @@ def test_split_current_label(mock_qmessagebox, manager):
     assert part2.start_time == 20 and part2.end_time == 30
     assert get_comment_value(part1.comments, "POSTURE") == "Sitting"
     assert get_comment_value(part2.comments, "POSTURE") == "Sitting"
-    manager.app.updateAnnotationTimeline.assert_called_once()
+    assert [call.args[0] for call in listener.call_args_list] == ["moved", "inserted"]
     mock_qmessagebox.warning.assert_not_called()
 
 @patch('src.annotation_manager.QMessageBox')
@@ -129,53 +132,123 @@ def test_merge_with_previous(mock_qmessagebox, manager):
     prev_ann = TimelineAnnotation(start_time=10, end_time=20)
     curr_ann = TimelineAnnotation(start_time=20, end_time=30)
     curr_ann.update_comment_body(posture="MergedPosture")
-    manager.app.annotations = [prev_ann, curr_ann]
+    manager.app.annotations = AnnotationStore([prev_ann, curr_ann])
+    listener = MagicMock()
+    manager.app.annotations.subscribe(listener)
     manager.app.media_player['_position'] = 25000
     manager.mergeWithPrevious()
     assert len(manager.app.annotations) == 1
     merged = manager.app.annotations[0]
     assert merged.start_time == 10 and merged.end_time == 30
     assert get_comment_value(merged.comments, "POSTURE") == "MergedPosture"
-    manager.app.updateAnnotationTimeline.assert_called_once()
+    assert [call.args[0] for call in listener.call_args_list] == ["removed", "removed", "inserted"]
 
 @patch('src.annotation_manager.QMessageBox')
 def test_merge_with_next(mock_qmessagebox, manager):
     curr_ann = TimelineAnnotation(start_time=10, end_time=20)
     curr_ann.update_comment_body(posture="MergedPosture")
     next_ann = TimelineAnnotation(start_time=20, end_time=30)
-    manager.app.annotations = [curr_ann, next_ann]
+    manager.app.annotations = AnnotationStore([curr_ann, next_ann])
+    listener = MagicMock()
+    manager.app.annotations.subscribe(listener)
     manager.app.media_player['_position'] = 15000
     manager.mergeWithNext()
     assert len(manager.app.annotations) == 1
     merged = manager.app.annotations[0]
     assert merged.start_time == 10 and merged.end_time == 30
     assert get_comment_value(merged.comments, "POSTURE") == "MergedPosture"
-    manager.app.updateAnnotationTimeline.assert_called_once()
+    assert [call.args[0] for call in listener.call_args_list] == ["removed", "removed", "inserted"]
+
+@patch('src.annotation_manager.QMessageBox')
+def test_merge_keeps_comments_unbuilt(mock_qmessagebox, manager):
+    prev_ann = TimelineAnnotation(start_time=10, end_time=20)
+    curr_ann = TimelineAnnotation(start_time=20, end_time=30)
+    curr_ann.update_comment_body(posture="MergedPosture")
+    manager.app.annotations = AnnotationStore([prev_ann, curr_ann])
+    manager.app.media_player['_position'] = 25000
+    mock_qmessagebox.question.return_value = mock_qmessagebox.StandardButton.Yes
+    manager.mergeWithPrevious()
+    merged = manager.app.annotations[0]
+    assert merged.labels.posture == "MergedPosture"
+    assert merged._comments is None and prev_ann._comments is None and curr_ann._comments is None
 
 @patch('src.annotation_manager.QMessageBox')
 def test_merge_fails_if_not_adjacent(mock_qmessagebox, manager):
     prev_ann = TimelineAnnotation(start_time=10, end_time=20)
     curr_ann = TimelineAnnotation(start_time=21, end_time=30)
-    manager.app.annotations = [prev_ann, curr_ann]
+    manager.app.annotations = AnnotationStore([prev_ann, curr_ann])
+    listener = MagicMock()
+    manager.app.annotations.subscribe(listener)
     manager.app.media_player['_position'] = 25000
     manager.mergeWithPrevious()
     assert len(manager.app.annotations) == 2
+    listener.assert_not_called()
     mock_qmessagebox.warning.assert_called_once()
 
+@patch('src.annotation_manager.QMessageBox')
+def test_failed_merge_leaves_store_unchanged(mock_qmessagebox, manager):
+    curr_ann = TimelineAnnotation(start_time=10, end_time=20)
+    next_ann = TimelineAnnotation(start_time=20, end_time=30)
+    manager.app.annotations = AnnotationStore([curr_ann, next_ann])
+    manager.app.media_player['_position'] = 15000
+    original_add = AnnotationStore.add
+
+    def add_originals_only(store, annotation):
+        if annotation is not curr_ann and annotation is not next_ann:
+            raise ValueError("add failed")
+        return original_add(store, annotation)
+
+    with patch.object(AnnotationStore, 'add', add_originals_only):
+        manager.mergeWithNext()
+    assert list(manager.app.annotations) == [curr_ann, next_ann]
+    assert not manager.history.can_undo()
+
 def test_move_to_next_label(manager):
-    manager.app.annotations = [
+    manager.app.annotations = AnnotationStore([
         TimelineAnnotation(start_time=10, end_time=20),
         TimelineAnnotation(start_time=30, end_time=40)
-    ]
+    ])
     manager.app.media_player['_position'] = 15000
     manager.moveToNextLabel()
+    manager.app.setPosition.assert_called_with(20000)
+    manager.app.media_player['_position'] = 20000
+    manager.moveToNextLabel()
     manager.app.setPosition.assert_called_with(30000)
 
 def test_move_to_previous_label(manager):
-    manager.app.annotations = [
+    manager.app.annotations = AnnotationStore([
         TimelineAnnotation(start_time=10, end_time=20),
         TimelineAnnotation(start_time=30, end_time=40)
-    ]
+    ])
     manager.app.media_player['_position'] = 35000
     manager.moveToPreviousLabel()
-    manager.app.setPosition.assert_called_with(20000)
\ No newline at end of file
+    manager.app.setPosition.assert_called_with(30000)
+    manager.app.media_player['_position'] = 30000
+    manager.moveToPreviousLabel()
+    manager.app.setPosition.assert_called_with(20000)
+
+@patch('src.annotation_manager.QMessageBox')
+def test_undo_redo_split(mock_qmessagebox, manager):
+    original_annotation = TimelineAnnotation(start_time=10, end_time=30)
+    manager.app.annotations = AnnotationStore([original_annotation])
+    manager.app.media_player['_position'] = 20000
+    manager.splitCurrentLabel()
+    assert len(manager.app.annotations) == 2
+
+    manager.undo()
+    assert list(manager.app.annotations) == [original_annotation]
+    assert original_annotation.end_time == 30
+
+    manager.redo()
+    assert len(manager.app.annotations) == 2
+    assert original_annotation.end_time == 20
+
+@patch('src.annotation_manager.QMessageBox')
+def test_undo_delete(mock_qmessagebox, manager):
+    annotation = TimelineAnnotation(start_time=10, end_time=20)
+    manager.app.annotations = AnnotationStore([annotation])
+    manager.app.media_player['_position'] = 15000
+    mock_qmessagebox.question.return_value = mock_qmessagebox.StandardButton.Yes
+    manager.deleteCurrentLabel()
+    manager.undo()
+    assert manager.app.annotations[0] is annotation
@@ -0,0 +1,47 @@
+import pytest
+from src.annotation_model import AnnotationModel
+from src.annotation_store import AnnotationStore
+from src.models import TimelineAnnotation, AnnotationLabels
+
+@pytest.fixture
+def store():
+    return AnnotationStore([
+        TimelineAnnotation(start_time=10, end_time=20),
+        TimelineAnnotation(start_time=20, end_time=30),
+    ])
+
+def test_changes_in_one_turn_coalesce(qtbot, store):
+    model = AnnotationModel(store)
+    received = []
+    model.changed.connect(received.append)
+
+    first, second = store
+    store.remove(second)
+    store.update_bounds(first, end_time=30)
+    store.set_labels(first, AnnotationLabels.from_values(posture="Sitting"))
+    assert received == []
+
+    qtbot.waitUntil(lambda: len(received) == 1)
+    change = received[0]
+    assert change.kinds == {"removed", "moved", "relabeled"}
+    assert (change.start_ms, change.end_ms) == (10000, 30000)
+    assert not change.full
+
+def test_reset_marks_everything(qtbot, store):
+    model = AnnotationModel(store)
+    store.add(TimelineAnnotation(start_time=40, end_time=50))
+    store.reset([])
+    with qtbot.waitSignal(model.changed) as blocker:
+        pass
+    assert blocker.args[0].full
+
+def test_flush_emits_immediately(store):
+    model = AnnotationModel(store)
+    received = []
+    model.changed.connect(received.append)
+    store.add(TimelineAnnotation(start_time=40, end_time=50))
+    model.flush()
+    assert len(received) == 1
+    assert (received[0].start_ms, received[0].end_ms) == (40000, 50000)
+    model.flush()
+    assert len(received) == 1
@@ -0,0 +1,192 @@
+import pytest
+from src.annotation_store import AnnotationStore, to_ms
+from src.models import TimelineAnnotation
+
+@pytest.fixture
+def store():
+    return AnnotationStore([
+        TimelineAnnotation(start_time=30, end_time=40),
+        TimelineAnnotation(start_time=10, end_time=20),
+        TimelineAnnotation(start_time=20, end_time=25),
+    ])
+
+def test_to_ms():
+    assert to_ms(1.2345) == 1234 or to_ms(1.2345) == 1235
+    assert to_ms(10) == 10000
+
+def test_store_is_sorted(store):
+    assert [ann.start_time for ann in store] == [10, 20, 30]
+    assert len(store) == 3
+
+def test_add_keeps_order(store):
+    store.add(TimelineAnnotation(start_time=26, end_time=28))
+    store.add(TimelineAnnotation(start_time=0, end_time=5))
+    assert [ann.start_time for ann in store] == [0, 10, 20, 26, 30]
+
+def test_remove_by_identity(store):
+    target = store[1]
+    store.remove(target)
+    assert target not in store
+    assert [ann.start_time for ann in store] == [10, 30]
+    with pytest.raises(ValueError):
+        store.remove(target)
+
+def test_index_at(store):
+    assert store.index_at(15000) == 0
+    assert store.index_at(20000) == 0
+    assert store.index_at(22000) == 1
+    assert store.index_at(27000) == -1
+    assert store.index_at(5000) == -1
+    assert store.find_at(35000) is store[2]
+
+def test_overlaps(store):
+    assert not store.overlaps(0, 10000)
+    assert store.overlaps(12000, 18000)
+    assert not store.overlaps(25000, 30000)
+    assert store.overlaps(24000, 31000)
+    assert not store.overlaps(12000, 18000, exclude=store[0])
+
+def test_neighbours(store):
+    prev_ann, next_ann = store.neighbours(store[1])
+    assert prev_ann is store[0]
+    assert next_ann is store[2]
+    assert store.neighbours(store[0])[0] is None
+    assert store.neighbours(store[2])[1] is None
+
+def test_update_bounds_reorders(store):
+    first = store[0]
+    store.update_bounds(first, start_time=41, end_time=50)
+    assert store[-1] is first
+    assert store.index_at(45000) == 2
+
+def test_boundary_navigation(store):
+    assert store.next_boundary(15000, 50) == 20000
+    assert store.next_boundary(25000, 50) == 30000
+    assert store.next_boundary(40000, 50) is None
+    assert store.previous_boundary(35000, 50) == 30000
+    assert store.previous_boundary(28000, 50) == 25000
+    assert store.previous_boundary(10000, 50) is None
+
+def test_listeners_receive_changed_span(store):
+    events = []
+    store.subscribe(lambda kind, ann, start_ms, end_ms: events.append((kind, start_ms, end_ms)))
+    annotation = TimelineAnnotation(start_time=50, end_time=60)
+    store.add(annotation)
+    store.update_bounds(annotation, start_time=45, end_time=55)
+    store.remove(annotation)
+    store.clear()
+    assert events == [
+        ("inserted", 50000, 60000),
+        ("moved", 45000, 60000),
+        ("removed", 45000, 55000),
+        ("reset", None, None),
+    ]
+
+def test_extend_adds_in_order_with_one_notification(store):
+    from src.annotation_store import CHUNK_SIZE
+    events = []
+    store.subscribe(lambda kind, ann, start_ms, end_ms: events.append((kind, start_ms, end_ms)))
+    snapshot = store.snapshot()
+    store.extend([TimelineAnnotation(start_time=41 + i, end_time=41.5 + i) for i in range(CHUNK_SIZE * 2)])
+    store.extend([TimelineAnnotation(start_time=0, end_time=5)])
+    store.extend([])
+
+    assert events == [("extended", 41000, 41500 + (CHUNK_SIZE * 2 - 1) * 1000), ("extended", 0, 5000)]
+    assert len(snapshot) == 3
+    assert [ann.start_time for ann in store][:5] == [0, 10, 20, 30, 41]
+    assert [record.source for record in store.snapshot()] == list(store)
+    assert store.next_boundary(40000) == 41000
+    assert store.find_at(41200) is store[4]
+
+def test_snapshot_is_frozen(store):
+    from src.models import AnnotationLabels
+    snapshot = store.snapshot()
+    first = store[0]
+    store.update_bounds(first, end_time=19)
+    store.set_labels(first, AnnotationLabels.from_values(posture="Sitting"))
+    store.add(TimelineAnnotation(start_time=50, end_time=60))
+
+    assert len(snapshot) == 3
+    records = list(snapshot)
+    assert [record.start_time for record in records] == [10, 20, 30]
+    assert records[0].end_time == 20
+    assert records[0].labels.posture == ""
+    assert [record.end_time for record in store.snapshot()] == [19, 25, 40, 60]
+    assert store.snapshot().to_dicts()[0] == first.to_dict()
+
+def test_snapshot_tracks_store_across_chunks():
+    import random
+    from src.annotation_store import CHUNK_SIZE
+    rng = random.Random(7)
+    store = AnnotationStore([TimelineAnnotation(start_time=i, end_time=i + 0.5) for i in range(CHUNK_SIZE * 3)])
+    snapshots = []
+    for step in range(2000):
+        if store and rng.random() < 0.4:
+            store.remove(store[rng.randrange(len(store))])
+        else:
+            start = rng.randrange(100000) / 10
+            store.add(TimelineAnnotation(start_time=start, end_time=start + 0.05))
+        if step % 250 == 0:
+            snapshots.append((store.snapshot(), [ann.start_time for ann in store]))
+
+    assert [record.source for record in store.snapshot()] == list(store)
+    for snapshot, starts in snapshots:
+        assert sorted(record.start_time for record in snapshot) == sorted(starts)
+
+def test_snapshot_freezes_only_changed_chunks():
+    from src.annotation_store import CHUNK_SIZE
+    from src.models import AnnotationLabels
+    store = AnnotationStore([TimelineAnnotation(start_time=i, end_time=i + 0.5) for i in range(CHUNK_SIZE * 3)])
+    added = TimelineAnnotation(start_time=500, end_time=501)
+    store.add(added)
+    store.set_labels(store[0], AnnotationLabels.from_values(posture="Sitting"))
+    assert added._id is None and added._comment_id is None
+    before = list(store.snapshot()._chunks)
+    store.update_bounds(store[CHUNK_SIZE + 1], end_time=CHUNK_SIZE + 1.7)
+    after = list(store.snapshot()._chunks)
+    assert [old is new for old, new in zip(before, after)] == [True, False, True]
+    assert added._id is not None
+
+def test_generation_changes_on_every_mutation(store):
+    generation = store.snapshot().generation
+    store.add(TimelineAnnotation(start_time=50, end_time=60))
+    assert store.snapshot().generation == generation + 1
+    assert store.snapshot().generation == store.snapshot().generation
+
+def test_between_returns_overlapping_slice(store):
+    assert [ann.start_time for ann in store.between(15000, 22000)] == [10, 20]
+    assert [ann.start_time for ann in store.between(25500, 29000)] == []
+    assert [ann.start_time for ann in store.between(0, 100000)] == [10, 20, 30]
+    assert [ann.start_time for ann in store.between(40000, 50000)] == [30]
+
+def test_queries_handle_overlapping_annotations():
+    outer = TimelineAnnotation(start_time=0, end_time=100)
+    store = AnnotationStore([outer, TimelineAnnotation(start_time=10, end_time=20),
+                             TimelineAnnotation(start_time=30, end_time=40)])
+    assert store.index_at(50000) == 0
+    assert store.overlaps(50000, 50000)
+    assert not store.overlaps(50000, 50000, exclude=outer)
+    assert store.between(45000, 55000) == [outer]
+
+def test_queries_match_linear_scan_after_edits():
+    import random
+    rng = random.Random(3)
+    store = AnnotationStore()
+    for step in range(600):
+        if len(store) > 5 and rng.random() < 0.3:
+            store.remove(store[rng.randrange(len(store))])
+        elif len(store) > 5 and rng.random() < 0.3:
+            annotation = store[rng.randrange(len(store))]
+            store.update_bounds(annotation, end_time=annotation.start_time + rng.randrange(1, 300))
+        else:
+            start = rng.randrange(1000)
+            store.add(TimelineAnnotation(start_time=start, end_time=start + rng.randrange(1, 300)))
+        position = rng.randrange(1300) * 1000
+        spans = [(to_ms(ann.start_time), to_ms(ann.end_time)) for ann in store]
+        expected_index = next((i for i, (start, end) in enumerate(spans) if start - 1 <= position <= end + 1), -1)
+        assert store.index_at(position) == expected_index
+        assert store.between(position, position + 50000) == [
+            ann for ann, (start, end) in zip(store, spans) if start <= position + 50000 and end >= position]
+        assert store.overlaps(position, position + 50000) == any(
+            start < position + 50000 - 1 and position < end - 1 for start, end in spans)
+
@@ -0,0 +1,92 @@
+import pytest
+from src.annotation_store import AnnotationStore
+from src.annotation_window import AnnotationWindow, CoverageIndex
+from src.models import AnnotationLabels, TimelineAnnotation
+
+def make_annotation(start, end, posture=""):
+    annotation = TimelineAnnotation(start_time=start, end_time=end)
+    if posture:
+        annotation.set_labels(AnnotationLabels.from_values(posture=posture))
+    return annotation
+
+@pytest.fixture
+def store():
+    return AnnotationStore([make_annotation(i * 10, i * 10 + 5, "Sitting") for i in range(100)])
+
+class CountingStore:
+    def __init__(self, store):
+        self.store = store
+        self.calls = 0
+
+    @property
+    def generation(self):
+        return self.store.generation
+
+    def between(self, start_ms, end_ms):
+        self.calls += 1
+        return self.store.between(start_ms, end_ms)
+
+def test_window_pages_range_with_margin(store):
+    source = CountingStore(store)
+    window = AnnotationWindow(source, margin=0.5)
+    assert [ann.start_time for ann in window.view(100000, 120000)] == [90, 100, 110, 120, 130]
+    window.view(105000, 125000)
+    assert source.calls == 1
+    window.view(200000, 220000)
+    assert source.calls == 2
+
+def test_window_reloads_after_mutation(store):
+    window = AnnotationWindow(store)
+    assert len(window.view(0, 12000)) == 2
+    store.add(make_annotation(6, 8))
+    assert len(window.view(0, 12000)) == 3
+
+def test_coverage_buckets_and_runs():
+    store = AnnotationStore([make_annotation(0, 10, "Sitting"), make_annotation(10, 15, "Standing")])
+    coverage = CoverageIndex(store, max_buckets=4)
+    assert not coverage.ready
+    coverage.set_duration(40000)
+    assert coverage.bucket_ms == 10000
+    assert coverage.covered == [10000, 5000, 0, 0]
+    assert coverage.runs() == [(0, 10000, "Sitting", 1.0), (10000, 20000, "Standing", 0.5)]
+
+def test_coverage_follows_store_changes():
+    first = make_annotation(0, 10, "Sitting")
+    store = AnnotationStore([first])
+    coverage = CoverageIndex(store, max_buckets=4)
+    coverage.set_duration(40000)
+    store.update_bounds(first, end_time=25)
+    assert coverage.covered == [10000, 10000, 5000, 0]
+    store.add(make_annotation(30, 40, "Lying"))
+    store.remove(first)
+    assert coverage.covered == [0, 0, 0, 10000]
+    assert coverage.runs() == [(30000, 40000, "Lying", 1.0)]
+
+def test_coverage_columns_summarise_buckets_per_pixel():
+    store = AnnotationStore([make_annotation(0, 10, "Sitting"), make_annotation(10, 15, "Standing"),
+                             make_annotation(15, 20, "Standing")])
+    coverage = CoverageIndex(store, max_buckets=8)
+    assert coverage.columns(4) == ([], [], [])
+    coverage.set_duration(40000)
+    postures, fractions, boundaries = coverage.columns(2)
+    # Ties go to the posture that sorts first
+    assert postures == ["Sitting", ""]
+    assert fractions == [1.0, 0.0]
+    assert boundaries == [5, 1]
+    assert coverage.columns(4) == (["Sitting", "Standing", "", ""], [1.0, 1.0, 0.0, 0.0], [1, 4, 1, 0])
+    assert coverage.columns(4) is coverage.columns(4)
+
+    store.add(make_annotation(30, 40, "Lying"))
+    postures, fractions, _ = coverage.columns(4)
+    assert postures[3] == "Lying" and fractions[3] == 1.0
+
+def test_coverage_extend_rebuilds_only_appended_buckets():
+    store = AnnotationStore([make_annotation(0, 10, "Sitting")])
+    coverage = CoverageIndex(store, max_buckets=4)
+    coverage.set_duration(40000)
+    rebuilt = []
+    rebuild = coverage._rebuild
+    coverage._rebuild = lambda first, last: (rebuilt.append((first, last)), rebuild(first, last))
+    store.extend([make_annotation(20, 25, "Lying"), make_annotation(25, 28, "Lying")])
+    assert rebuilt == [(2, 2)]
+    assert coverage.covered == [10000, 0, 8000, 0]
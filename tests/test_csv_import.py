@@ -0,0 +1,75 @@
+import csv
+import io
+from zipfile import ZipFile
+import pytest
+from src.csv_import import import_category_csvs, read_category_events, sweep_segments
+from src.vocabulary import CAT_BP, CAT_HLB, CAT_POSTURE, EXPORT_CSV_HEADER, EXPORT_FILES
+
+def export_csv(category, rows):
+    _, labelset = EXPORT_FILES[category]
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(EXPORT_CSV_HEADER)
+    writer.writerows([start, end, value, 'human', labelset, start, end] for start, end, value in rows)
+    return output.getvalue()
+
+def write_folder(path, rows_by_category):
+    path.mkdir(exist_ok=True)
+    for category, rows in rows_by_category.items():
+        (path / EXPORT_FILES[category][0]).write_text(export_csv(category, rows))
+    return str(path)
+
+def spans(annotations):
+    return [(a.start_time, a.end_time) for a in annotations]
+
+def test_segments_split_at_every_boundary(tmp_path):
+    source = write_folder(tmp_path / "export", {
+        CAT_POSTURE: [(0, 10, "Sitting"), (10, 20, "Standing")],
+        CAT_HLB: [(5, 15, "Eating")],
+    })
+    annotations = import_category_csvs(source)
+    assert spans(annotations) == [(0, 5), (5, 10), (10, 15), (15, 20)]
+    assert [a.labels.posture for a in annotations] == ["Sitting", "Sitting", "Standing", "Standing"]
+    assert [a.labels.hlb for a in annotations] == [[], ["Eating"], ["Eating"], []]
+
+def test_multi_value_categories_keep_every_active_value(tmp_path):
+    source = write_folder(tmp_path / "export", {
+        CAT_HLB: [(0, 10, "Eating"), (0, 10, "Speaking")],
+        CAT_BP: [(0, 4, "Carrying load")],
+    })
+    first, second = import_category_csvs(source)
+    assert sorted(first.labels.hlb) == ["Eating", "Speaking"]
+    assert first.labels.behavioral_params == ["Carrying load"]
+    assert second.labels.behavioral_params == [] and (second.start_time, second.end_time) == (4, 10)
+
+def test_overlapping_single_value_rows_prefer_latest_start():
+    events = [(0, 1, 0, 1), (10, 0, 0, 1), (4, 1, 0, 2), (6, 0, 0, 2)]
+    segments = sweep_segments(events)
+    assert spans(segments) == [(0, 4), (4, 6), (6, 10)]
+    assert [s.labels.posture_id for s in segments] == [1, 2, 1]
+
+def test_gaps_produce_no_annotations(tmp_path):
+    source = write_folder(tmp_path / "export", {CAT_POSTURE: [(0, 1, "Sitting"), (5, 6, "Lying")]})
+    assert spans(import_category_csvs(source)) == [(0, 1), (5, 6)]
+
+def test_reads_export_zip(tmp_path):
+    path = tmp_path / "export.zip"
+    with ZipFile(path, 'w') as archive:
+        archive.writestr('labels.json', '{}')
+        archive.writestr('p1/' + EXPORT_FILES[CAT_POSTURE][0], export_csv(CAT_POSTURE, [(1.5, 3, "Sitting")]))
+    annotations = import_category_csvs(str(path))
+    assert spans(annotations) == [(1.5, 3)] and annotations[0].labels.posture == "Sitting"
+
+def test_malformed_rows_are_skipped(tmp_path):
+    folder = tmp_path / "export"
+    folder.mkdir()
+    (folder / EXPORT_FILES[CAT_POSTURE][0]).write_text(
+        "START_TIME,STOP_TIME,PREDICTION\n0,2,Sitting\nbad,3,Sitting\n4\n5,5,Lying\n")
+    assert spans(import_category_csvs(str(folder))) == [(0, 2)]
+
+def test_missing_csvs_raise(tmp_path):
+    with pytest.raises(ValueError):
+        read_category_events(str(tmp_path))
+    (tmp_path / EXPORT_FILES[CAT_POSTURE][0]).write_text("BEGIN,END\n")
+    with pytest.raises(ValueError):
+        read_category_events(str(tmp_path))
@@ -0,0 +1,92 @@
+import csv
+import io
+import json
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+import pytest
+from src.export import EXPORTERS, Exporter, decode_annotations, register_exporter, write_export
+from src.models import AnnotationLabels, TimelineAnnotation, annotations_from_document, annotations_to_document
+from src.vocabulary import CAT_HLB, CAT_POSTURE, EXPORT_CSV_HEADER
+
+def make_records(count=3):
+    records = []
+    for i in range(count):
+        annotation = TimelineAnnotation(start_time=i, end_time=i + 0.5)
+        if i % 2 == 0:
+            annotation.set_labels(AnnotationLabels.from_values(posture="Sitting", hlb=["Eating", "Speaking"]))
+        records.append(annotation.freeze())
+    return records
+
+@pytest.mark.parametrize("schema", [1, 2])
+@pytest.mark.parametrize("count", [0, 3])
+def test_streamed_labels_json_matches_json_dumps(tmp_path, schema, count):
+    records = make_records(count)
+    path = str(tmp_path / "export.zip")
+    write_export(path, records, 99, schema, exporters=["labels.json"])
+    with ZipFile(path) as archive:
+        assert archive.namelist() == ["labels.json"]
+        text = archive.read("labels.json").decode('utf-8')
+    assert text == json.dumps(annotations_to_document(records, 99, schema), indent=4)
+
+def test_decode_annotations_resolves_label_ids():
+    first, second, _ = decode_annotations(make_records())
+    assert first.values[CAT_HLB] == ("Eating", "Speaking") and first.values[CAT_POSTURE] == ("Sitting",)
+    assert second.values[CAT_POSTURE] == () and second.start_time == 1
+
+class SpanCounter(Exporter):
+    member = "spans.txt"
+
+    def begin(self, stream, context):
+        super().begin(stream, context)
+        stream.write(f"{context.count} annotations, hash {context.video_hash}\n")
+
+    def write(self, annotation):
+        self.stream.write(f"{annotation.start_time}-{annotation.end_time}\n")
+
+def test_registered_exporters_share_one_pass(tmp_path, monkeypatch):
+    monkeypatch.setattr("src.export.EXPORTERS", dict(EXPORTERS))
+    register_exporter("spans", SpanCounter)
+    with pytest.raises(ValueError):
+        register_exporter("spans", SpanCounter)
+    path = str(tmp_path / "export.zip")
+    write_export(path, make_records(2), 4, exporters=["spans", "posture.csv"])
+    with ZipFile(path) as archive:
+        assert archive.namelist() == ["spans.txt", "posture.csv"]
+        assert archive.read("spans.txt") == b"2 annotations, hash 4\n0-0.5\n1-1.5\n"
+
+def test_exporter_without_write_fails_before_writing(tmp_path, monkeypatch):
+    class Incomplete(Exporter):
+        member = "incomplete.txt"
+
+    monkeypatch.setattr("src.export.EXPORTERS", dict(EXPORTERS))
+    register_exporter("incomplete", Incomplete)
+    with pytest.raises(TypeError):
+        write_export(str(tmp_path / "export.zip"), make_records(), exporters=["incomplete"])
+    assert list(tmp_path.iterdir()) == []
+
+@pytest.mark.parametrize("level, compression", [(0, ZIP_STORED), (9, ZIP_DEFLATED)])
+def test_write_export_streams_members(tmp_path, level, compression):
+    path = str(tmp_path / "export.zip")
+    progress = []
+    assert write_export(path, make_records(), 5, compression_level=level, progress=progress.append)
+    assert progress[-1] == 100
+    with ZipFile(path) as archive:
+        # Only categories with at least one value get a CSV
+        assert archive.namelist() == ['labels.json', 'posture.csv', 'high_level_behavior.csv']
+        assert {info.compress_type for info in archive.infolist()} == {compression}
+        annotations, video_hash = annotations_from_document(json.loads(archive.read('labels.json')))
+        rows = list(csv.reader(io.TextIOWrapper(archive.open('posture.csv'), encoding='utf-8', newline='')))
+    assert video_hash == 5 and len(annotations) == 3
+    assert rows[0] == EXPORT_CSV_HEADER
+    assert [(row[0], row[2]) for row in rows[1:]] == [("0", "Sitting"), ("2", "Sitting")]
+
+def test_cancelled_export_leaves_existing_file(tmp_path):
+    path = tmp_path / "export.zip"
+    path.write_bytes(b"previous")
+    assert not write_export(str(path), make_records(), is_cancelled=lambda: True)
+    assert path.read_bytes() == b"previous"
+    assert [p.name for p in tmp_path.iterdir()] == ["export.zip"]
+
+def test_failed_export_removes_temp_file(tmp_path):
+    with pytest.raises(ValueError):
+        write_export(str(tmp_path / "export.zip"), make_records(), schema=7)
+    assert list(tmp_path.iterdir()) == []
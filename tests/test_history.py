@@ -0,0 +1,114 @@
+import pytest
+from unittest.mock import MagicMock
+from src.annotation_store import AnnotationStore
+from src.history import (Command, UndoHistory, InsertCommand, RemoveCommand, BoundsCommand,
+                         RelabelCommand, CompoundCommand)
+from src.models import TimelineAnnotation, AnnotationLabels
+
+@pytest.fixture
+def store():
+    return AnnotationStore([
+        TimelineAnnotation(start_time=10, end_time=20),
+        TimelineAnnotation(start_time=20, end_time=30),
+    ])
+
+def test_insert_undo_redo(store):
+    history = UndoHistory()
+    annotation = TimelineAnnotation(start_time=40, end_time=50)
+    store.add(annotation)
+    history.push(InsertCommand(annotation))
+
+    assert history.undo(store).description == "Create label"
+    assert annotation not in store
+    assert history.redo(store) is not None
+    assert annotation in store
+    assert history.redo(store) is None
+
+def test_remove_and_bounds(store):
+    history = UndoHistory()
+    first, second = store
+    store.remove(first)
+    history.push(RemoveCommand(first))
+    store.update_bounds(second, start_time=15)
+    history.push(BoundsCommand(second, (20, 30), (15, 30)))
+
+    history.undo(store)
+    assert second.start_time == 20
+    history.undo(store)
+    assert list(store) == [first, second]
+    assert not history.can_undo()
+
+def test_relabel(store):
+    history = UndoHistory()
+    annotation = store[0]
+    old_labels = annotation.labels
+    new_labels = AnnotationLabels.from_values(posture="Sitting")
+    annotation.set_labels(new_labels)
+    history.push(RelabelCommand(annotation, old_labels, new_labels))
+
+    history.undo(store)
+    assert annotation.labels == old_labels
+    history.redo(store)
+    assert annotation.labels.posture == "Sitting"
+
+def test_compound_reverts_in_reverse_order(store):
+    history = UndoHistory()
+    first, second = store
+    merged = TimelineAnnotation(start_time=10, end_time=30)
+    store.remove(second)
+    store.remove(first)
+    store.add(merged)
+    history.push(CompoundCommand([RemoveCommand(second), RemoveCommand(first), InsertCommand(merged)], "Merge labels"))
+
+    history.undo(store)
+    assert list(store) == [first, second]
+    history.redo(store)
+    assert list(store) == [merged]
+
+def test_failed_compound_leaves_store_unchanged(store):
+    history = UndoHistory()
+    first, second = store
+    merged = TimelineAnnotation(start_time=10, end_time=30)
+    missing = TimelineAnnotation(start_time=40, end_time=50)
+    listener = MagicMock()
+    store.subscribe(listener)
+    command = CompoundCommand([RemoveCommand(second), RemoveCommand(missing), InsertCommand(merged)], "Merge labels")
+
+    with pytest.raises(ValueError):
+        history.apply(command, store)
+    assert list(store) == [first, second]
+    assert [record.source for record in store.snapshot()] == [first, second]
+    assert [call.args[0] for call in listener.call_args_list] == ["removed", "inserted"]
+    assert not history.can_undo()
+
+def test_push_clears_redo(store):
+    history = UndoHistory()
+    annotation = TimelineAnnotation(start_time=40, end_time=50)
+    store.add(annotation)
+    history.push(InsertCommand(annotation))
+    history.undo(store)
+    assert history.can_redo()
+    history.push(RemoveCommand(store[0]))
+    assert not history.can_redo()
+
+def test_max_entries_evicts_oldest(store):
+    history = UndoHistory(max_entries=3)
+    annotations = [TimelineAnnotation(start_time=40 + i, end_time=40.5 + i) for i in range(5)]
+    for annotation in annotations:
+        store.add(annotation)
+        history.push(InsertCommand(annotation))
+
+    assert len(history) == 3
+    while history.undo(store):
+        pass
+    assert annotations[0] in store and annotations[1] in store
+    assert annotations[2] not in store
+
+def test_command_without_revert_cannot_be_created():
+    class ApplyOnly(Command):
+        def apply(self, store):
+            pass
+
+    with pytest.raises(TypeError):
+        ApplyOnly()
+
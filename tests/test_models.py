@@ -3,7 +3,7 @@
 import pytest
 import json
 from datetime import datetime
-from src.models import TimelineAnnotation
+from src.models import TimelineAnnotation, AnnotationLabels
 
 def test_timeline_annotation_initialization():
     annotation = TimelineAnnotation()
@@ -89,3 +89,112 @@ def test_update_comment_body_with_defaults():
     assert any(item["category"] == "Behavioral Parameters" and item["selectedValue"] == [] for item in comment_data)
     assert any(item["category"] == "Experimental situation" and item["selectedValue"] == "" for item in comment_data)
     assert any(item["category"] == "Special Notes" and item["selectedValue"] == "" for item in comment_data)
+
+def test_labels_parsed_from_body():
+    annotation = TimelineAnnotation()
+    annotation.update_comment_body(posture="Standing", hlb=["Walking"], special_notes="Note")
+    labels = annotation.labels
+    assert isinstance(labels, AnnotationLabels)
+    assert labels.posture == "Standing"
+    assert labels.hlb == ["Walking"]
+    assert labels.special_notes == "Note"
+    assert annotation.labels is labels
+
+def test_labels_reparsed_when_body_replaced():
+    annotation = TimelineAnnotation()
+    annotation.update_comment_body(posture="Standing")
+    annotation.comments = [{"id": "c1", "meta": {}, "body": json.dumps([{"category": "POSTURE", "selectedValue": "Sitting"}])}]
+    annotation.invalidate_labels()
+    assert annotation.labels.posture == "Sitting"
+    assert annotation.labels.hlb == []
+
+def test_labels_round_trip_to_body():
+    labels = AnnotationLabels.from_values(posture="Standing", hlb=["Walking", "Talking"], pa_type="Moderate")
+    assert AnnotationLabels.from_body(labels.to_body()) == labels
+    assert json.loads(labels.to_body())[1] == {"category": "HIGH LEVEL BEHAVIOR", "selectedValue": ["Walking", "Talking"]}
+
+def test_labels_from_malformed_body():
+    assert AnnotationLabels.from_body("not json") == AnnotationLabels()
+
+def test_timeline_annotation_is_slotted():
+    annotation = TimelineAnnotation()
+    assert not hasattr(annotation, "__dict__")
+    with pytest.raises(AttributeError):
+        annotation.unknown_attribute = 1
+
+def test_to_dict_does_not_materialize_comments():
+    annotation = TimelineAnnotation(start_time=1, end_time=2)
+    annotation.update_comment_body(posture="Standing")
+    first = annotation.to_dict()
+    second = annotation.to_dict()
+    assert annotation._comments is None
+    assert first["comments"][0]["id"] == second["comments"][0]["id"]
+    assert json.loads(first["comments"][0]["body"])[0]["selectedValue"] == "Standing"
+    assert first["shape"] == {"x1": None, "x2": None, "y1": None, "y2": None}
+
+def test_from_dict_round_trip():
+    source = TimelineAnnotation(start_time=5, end_time=9)
+    source.update_comment_body(posture="Sitting", hlb=["Resting"])
+    record = json.loads(json.dumps(source.to_dict()))
+    loaded = TimelineAnnotation.from_dict(record)
+    assert loaded.id == source.id
+    assert loaded.start_time == 5 and loaded.end_time == 9
+    assert loaded.labels == source.labels
+    assert loaded.to_dict() == record
+
+def test_from_dict_keeps_unrecognised_comments_verbatim():
+    record = {
+        "id": "a1",
+        "range": {"start": 0, "end": 1},
+        "shape": {},
+        "comments": [{"id": "c1", "meta": {"user_id": "u"}, "body": '[{"category": "POSTURE", "selectedValue": "Sitting", "extra": 1}]'}]
+    }
+    loaded = TimelineAnnotation.from_dict(record)
+    assert loaded.labels.posture == "Sitting"
+    assert loaded.to_dict() == record
+
+def test_labels_compare_by_id():
+    first = AnnotationLabels.from_values(posture="Standing", hlb=["Walking", "Talking"])
+    second = AnnotationLabels.from_values(posture="Standing", hlb=["Talking", "Walking"])
+    assert first.posture_id == second.posture_id
+    assert first.primary_key() == second.primary_key()
+    assert first != second
+
+def test_freeze_matches_to_dict():
+    annotation = TimelineAnnotation(start_time=1, end_time=2)
+    assert annotation.freeze().to_dict() == annotation.to_dict()
+    annotation.update_comment_body(posture="Sitting", hlb=["Walking"])
+    record = annotation.freeze()
+    assert record.to_dict() == annotation.to_dict()
+    assert record.source is annotation
+
+    annotation.comments
+    record = annotation.freeze()
+    annotation.update_comment_body(posture="Standing")
+    assert record.labels.posture == "Sitting"
+    assert json.loads(record.to_dict()["comments"][0]["body"])[0]["selectedValue"] == "Sitting"
+
+def test_v2_round_trip_matches_v1():
+    from src.models import AnnotationLabels, annotations_from_document, annotations_to_document
+    labelled = TimelineAnnotation(start_time=1, end_time=2)
+    labelled.set_labels(AnnotationLabels.from_values(posture="Sitting", hlb=["Eating"], special_notes="note"))
+    unlabelled = TimelineAnnotation(start_time=3, end_time=4)
+    custom = TimelineAnnotation(start_time=5, end_time=6)
+    custom.comments = [{"id": "c", "meta": {"user_id": "u1"}, "body": "free text"}]
+    records = [ann.freeze() for ann in (labelled, unlabelled, custom)]
+
+    document = annotations_to_document(records, video_hash=9)
+    assert document["schema"] == 2
+    assert document["annotations"][0]["labels"] == {"posture": "Sitting", "hlb": ["Eating"], "special_notes": "note"}
+    assert document["annotations"][1]["labels"] is None
+    assert "comments" in document["annotations"][2]
+
+    loaded, video_hash = annotations_from_document(json.loads(json.dumps(document)))
+    assert video_hash == 9
+    assert [ann.to_dict() for ann in loaded] == [record.to_dict() for record in records]
+    assert annotations_to_document(records, 9, schema=1)["annotations"] == [record.to_dict() for record in records]
+
+def test_unknown_schema_is_rejected():
+    from src.models import annotations_from_document
+    with pytest.raises(ValueError):
+        annotations_from_document({"schema": 3, "annotations": []})
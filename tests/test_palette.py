@@ -0,0 +1,19 @@
+import re
+from src.palette import NEUTRAL_COLOR, build_posture_palette, fallback_color, get_posture_palette, posture_color
+
+def test_palette_is_deterministic_and_distinct():
+    postures = ["A", "B", "C", "D"]
+    palette = build_posture_palette(postures)
+    assert palette == build_posture_palette(postures)
+    assert len(set(palette.values())) == len(postures)
+    assert all(re.fullmatch(r"#[0-9a-f]{6}", color) for color in palette.values())
+
+def test_categories_postures_use_the_palette():
+    palette = get_posture_palette()
+    assert "In_Position_Sitting" in palette
+    assert posture_color("In_Position_Sitting") == palette["In_Position_Sitting"]
+    assert len(set(palette.values())) == len(palette)
+
+def test_unknown_and_empty_postures():
+    assert posture_color("Not_In_Csv") == fallback_color("Not_In_Csv") == fallback_color("Not_In_Csv")
+    assert posture_color("") == posture_color(None) == NEUTRAL_COLOR
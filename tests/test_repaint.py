@@ -0,0 +1,35 @@
+from unittest.mock import MagicMock
+from PyQt6.QtCore import QRect
+from src.repaint import RepaintScheduler
+
+def test_requests_are_merged_into_one_update_per_frame(qtbot):
+    scheduler = RepaintScheduler()
+    widget = MagicMock()
+    scheduler.request(widget, QRect(10, 0, 5, 20))
+    scheduler.request(widget, QRect(40, 0, 5, 20))
+    scheduler.request(widget, QRect())
+    assert scheduler.pending
+    widget.update.assert_not_called()
+    qtbot.waitUntil(lambda: not scheduler.pending, timeout=1000)
+    widget.update.assert_called_once_with(QRect(10, 0, 35, 20))
+
+def test_full_request_wins_over_rectangles():
+    scheduler = RepaintScheduler()
+    widget = MagicMock()
+    scheduler.request(widget, QRect(10, 0, 5, 20))
+    scheduler.request(widget)
+    scheduler.request(widget, QRect(40, 0, 5, 20))
+    scheduler.flush()
+    widget.update.assert_called_once_with()
+    assert not scheduler.pending
+
+def test_frame_callbacks_run_until_settled():
+    scheduler = RepaintScheduler()
+    steps = [True, True, False]
+    scheduler.add_frame_callback(lambda: steps.pop(0))
+    scheduler.request_frame()
+    scheduler.flush()
+    assert scheduler.pending
+    scheduler.flush()
+    scheduler.flush()
+    assert not scheduler.pending and steps == []
@@ -0,0 +1,84 @@
+import sqlite3
+import threading
+import pytest
+from src.models import AnnotationLabels, TimelineAnnotation
+from src.session_store import SessionStore, calculate_video_fingerprint
+
+def make_record(start, end, posture="Sitting", hlb=("Eating",)):
+    annotation = TimelineAnnotation(start_time=start, end_time=end)
+    annotation.set_labels(AnnotationLabels.from_values(posture=posture, hlb=hlb))
+    return annotation.freeze()
+
+@pytest.fixture
+def store(tmp_path):
+    store = SessionStore(str(tmp_path / "sessions.sqlite3"))
+    yield store
+    store.close()
+
+def test_replace_and_load_session(store):
+    first, second = make_record(10, 20), make_record(0, 5)
+    store.replace_session("fp", "/videos/a.mp4", 42, [first, second], journal_seq=3)
+
+    data = store.load_session("fp")
+    assert data["videohash"] == 42
+    assert data["journal_seq"] == 3
+    assert [ann["id"] for ann in data["annotations"]] == [second.id, first.id]
+    assert TimelineAnnotation.from_dict(data["annotations"][0]).labels == second.labels
+    assert store.load_session("missing") is None
+
+def test_apply_changes_upserts_rows(store):
+    first, second = make_record(0, 5), make_record(10, 20)
+    store.replace_session("fp", "/videos/a.mp4", 0, [first])
+    moved = TimelineAnnotation.from_dict(first.to_dict())
+    moved.end_time = 8
+    store.apply_changes("fp", "/videos/a.mp4", 0, [("put", moved.freeze()), ("put", second)], journal_seq=5)
+    store.apply_changes("fp", "/videos/a.mp4", 0, [("del", second.id), ("del", "unknown")], journal_seq=6)
+
+    data = store.load_session("fp")
+    assert [ann["range"]["end"] for ann in data["annotations"]] == [8]
+    assert data["journal_seq"] == 6
+    assert store.recent_sessions()[0]["annotation_count"] == 1
+
+def test_labels_are_indexed_and_cascade(store):
+    record = make_record(0, 5, posture="Standing", hlb=("Eating", "Walking"))
+    store.replace_session("fp", "/videos/a.mp4", 0, [record])
+    rows = sqlite3.connect(store.path).execute(
+        "SELECT value FROM labels WHERE category = 'HIGH LEVEL BEHAVIOR' ORDER BY value").fetchall()
+    assert rows == [("Eating",), ("Walking",)]
+
+    store.delete_session("fp")
+    assert store.load_session("fp") is None
+    assert sqlite3.connect(store.path).execute("SELECT COUNT(*) FROM labels").fetchone() == (0,)
+
+def test_recent_sessions_newest_first(store):
+    store.replace_session("old", "/videos/old.mp4", 0, [make_record(0, 1)])
+    store.replace_session("empty", "/videos/empty.mp4", 0, [])
+    store.replace_session("new", "/videos/new.mp4", 0, [make_record(0, 1)])
+    assert [session["video_path"] for session in store.recent_sessions()] == ["/videos/new.mp4", "/videos/old.mp4"]
+
+def test_annotations_between_pages_by_start_index(store):
+    long_one, short_one, later = make_record(0, 50), make_record(60, 61), make_record(100, 110)
+    store.replace_session("fp", "/videos/a.mp4", 0, [later, short_one, long_one])
+    max_length = store.max_annotation_length("fp")
+    assert max_length == 50
+    assert [ann["id"] for ann in store.annotations_between("fp", 40, 60, max_length)] == [long_one.id, short_one.id]
+    assert store.annotations_between("fp", 51, 59, max_length) == []
+    assert store.max_annotation_length("missing") == 0
+
+def test_close_closes_connections_of_other_threads(store):
+    connections = []
+    worker = threading.Thread(target=lambda: connections.append(store._connection()))
+    worker.start()
+    worker.join()
+    store.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        connections[0].execute("SELECT 1")
+    assert store.load_session("fp") is None
+
+def test_fingerprint_ignores_path(tmp_path):
+    content = b"x" * (3 * 1024 * 1024)
+    (tmp_path / "a.mp4").write_bytes(content)
+    (tmp_path / "b.mp4").write_bytes(content)
+    (tmp_path / "c.mp4").write_bytes(content[:-1] + b"y")
+    assert calculate_video_fingerprint(str(tmp_path / "a.mp4")) == calculate_video_fingerprint(str(tmp_path / "b.mp4"))
+    assert calculate_video_fingerprint(str(tmp_path / "a.mp4")) != calculate_video_fingerprint(str(tmp_path / "c.mp4"))
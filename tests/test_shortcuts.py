@@ -21,6 +21,8 @@ class MockApp(QMainWindow):
         self.mergeWithNext = MagicMock()
         self.splitCurrentLabel = MagicMock()
         self.editAnnotation = MagicMock()
+        self.undo = MagicMock()
+        self.redo = MagicMock()
         self.setPlaybackRate = MagicMock()
         self.changePlaybackRate = MagicMock()
         self.adjustPreviewOffset = MagicMock()
@@ -105,6 +107,14 @@ def test_split_and_edit_shortcuts(manager, mock_app, qtbot):
     qtbot.keyClick(mock_app, 'g')
     mock_app.editAnnotation.assert_called_once()
 
+def test_undo_redo_shortcuts(manager, mock_app, qtbot):
+    qtbot.keyClick(mock_app, 'z', Qt.KeyboardModifier.ControlModifier)
+    mock_app.undo.assert_called_once()
+    mock_app.cancelAnnotation.assert_not_called()
+
+    qtbot.keyClick(mock_app, 'z', Qt.KeyboardModifier.ControlModifier | Qt.KeyboardModifier.ShiftModifier)
+    mock_app.redo.assert_called_once()
+
 def test_preview_offset_shortcuts(manager, mock_app, qtbot):
     qtbot.keyClick(mock_app, Qt.Key.Key_Up, Qt.KeyboardModifier.ShiftModifier)
     mock_app.adjustPreviewOffset.assert_called_once_with(2000)
@@ -2,7 +2,7 @@ import os
 import json
 import pytest
 from unittest.mock import MagicMock
-from src.utils import AutosaveManager, autosave
+from src.utils import AutosaveManager, AutosaveScheduler, autosave
 
 class MockAnnotation:
     def __init__(self, start, end, comments=None, id="mock_id"):
@@ -12,6 +12,17 @@ class MockAnnotation:
         self.shape = {}
         self.comments = comments if comments is not None else []
 
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "range": {"start": self.start_time, "end": self.end_time},
+            "shape": self.shape,
+            "comments": self.comments
+        }
+
+    # Free-form comment lists are written unchanged in schema v2 as well
+    to_v2_dict = to_dict
+
 @pytest.fixture
 def manager(tmp_path, monkeypatch):
     instance = AutosaveManager()
@@ -103,4 +114,252 @@ def test_autosave_decorator():
     instance = DummyClass(mock_app)
     
     instance.mock_method()
-    mock_app.autosave.assert_called_once()
\ No newline at end of file
+    mock_app.autosave.assert_called_once()
+def test_schedule_save_coalesces_bursts(manager, video_file, monkeypatch):
+    writes = []
+    original_write = manager._write_job
+    monkeypatch.setattr(manager.writer, '_write', lambda path, job: (writes.append(job), original_write(path, job)))
+    manager.writer.delay = 0.05
+
+    for count in range(1, 6):
+        manager.schedule_save(video_file, [MockAnnotation(0, i) for i in range(1, count + 1)], video_hash=1)
+    assert manager.flush(timeout=5)
+
+    assert len(writes) == 1
+    data, hash_matches = manager.check_for_autosave(video_file, 1)
+    assert hash_matches
+    assert len(data['annotations']) == 5
+    manager.shutdown()
+
+def test_save_is_atomic(manager, video_file):
+    manager.save_annotations(video_file, [MockAnnotation(0, 10)])
+    class Unserializable:
+        def to_v2_dict(self):
+            return {"range": object()}
+    manager.save_annotations(video_file, [Unserializable()])
+
+    data, _ = manager.check_for_autosave(video_file, 0)
+    assert len(data['annotations']) == 1
+    assert not [name for name in os.listdir(manager.autosave_dir) if name.endswith(".tmp")]
+
+def test_delete_cancels_pending_save(manager, video_file):
+    manager.writer.delay = 10
+    manager.schedule_save(video_file, [MockAnnotation(0, 10)])
+    manager.delete_autosave(video_file)
+    assert manager.flush(timeout=5)
+    assert manager.check_for_autosave(video_file, 0) == (None, False)
+    manager.shutdown()
+
+class MockSnapshot(list):
+    def __init__(self, annotations, generation):
+        super().__init__(annotations)
+        self.generation = generation
+
+def test_unchanged_generation_is_not_saved_again(manager, video_file):
+    manager.writer.delay = 0
+    manager.schedule_save(video_file, MockSnapshot([MockAnnotation(0, 10)], generation=3))
+    manager.schedule_save(video_file, MockSnapshot([MockAnnotation(0, 10)], generation=3))
+    assert manager.flush(timeout=5)
+    manager.schedule_save(video_file, MockSnapshot([MockAnnotation(0, 10)], generation=3))
+    assert manager.flush(timeout=5)
+
+    metrics = manager.metrics()
+    assert metrics["saves_written"] == 1
+    assert metrics["saves_skipped"] == 2
+    manager.shutdown()
+
+def test_scheduler_follows_edit_bursts():
+    scheduler = AutosaveScheduler(min_delay=1.0, max_delay=60.0)
+    assert scheduler.delay() == 1.0
+    for i in range(10):
+        scheduler.record_edit(i * 2.0)
+    assert scheduler.delay() == pytest.approx(3.0)
+
+    scheduler.record_edit(100.0)
+    scheduler.record_edit(200.0)
+    assert scheduler.delay() == 1.0
+
+def test_scheduler_respects_save_cost_and_loss_window():
+    scheduler = AutosaveScheduler(min_delay=1.0, max_delay=10.0, max_duty=0.05)
+    scheduler.record_save(0.2)
+    assert scheduler.delay() == pytest.approx(4.0)
+    scheduler.record_save(2.0)
+    scheduler.record_save(2.0)
+    assert scheduler.delay() == 10.0
+
+    scheduler.adaptive = False
+    assert scheduler.delay() == 1.0
+
+def test_journal_replay_restores_session(tmp_path, monkeypatch, video_file):
+    from src.annotation_store import AnnotationStore
+    from src.models import TimelineAnnotation
+    manager = AutosaveManager(journal=True)
+    monkeypatch.setattr(manager, 'autosave_dir', str(tmp_path))
+    store = AnnotationStore()
+    store.subscribe(lambda kind, ann, start_ms, end_ms: manager.record_change(video_file, kind, ann))
+
+    first = TimelineAnnotation(start_time=0, end_time=10)
+    second = TimelineAnnotation(start_time=10, end_time=20)
+    store.reset([first])
+    manager.schedule_save(video_file, store.snapshot(), video_hash=7)
+    store.add(second)
+    store.update_bounds(second, end_time=25)
+    store.update_bounds(second, end_time=30)
+    manager.schedule_save(video_file, store.snapshot(), video_hash=7)
+    store.remove(first)
+    manager.schedule_save(video_file, store.snapshot(), video_hash=7)
+    assert manager.flush(timeout=5)
+
+    assert manager.compactions == 1
+    assert manager.journal_entries_written == 2
+    data, hash_matches = manager.check_for_autosave(video_file, 7)
+    assert hash_matches
+    assert [ann["id"] for ann in data["annotations"]] == [second.id]
+    assert data["annotations"][0]["range"]["end"] == 30
+    manager.shutdown()
+
+def test_journal_compaction_drops_folded_entries(tmp_path, monkeypatch, video_file):
+    from src.annotation_store import AnnotationStore
+    from src.models import TimelineAnnotation
+    import src.utils
+    monkeypatch.setattr(src.utils, 'JOURNAL_COMPACT_EVERY', 3)
+    manager = AutosaveManager(journal=True)
+    monkeypatch.setattr(manager, 'autosave_dir', str(tmp_path))
+    store = AnnotationStore()
+    store.subscribe(lambda kind, ann, start_ms, end_ms: manager.record_change(video_file, kind, ann))
+
+    store.reset()
+    for i in range(7):
+        store.add(TimelineAnnotation(start_time=i, end_time=i + 0.5))
+        manager.schedule_save(video_file, store.snapshot())
+        assert manager.flush(timeout=5)
+
+    with open(os.path.join(str(tmp_path), "test_video_autosave.journal")) as f:
+        assert len([line for line in f if '"put"' in line]) < 3
+    data, _ = manager.check_for_autosave(video_file, 0)
+    assert len(data["annotations"]) == 7
+    manager.shutdown()
+
+def test_replay_skips_torn_line():
+    from src.utils import replay_journal
+    lines = [
+        json.dumps({"seq": 1, "op": "put", "annotation": {"id": "a", "range": {"start": 0, "end": 1}}}),
+        json.dumps({"seq": 2, "op": "put", "annotation": {"id": "b", "range": {"start": 1, "end": 2}}}),
+        '{"seq": 3, "op": "del", "i',
+    ]
+    data = replay_journal({"annotations": [], "journal_seq": 1}, lines)
+    assert [ann["id"] for ann in data["annotations"]] == ["b"]
+
+def test_session_database_restores_moved_video(tmp_path, monkeypatch, video_file):
+    from src.annotation_store import AnnotationStore
+    from src.models import TimelineAnnotation
+    manager = AutosaveManager(session_db=str(tmp_path / "sessions.sqlite3"))
+    monkeypatch.setattr(manager, 'autosave_dir', str(tmp_path))
+    store = AnnotationStore()
+    store.subscribe(lambda kind, ann, start_ms, end_ms: manager.record_change(video_file, kind, ann))
+
+    first = TimelineAnnotation(start_time=0, end_time=10)
+    second = TimelineAnnotation(start_time=10, end_time=20)
+    store.reset([first])
+    manager.schedule_save(video_file, store.snapshot(), video_hash=7)
+    store.add(second)
+    store.update_bounds(second, end_time=30)
+    manager.schedule_save(video_file, store.snapshot(), video_hash=7)
+    store.remove(first)
+    manager.schedule_save(video_file, store.snapshot(), video_hash=7)
+    assert manager.flush(timeout=5)
+    assert not os.path.exists(manager._autosave_path(video_file))
+    manager.shutdown()
+
+    moved = str(tmp_path / "renamed.mp4")
+    os.rename(video_file, moved)
+    reopened = AutosaveManager(session_db=str(tmp_path / "sessions.sqlite3"))
+    data, hash_matches = reopened.check_for_autosave(moved, 7)
+    assert hash_matches
+    assert data["video_path"] == moved
+    assert [(ann["id"], ann["range"]["end"]) for ann in data["annotations"]] == [(second.id, 30)]
+    assert reopened.recent_sessions()[0]["annotation_count"] == 1
+
+    reopened.delete_autosave(moved)
+    assert reopened.check_for_autosave(moved, 7) == (None, False)
+    reopened.shutdown()
+
+def test_session_pages_match_store_once_saved(tmp_path, monkeypatch, video_file):
+    from src.annotation_store import AnnotationStore
+    from src.models import TimelineAnnotation
+    manager = AutosaveManager(session_db=str(tmp_path / "sessions.sqlite3"))
+    monkeypatch.setattr(manager, 'autosave_dir', str(tmp_path))
+    store = AnnotationStore()
+    store.subscribe(lambda kind, ann, start_ms, end_ms: manager.record_change(video_file, kind, ann))
+    pages = manager.session_pages(video_file)
+    assert pages.generation is None
+
+    first = TimelineAnnotation(start_time=0, end_time=10)
+    store.reset([first, TimelineAnnotation(start_time=20, end_time=30)])
+    manager.schedule_save(video_file, store.snapshot())
+    assert manager.flush(timeout=5)
+    assert pages.generation == store.generation
+    assert [ann.id for ann in pages.between(0, 15000)] == [first.id]
+
+    store.update_bounds(first, end_time=15)
+    assert pages.generation != store.generation
+    manager.schedule_save(video_file, store.snapshot())
+    assert manager.flush(timeout=5)
+    assert pages.generation == store.generation
+    assert [ann.end_time for ann in pages.between(12000, 12000)] == [15]
+
+    manager.delete_autosave(video_file)
+    assert pages.generation is None
+    assert AutosaveManager(journal=True).session_pages(video_file) is None
+    manager.shutdown()
+
+def test_session_database_takes_precedence_over_journal(tmp_path):
+    manager = AutosaveManager(journal=True, session_db=str(tmp_path / "sessions.sqlite3"))
+    assert not manager.journal
+    assert manager.metrics()["backend"] == "sqlite"
+    manager.shutdown()
+    fallback = AutosaveManager(journal=True, session_db=str(tmp_path))
+    assert fallback.metrics()["backend"] == "journal"
+    fallback.shutdown()
+
+def _sample_labels_json():
+    from src.models import AnnotationLabels, TimelineAnnotation
+    labelled = TimelineAnnotation(start_time=1.25, end_time=7.5)
+    labelled.set_labels(AnnotationLabels.from_values(posture="Sitting", hlb=["Eating", "Speaking"], special_notes="ünïcode"))
+    unlabelled = TimelineAnnotation(start_time=8, end_time=9)
+    custom = TimelineAnnotation(start_time=10, end_time=12)
+    custom.comments = [{"id": "c", "meta": {"user_id": "u1"}, "body": "free text"}]
+    custom.shape = {"x1": 1, "x2": 2, "y1": None, "y2": None}
+    return {"annotations": [ann.to_dict() for ann in (labelled, unlabelled, custom)], "videohash": 2 ** 70}
+
+@pytest.mark.parametrize("compression", [0, 1, 2])
+def test_compact_round_trip_is_loss_free(tmp_path, compression):
+    from src.utils import convert_compact_to_json, convert_json_to_compact
+    source = tmp_path / "labels.json"
+    source.write_text(json.dumps(_sample_labels_json()))
+    assert convert_json_to_compact(str(source), str(tmp_path / "labels.paaws"), compression) == 3
+    assert convert_compact_to_json(str(tmp_path / "labels.paaws"), str(tmp_path / "back.json"), schema=1) == 3
+    assert json.loads((tmp_path / "back.json").read_text()) == json.loads(source.read_text())
+
+def test_compact_rejects_other_files():
+    from src.utils import decode_compact, encode_compact
+    with pytest.raises(ValueError):
+        decode_compact(b'{"annotations": []}')
+    with pytest.raises(ValueError):
+        decode_compact(encode_compact([], 0)[:-4])
+
+@pytest.mark.parametrize("chunk_size", [1, 16, 1 << 18])
+def test_iter_label_document_streams_records(chunk_size):
+    import io
+    from src.utils import iter_label_document
+    document = {"schema": 2, "videohash": 2 ** 70,
+                "annotations": [{"id": str(i), "range": {"start": i * 1.5, "end": i * 1.5 + 1}} for i in range(50)]}
+    items = list(iter_label_document(io.StringIO(json.dumps(document, indent=4)), chunk_size))
+    assert [item[2] for item in items if item[0] == "annotation"] == document["annotations"]
+    assert [item[1:] for item in items if item[0] == "field"] == [("schema", 2), ("videohash", 2 ** 70)]
+
+def test_iter_label_document_rejects_truncated_file():
+    import io
+    from src.utils import iter_label_document
+    with pytest.raises(ValueError):
+        list(iter_label_document(io.StringIO('{"annotations": [{"id": "a"}, {"id"')))
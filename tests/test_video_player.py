@@ -1,9 +1,14 @@
 import pytest
+import json
+from functools import partial
 from unittest.mock import MagicMock
 
-from PyQt6.QtCore import QUrl
+from PyQt6.QtCore import QUrl, QObject, pyqtSignal
+from PyQt6.QtTest import QTest
 from PyQt6.QtWidgets import QWidget
 from src.video_player import VideoPlayerApp
+from src.models import TimelineAnnotation, SCHEMA_V1, SCHEMA_V2, SCHEMA_VERSION, annotations_to_document
+from src.workers import AnnotationLoader
 
 @pytest.fixture
 def app(qtbot, monkeypatch):
@@ -118,4 +123,144 @@ def test_delegation_to_annotation_manager(app):
     app.annotation_manager.deleteCurrentLabel.assert_called_once()
     
     app.mergeWithNext()
-    app.annotation_manager.mergeWithNext.assert_called_once()
\ No newline at end of file
+    app.annotation_manager.mergeWithNext.assert_called_once()
+
+class FakeLoader(QObject):
+    """AnnotationLoader stand-in whose signals the test emits on the GUI thread"""
+    progress = pyqtSignal(int)
+    videoHashRead = pyqtSignal(object)
+    batchReady = pyqtSignal(list)
+    loaded = pyqtSignal(int)
+    failed = pyqtSignal(str)
+    finished = pyqtSignal()
+
+    def __init__(self, path, parent=None, csv_import=False):
+        super().__init__(parent)
+        self.cancelled = False
+
+    def start(self):
+        pass
+
+    def cancel(self):
+        self.cancelled = True
+
+    def wait(self):
+        return True
+
+def _write_labels(tmp_path, video_hash, count=3, schema=SCHEMA_VERSION):
+    annotations = [TimelineAnnotation(start_time=i, end_time=i + 0.5) for i in range(count)]
+    path = tmp_path / "labels.json"
+    path.write_text(json.dumps(annotations_to_document([ann.freeze() for ann in annotations], video_hash, schema)))
+    return str(path)
+
+def test_load_annotation_file_runs_in_background(app, qtbot, tmp_path, monkeypatch):
+    monkeypatch.setattr("src.video_player.AnnotationLoader", partial(AnnotationLoader, batch_size=2))
+    app.current_video_path = "/fake/video.mp4"
+    app.video_hash = 42
+    app.loadAnnotationFile(_write_labels(tmp_path, 42, count=5))
+    qtbot.waitUntil(lambda: app._annotation_loader is None, timeout=5000)
+    assert [ann.start_time for ann in app.annotations] == [0, 1, 2, 3, 4]
+    # Batches go in bulk: the journal only sees resets and one full save follows the load
+    assert {call.args[1] for call in app.autosave_manager.record_change.call_args_list} == {"reset", "extended"}
+    app.autosave_manager.schedule_save.assert_called_once()
+
+@pytest.mark.parametrize("schema", [SCHEMA_V1, SCHEMA_V2])
+@pytest.mark.parametrize("accept", [True, False])
+def test_hash_prompt_defers_load_completion(app, qtbot, tmp_path, monkeypatch, schema, accept):
+    from PyQt6.QtWidgets import QMessageBox
+    monkeypatch.setattr("src.video_player.AnnotationLoader", partial(AnnotationLoader, batch_size=2))
+
+    def question(*args):
+        # Like the real modal prompt, let the loader finish and deliver its signals meanwhile
+        loader = app._annotation_loader
+        qtbot.waitUntil(loader.isFinished, timeout=5000)
+        QTest.qWait(50)
+        return QMessageBox.StandardButton.Yes if accept else QMessageBox.StandardButton.No
+
+    monkeypatch.setattr("src.video_player.QMessageBox.question", question)
+    existing = TimelineAnnotation(start_time=10, end_time=20)
+    app.annotations.reset([existing])
+    app.current_video_path = "/fake/video.mp4"
+    app.video_hash = 1
+    app.loadAnnotationFile(_write_labels(tmp_path, 2, count=5, schema=schema))
+    qtbot.waitUntil(lambda: app._annotation_loader is None, timeout=5000)
+    if accept:
+        assert [ann.start_time for ann in app.annotations] == [0, 1, 2, 3, 4]
+        app.autosave_manager.schedule_save.assert_called_once()
+    else:
+        assert list(app.annotations) == [existing]
+        app.autosave_manager.schedule_save.assert_not_called()
+
+def test_cancelled_load_restores_annotations(app, monkeypatch):
+    monkeypatch.setattr("src.video_player.AnnotationLoader", FakeLoader)
+    existing = TimelineAnnotation(start_time=10, end_time=20)
+    app.annotations.reset([existing])
+    app.loadAnnotationFile("labels.json")
+    loader = app._annotation_loader
+    loader.videoHashRead.emit(0)
+    loader.batchReady.emit([TimelineAnnotation(start_time=0, end_time=1)])
+    assert len(app.annotations) == 1 and app.annotations[0] is not existing
+
+    app._load_state["progress"].canceled.emit()
+    assert loader.cancelled
+    loader.finished.emit()
+    assert list(app.annotations) == [existing]
+    assert app._annotation_loader is None
+
+def test_failure_after_partial_publish_restores_annotations(app, monkeypatch):
+    monkeypatch.setattr("src.video_player.AnnotationLoader", FakeLoader)
+    critical = MagicMock()
+    monkeypatch.setattr("src.video_player.QMessageBox.critical", critical)
+    existing = TimelineAnnotation(start_time=10, end_time=20)
+    app.annotations.reset([existing])
+    app.current_video_path = "/fake/video.mp4"
+    app.loadAnnotationFile("labels.json")
+    loader = app._annotation_loader
+    loader.videoHashRead.emit(app.video_hash)
+    loader.batchReady.emit([TimelineAnnotation(start_time=0, end_time=1)])
+    loader.batchReady.emit([TimelineAnnotation(start_time=2, end_time=3)])
+    assert [ann.start_time for ann in app.annotations] == [0, 2]
+
+    loader.failed.emit("truncated file")
+    loader.finished.emit()
+    assert list(app.annotations) == [existing]
+    critical.assert_called_once()
+    app.autosave_manager.schedule_save.assert_not_called()
+
+def test_csv_import_skips_hash_prompt(app, qtbot, tmp_path, monkeypatch):
+    monkeypatch.setattr("src.video_player.QMessageBox.question", lambda *args: pytest.fail("unexpected prompt"))
+    (tmp_path / "posture.csv").write_text("START_TIME,STOP_TIME,PREDICTION\n0,1,Sitting\n")
+    app.current_video_path = "/fake/video.mp4"
+    app.video_hash = 1
+    app.loadAnnotationFile(str(tmp_path), csv_import=True)
+    qtbot.waitUntil(lambda: app._annotation_loader is None, timeout=5000)
+    assert [ann.labels.posture for ann in app.annotations] == ["Sitting"]
+
+def test_save_annotations_exports_in_background(app, qtbot, tmp_path, monkeypatch):
+    from zipfile import ZipFile
+    path = str(tmp_path / "export.zip")
+    app.annotations.reset([TimelineAnnotation(start_time=0, end_time=1)])
+    app.video_hash = 3
+    monkeypatch.setattr("src.video_player.QFileDialog.getSaveFileName", lambda *args: (path, ""))
+    information = MagicMock()
+    monkeypatch.setattr("src.video_player.QMessageBox.information", information)
+    app.saveAnnotations()
+    qtbot.waitUntil(lambda: app._annotation_exporter is None, timeout=5000)
+    information.assert_called_once()
+    with ZipFile(path) as archive:
+        assert 'labels.json' in archive.namelist()
+
+def test_position_change_repaints_playhead_strip_and_scrolls_zoom_per_frame(app):
+    app.media_player['_duration'] = 100000
+    app.zoom_start, app.zoom_end = 0.0, 0.2
+    app.timeline_widget.resize(1000, 60)
+    requests = []
+    app.repaint_scheduler.request = lambda widget, rect=None: requests.append((widget, rect))
+    app.qmlPositionChanged(50000)
+    rect = dict(requests)[app.timeline_widget]
+    assert rect.left() <= 500 <= rect.right() and rect.width() < 1000
+    # The zoom window only moves on frame ticks, one smoothing step each
+    assert app.zoom_start == 0.0
+    assert app._advanceZoomScroll()
+    assert app.zoom_start == pytest.approx(0.34 * app.ZOOM_SMOOTHING)
+    assert app.zoom_end - app.zoom_start == pytest.approx(0.2)
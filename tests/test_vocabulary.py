@@ -0,0 +1,37 @@
+import pytest
+from src.vocabulary import LabelVocabulary, get_vocabulary, CAT_POSTURE, CAT_HLB, EMPTY_ID
+
+@pytest.fixture
+def categories_csv(tmp_path):
+    path = tmp_path / "categories.csv"
+    path.write_text(
+        "POSTURE,HIGH LEVEL BEHAVIOR,PA TYPE,Behavioral Parameters,Experimental situation\n"
+        "Standing,Walking,Approach,Fast,Baseline\n"
+        "Sitting,Speaking,,,\n"
+    )
+    return str(path)
+
+def test_ids_follow_csv_order(categories_csv):
+    vocabulary = LabelVocabulary.from_csv(categories_csv)
+    assert vocabulary.intern(CAT_POSTURE, "") == EMPTY_ID
+    assert vocabulary.values(CAT_POSTURE) == ["", "Posture_Unlabeled", "Standing", "Sitting"]
+    assert vocabulary.intern(CAT_POSTURE, "Sitting") == 3
+    assert vocabulary.values(CAT_HLB) == ["", "HLB_Unlabeled", "Walking", "Speaking"]
+
+def test_unknown_values_are_interned(categories_csv):
+    vocabulary = LabelVocabulary.from_csv(categories_csv)
+    new_id = vocabulary.intern(CAT_POSTURE, "Handstand")
+    assert new_id == 4
+    assert vocabulary.intern(CAT_POSTURE, "Handstand") == new_id
+    assert vocabulary.decode(CAT_POSTURE, new_id) == "Handstand"
+
+def test_decode_many(categories_csv):
+    vocabulary = LabelVocabulary.from_csv(categories_csv)
+    ids = vocabulary.intern_many(CAT_HLB, ["Speaking", "Walking"])
+    assert ids == (3, 2)
+    assert vocabulary.decode_many(CAT_HLB, ids) == ["Speaking", "Walking"]
+
+def test_shared_vocabulary_is_seeded_from_repo_categories():
+    vocabulary = get_vocabulary()
+    assert vocabulary is get_vocabulary()
+    assert "In_Position_Sitting" in vocabulary.values(CAT_POSTURE)
@@ -5,6 +5,7 @@ from unittest.mock import MagicMock
 from PyQt6.QtCore import Qt, QPoint
 from PyQt6.QtWidgets import QWidget
 from src.widgets import TimelineWidget
+from src.annotation_store import AnnotationStore
 
 class MockAnnotation:
     def __init__(self, start, end, comments=None):
@@ -12,13 +13,16 @@ class MockAnnotation:
         self.end_time = end
         self.comments = comments if comments is not None else []
 
+    def freeze(self):
+        return MagicMock(start_time=self.start_time, end_time=self.end_time, source=self)
+
 class MockApp(QWidget):
     def __init__(self):
         super().__init__()
         self.media_player = {'_duration': 600000, '_position': 0}
         self.zoom_start = 0.0
         self.zoom_end = 1.0
-        self.annotations = []
+        self.annotations = AnnotationStore()
         self.current_annotation = None
         self.annotation_manager = MagicMock()
         self.annotation_manager.get_posture_color.return_value = "#ff0000"
@@ -51,14 +55,16 @@ def test_paint_event_runs_without_error(main_timeline, mock_app):
     posture_comment_data = [{"category": "POSTURE", "selectedValue": "Standing"}]
     comment_body_string = json.dumps(posture_comment_data)
     full_comment_structure = [{"body": comment_body_string}]
-    mock_app.annotations = [MockAnnotation(10, 20, comments=full_comment_structure)]
+    mock_app.annotations = AnnotationStore([MockAnnotation(10, 20, comments=full_comment_structure)])
     mock_app.media_player['_position'] = 15000
     main_timeline.update() 
 
 def test_drag_annotation_start_edge(qtbot, zoomed_timeline, mock_app):
     duration_sec = mock_app.media_player['_duration'] / 1000
     annotation = MockAnnotation(start=100, end=200)
-    mock_app.annotations = [annotation]
+    mock_app.annotations = AnnotationStore([annotation])
+    listener = MagicMock()
+    mock_app.annotations.subscribe(listener)
     mock_app.zoom_start = 0.0
     mock_app.zoom_end = 0.5
     start_x = int(800 * (100 / (duration_sec * 0.5)))
@@ -67,8 +73,10 @@ def test_drag_annotation_start_edge(qtbot, zoomed_timeline, mock_app):
     qtbot.mouseMove(zoomed_timeline, pos=QPoint(drag_to_x, 30))
     qtbot.mouseRelease(zoomed_timeline, Qt.MouseButton.LeftButton, pos=QPoint(drag_to_x, 30))
     assert annotation.start_time == pytest.approx(77.5, abs=1)
-    mock_app.timeline_widget.update.assert_called()
-    mock_app.second_timeline_widget.update.assert_called()
+    # The timelines repaint from the store notification, over the span the edge swept
+    kind, moved, start_ms, end_ms = listener.call_args.args
+    assert kind == "moved" and moved is annotation
+    assert start_ms == round(annotation.start_time * 1000) and end_ms == 200000
 
 def test_drag_zoom_handle(qtbot, main_timeline, mock_app):
     assert mock_app.zoom_end == 1.0
@@ -78,3 +86,95 @@ def test_drag_zoom_handle(qtbot, main_timeline, mock_app):
     qtbot.mouseMove(main_timeline, pos=QPoint(drag_to_x, 30))
     qtbot.mouseRelease(main_timeline, Qt.MouseButton.LeftButton, pos=QPoint(drag_to_x, 30))
     assert mock_app.zoom_end == pytest.approx(0.5)
+
+def test_invalidate_span_repaints_only_changed_region(main_timeline, mock_app):
+    from src.annotation_model import ChangeSet
+    main_timeline.update = MagicMock()
+    change = ChangeSet()
+    change.add("moved", 60000, 120000)
+    main_timeline.invalidate_span(change)
+    rect = main_timeline.update.call_args.args[0]
+    assert rect.left() == 76 and rect.right() <= 165
+
+    change.add("reset", None, None)
+    main_timeline.invalidate_span(change)
+    main_timeline.update.assert_called_with()
+
+def test_main_timeline_paints_coverage(main_timeline, mock_app):
+    from src.annotation_window import CoverageIndex
+    from src.models import AnnotationLabels, TimelineAnnotation
+    annotation = TimelineAnnotation(start_time=10, end_time=300)
+    annotation.set_labels(AnnotationLabels.from_values(posture="Standing"))
+    mock_app.annotations = AnnotationStore([annotation])
+    mock_app.annotation_coverage = CoverageIndex(mock_app.annotations)
+    mock_app.annotation_coverage.set_duration(mock_app.media_player['_duration'])
+    main_timeline.grab()
+    mock_app.annotation_manager.get_posture_color.assert_called_with("Standing")
+
+def test_annotation_layer_is_reused_until_model_or_size_changes(zoomed_timeline, mock_app):
+    from src.models import TimelineAnnotation
+    mock_app.annotations = AnnotationStore([TimelineAnnotation(start_time=10, end_time=20)])
+    paint = MagicMock(wraps=zoomed_timeline._paint_annotations)
+    zoomed_timeline._paint_annotations = paint
+    zoomed_timeline.grab()
+    mock_app.media_player['_position'] = 15000
+    zoomed_timeline.grab()
+    assert paint.call_count == 1
+
+    mock_app.annotations.add(TimelineAnnotation(start_time=30, end_time=40))
+    zoomed_timeline.grab()
+    mock_app.zoom_end = 0.5
+    zoomed_timeline.grab()
+    zoomed_timeline.resize(400, 60)
+    zoomed_timeline.grab()
+    assert paint.call_count == 4
+
+def test_hover_hit_testing_only_checks_annotations_under_cursor(zoomed_timeline, mock_app):
+    from src.models import TimelineAnnotation
+    mock_app.annotations = AnnotationStore([TimelineAnnotation(start_time=i, end_time=i + 0.5) for i in range(600)])
+    mock_app.zoom_end = 0.1
+    coords = MagicMock(wraps=zoomed_timeline._get_annotation_screen_coords)
+    zoomed_timeline._get_annotation_screen_coords = coords
+    # 60 s across 800 px: the start edge of the annotation at 30 s is at x=400
+    from PyQt6.QtCore import QPointF
+    from PyQt6.QtGui import QMouseEvent
+    zoomed_timeline.mouseMoveEvent(QMouseEvent(QMouseEvent.Type.MouseMove, QPointF(402, 30), QPointF(402, 30),
+                                               Qt.MouseButton.NoButton, Qt.MouseButton.NoButton, Qt.KeyboardModifier.NoModifier))
+    assert zoomed_timeline.hover_edge == ('start', mock_app.annotations[30])
+    assert coords.call_count <= 2
+
+def test_paint_resources_are_reused_across_repaints(zoomed_timeline, mock_app):
+    from src.models import AnnotationLabels, TimelineAnnotation
+    annotation = TimelineAnnotation(start_time=10, end_time=200)
+    annotation.set_labels(AnnotationLabels.from_values(posture="Standing", hlb=["Eating"]))
+    mock_app.annotations = AnnotationStore([annotation])
+    zoomed_timeline.grab()
+    resources = zoomed_timeline._resources
+    brushes, texts = dict(resources._brushes), dict(resources._texts)
+    zoomed_timeline.invalidate_layer()
+    zoomed_timeline.grab()
+    assert zoomed_timeline._resources is resources
+    assert resources._brushes == brushes and resources._texts == texts
+    assert [text for text, _ in texts] == ["Standing - Eating"]
+    mock_app.annotation_manager.get_posture_color.assert_called_once_with("Standing")
+
+def test_painting_and_hovering_keep_comments_unbuilt(zoomed_timeline, mock_app):
+    from src.models import AnnotationLabels, TimelineAnnotation
+    annotations = [TimelineAnnotation(start_time=10, end_time=20), TimelineAnnotation(start_time=20, end_time=30)]
+    annotations[0].set_labels(AnnotationLabels.from_values(posture="Standing"))
+    mock_app.annotations = AnnotationStore(annotations)
+    zoomed_timeline.grab()
+    assert zoomed_timeline._format_annotation_for_tooltip(annotations[0]) == "Posture: Standing"
+    assert zoomed_timeline._format_annotation_for_tooltip(annotations[1]) == "No Labels Set"
+    assert all(annotation._comments is None for annotation in annotations)
+
+def test_visible_annotations_page_from_session_while_saved(zoomed_timeline, mock_app):
+    saved = MockAnnotation(0, 10)
+    mock_app.annotations = AnnotationStore([MockAnnotation(0, 10)])
+    mock_app.annotation_pages = MagicMock(generation=mock_app.annotations.generation)
+    mock_app.annotation_pages.between.return_value = [saved]
+    assert zoomed_timeline._visible_annotations(0, 60) == [saved]
+    mock_app.annotation_pages.between.assert_called_once_with(-30000, 90000)
+
+    mock_app.annotations.add(MockAnnotation(20, 30))
+    assert [ann.start_time for ann in zoomed_timeline._visible_annotations(0, 60)] == [0, 20]
@@ -0,0 +1,91 @@
+import json
+import pytest
+from src.models import AnnotationLabels, TimelineAnnotation, annotations_to_document
+from src.utils import write_compact
+from src.workers import AnnotationLoader
+
+def make_records(count):
+    records = []
+    for i in range(count):
+        annotation = TimelineAnnotation(start_time=i, end_time=i + 0.5)
+        annotation.set_labels(AnnotationLabels.from_values(posture="Sitting"))
+        records.append(annotation.freeze())
+    return records
+
+def run_loader(qtbot, loader):
+    events = []
+    loader.videoHashRead.connect(lambda video_hash: events.append(("hash", video_hash)))
+    loader.batchReady.connect(lambda batch: events.append(("batch", len(batch))))
+    loader.loaded.connect(lambda count: events.append(("loaded", count)))
+    loader.failed.connect(lambda message: events.append(("failed", message)))
+    with qtbot.waitSignal(loader.finished, timeout=5000):
+        loader.start()
+    qtbot.wait(10)
+    return events
+
+@pytest.mark.parametrize("schema", [1, 2])
+def test_loader_emits_batches_and_hash(qtbot, tmp_path, schema):
+    path = tmp_path / "labels.json"
+    path.write_text(json.dumps(annotations_to_document(make_records(25), 77, schema), indent=4))
+    events = run_loader(qtbot, AnnotationLoader(str(path), batch_size=10))
+    assert [event for event in events if event[0] == "batch"] == [("batch", 10), ("batch", 10), ("batch", 5)]
+    assert ("hash", 77) in events and events[-1] == ("loaded", 25)
+    # v2 stores the hash first, so it is known before any annotation arrives
+    assert (events.index(("hash", 77)) == 0) == (schema == 2)
+
+def test_loader_reads_compact_files(qtbot, tmp_path):
+    path = tmp_path / "labels.paaws"
+    write_compact(str(path), make_records(3), 5)
+    assert run_loader(qtbot, AnnotationLoader(str(path))) == [("hash", 5), ("batch", 3), ("loaded", 3)]
+
+def test_loader_reports_malformed_file(qtbot, tmp_path):
+    path = tmp_path / "labels.json"
+    path.write_text('{"annotations": [{"id": "a", "range": {"start": 0, "end": 1}},')
+    events = run_loader(qtbot, AnnotationLoader(str(path)))
+    assert events[-1][0] == "failed"
+
+def test_cancelled_loader_emits_nothing_more(qtbot, tmp_path):
+    path = tmp_path / "labels.json"
+    path.write_text(json.dumps(annotations_to_document(make_records(5), 0)))
+    loader = AnnotationLoader(str(path))
+    loader.cancel()
+    assert run_loader(qtbot, loader) == []
+
+def test_loader_streams_labels_from_export_zip(qtbot, tmp_path):
+    from zipfile import ZIP_DEFLATED, ZipFile
+    path = tmp_path / "export.zip"
+    with ZipFile(path, 'w', ZIP_DEFLATED) as archive:
+        archive.writestr('posture.csv', 'START_TIME,STOP_TIME\n')
+        archive.writestr('labels.json', json.dumps(annotations_to_document(make_records(4), 123)))
+    events = run_loader(qtbot, AnnotationLoader(str(path)))
+    assert events == [("hash", 123), ("batch", 4), ("loaded", 4)]
+    assert not (tmp_path / "labels.json").exists()
+
+def test_loader_finds_labels_in_nested_folder_and_reports_missing(qtbot, tmp_path):
+    from zipfile import ZipFile
+    nested = tmp_path / "nested.zip"
+    with ZipFile(nested, 'w') as archive:
+        archive.writestr('P01/labels.json', json.dumps(annotations_to_document(make_records(2), 0)))
+    assert run_loader(qtbot, AnnotationLoader(str(nested)))[-1] == ("loaded", 2)
+
+    empty = tmp_path / "empty.zip"
+    with ZipFile(empty, 'w') as archive:
+        archive.writestr('posture.csv', '')
+    assert run_loader(qtbot, AnnotationLoader(str(empty)))[-1] == ("failed", "No labels.json in empty.zip")
+
+def test_loader_imports_category_csvs(qtbot, tmp_path):
+    (tmp_path / "posture.csv").write_text("START_TIME,STOP_TIME,PREDICTION\n0,1,Sitting\n1,2,Lying\n")
+    events = run_loader(qtbot, AnnotationLoader(str(tmp_path), csv_import=True))
+    assert events == [("hash", None), ("batch", 2), ("loaded", 2)]
+
+def test_exporter_writes_zip_off_thread(qtbot, tmp_path):
+    from zipfile import ZipFile
+    from src.workers import AnnotationExporter
+    path = str(tmp_path / "export.zip")
+    exporter = AnnotationExporter(path, make_records(3), 9)
+    with qtbot.waitSignal(exporter.exported, timeout=5000) as blocker:
+        exporter.start()
+    exporter.wait()
+    assert blocker.args == [path]
+    with ZipFile(path) as archive:
+        assert json.loads(archive.read('labels.json'))["videohash"] == 9